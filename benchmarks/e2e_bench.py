@@ -0,0 +1,266 @@
+"""End-to-end runs of main against local fakes: pages/s, LLM calls per page, peak memory.
+
+    python benchmarks/e2e_bench.py [--corpus DIR] [--scenario NAME[:KEY=VALUE,...]] ...
+                                   [--site-latency 0.05] [--llm-speed 1.0] [--repeat 1]
+                                   [--json OUT] [--baseline OLD.json]
+
+Nothing leaves the machine (see offline.py). The web is a recorded corpus,
+or a synthetic one generated with --seed when --corpus is not given, served
+by SiteServer. Search replays the recorded results, and Ollama is FakeOllama.
+Each scenario runs `main.main([topic, --set ...])` in a fresh child process,
+with the HTTP, LLM and search caches off, so every run does the full work and
+the peak RSS is the run's own.
+
+Per scenario the bench reports:
+
+- wall time and pages fetched per second
+- LLM calls (as counted by the fake server) per fetched page
+- rows saved
+- peak RSS of the main process and of the largest parse worker
+
+Save a run with --json and compare a later one with --baseline to measure a
+change to crawler.py, llm_engine.py, data_manager.py and friends:
+
+    python benchmarks/e2e_bench.py --json before.json
+    # ...change something...
+    python benchmarks/e2e_bench.py --baseline before.json
+    python benchmarks/e2e_bench.py --scenario default --scenario "noprefilter:PREFILTER_ENABLED=0"
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import offline  # noqa: E402
+
+# Settings every scenario starts from: no caches, searches straight from the replay
+_BASE_ENV = {
+    "HTTP_CACHE_ENABLED": "0",
+    "LLM_CACHE_ENABLED": "0",
+    "SEARCH_CACHE_ENABLED": "0",
+    "PROBE_CACHE_ENABLED": "0",
+    "SEARCH_PROVIDERS": "replay",
+    "METRICS_PORT": "0",
+}
+_RESULT_TAG = "E2E_RESULT "
+
+
+def parse_scenario(text):
+    name, _, sets = text.partition(":")
+    overrides = [s.strip() for s in sets.split(",") if s.strip()]
+    for item in overrides:
+        if "=" not in item:
+            raise argparse.ArgumentTypeError(f"expected KEY=VALUE in scenario, got {item!r}")
+    return name.strip() or "default", overrides
+
+
+def child(args):
+    """Runs in the subprocess: one session through main, then a JSON line for the parent."""
+    import config
+    import main as entry
+    import parse_pool
+    import search_engine
+
+    corpus = offline.Corpus.load(args.corpus)
+    hosts = offline.HostMap(corpus.origins(), args.site_port)
+    search_engine.PROVIDERS["replay"] = lambda: offline.ReplayProvider(corpus, hosts)
+    config.DATA_DIR = args.data_dir
+
+    argv = [corpus.topic, f"--set=MAX_SEARCH_QUERIES={len(corpus.queries)}"]
+    argv += [f"--set={item}" for item in args.set]
+    started = time.perf_counter()
+    status = entry.main(argv)
+    wall = time.perf_counter() - started
+    parse_pool.shared_pool().close()  # reap the workers so RUSAGE_CHILDREN covers them
+
+    sessions = sorted(glob.glob(os.path.join(args.data_dir, "*", "research_summary.json")))
+    summary = {}
+    if sessions:
+        with open(sessions[-1], encoding="utf-8") as f:
+            summary = json.load(f)
+    counts = summary.get("counts", {})
+    result = {
+        "status": status,
+        "wall_s": round(wall, 2),
+        "pages_fetched": counts.get("pages_fetched", 0),
+        "pages_relevant": counts.get("pages_relevant", 0),
+        "records_saved": counts.get("records_saved", 0),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "worker_peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1
+        ),
+        "stage_times": summary.get("stage_times", {}),
+    }
+    print(_RESULT_TAG + json.dumps(result), flush=True)
+
+
+def run_scenario(name, overrides, corpus_dir, site, ollama, workdir, quiet):
+    data_dir = tempfile.mkdtemp(prefix=f"{name}-", dir=workdir)
+    env = {**os.environ, **_BASE_ENV, "OLLAMA_BASE_URL": ollama.url}
+    cmd = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--child",
+        "--corpus", corpus_dir,
+        "--site-port", str(site.hosts.port),
+        "--data-dir", data_dir,
+    ]
+    cmd += [f"--set={item}" for item in overrides]
+    ollama.reset()
+    log_path = os.path.join(workdir, f"{os.path.basename(data_dir)}.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=log, text=True)
+        log.write(proc.stdout)
+    calls = ollama.reset()
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(_RESULT_TAG):
+            result = json.loads(line[len(_RESULT_TAG):])
+    if result is None:
+        raise RuntimeError(f"scenario {name!r} produced no result; see {log_path}")
+    if not quiet:
+        print(f"  log: {log_path}")
+
+    pages = result["pages_fetched"]
+    llm_calls = sum(calls.values())
+    result.update(
+        {
+            "scenario": name,
+            "overrides": overrides,
+            "pages_per_s": round(pages / result["wall_s"], 2) if result["wall_s"] else 0.0,
+            "llm_calls": llm_calls,
+            "llm_calls_by_kind": calls,
+            "llm_calls_per_page": round(llm_calls / pages, 2) if pages else 0.0,
+        }
+    )
+    return result
+
+
+_COLUMNS = [
+    ("wall_s", "wall s"),
+    ("pages_fetched", "pages"),
+    ("pages_per_s", "pages/s"),
+    ("llm_calls", "LLM calls"),
+    ("llm_calls_per_page", "calls/page"),
+    ("records_saved", "rows"),
+    ("peak_rss_mb", "RSS MB"),
+    ("worker_peak_rss_mb", "worker MB"),
+]
+
+
+def print_table(results, baseline=None):
+    old = {r["scenario"]: r for r in baseline or []}
+    print(f"{'scenario':16}" + "".join(f"{title:>12}" for _, title in _COLUMNS))
+    for r in results:
+        print(f"{r['scenario'][:16]:16}" + "".join(f"{r[key]:>12}" for key, _ in _COLUMNS))
+        if r["scenario"] in old:
+            prev = old[r["scenario"]]
+            cells = [
+                f"{100 * (r[key] - prev[key]) / prev[key]:>+11.1f}%" if prev[key] else f"{'-':>12}"
+                for key, _ in _COLUMNS
+            ]
+            print(f"{'  vs baseline':16}" + "".join(cells))
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--corpus", help="recorded corpus (record_corpus.py); default: synthetic")
+    ap.add_argument("--seed", type=int, default=0, help="synthetic corpus seed")
+    ap.add_argument("--queries", type=int, default=24, help="synthetic corpus queries")
+    ap.add_argument("--results", type=int, default=20, help="synthetic results per query")
+    ap.add_argument(
+        "--scenario",
+        dest="scenarios",
+        type=parse_scenario,
+        action="append",
+        default=[],
+        metavar="NAME[:KEY=VALUE,...]",
+        help="run main with these --set overrides (repeatable; default: one 'default' run)",
+    )
+    ap.add_argument("--site-latency", type=float, default=0.05, help="seconds per page")
+    ap.add_argument("--llm-speed", type=float, default=1.0, help="0 = instant LLM")
+    ap.add_argument("--llm-parallel", type=int, default=2, help="fake OLLAMA_NUM_PARALLEL")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--json", help="write the results here")
+    ap.add_argument("--baseline", help="results from an earlier --json to compare against")
+    ap.add_argument("--quiet", action="store_true")
+    # internal: the per-scenario subprocess
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--site-port", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--data-dir", help=argparse.SUPPRESS)
+    ap.add_argument("--set", action="append", default=[], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="e2e-bench-")
+    if args.corpus:
+        corpus_dir = args.corpus
+        corpus = offline.Corpus.load(corpus_dir)
+    else:
+        corpus_dir = os.path.join(workdir, "corpus")
+        corpus = offline.synthetic_corpus(
+            corpus_dir, queries=args.queries, results=args.results, seed=args.seed
+        )
+    site = offline.SiteServer(corpus, latency=args.site_latency).start()
+    ollama = offline.FakeOllama(
+        os.environ.get("OLLAMA_MODEL", "llama3.2:3b"),
+        list(corpus.queries),
+        parallel=args.llm_parallel,
+        speed=args.llm_speed,
+    ).start()
+    print(
+        f"corpus: {len(corpus.queries)} queries, {len(corpus.pages)} pages on "
+        f"{len(site.hosts.local)} hosts; site latency {args.site_latency}s; "
+        f"LLM speed x{args.llm_speed}; work dir {workdir}"
+    )
+
+    results = []
+    try:
+        for name, overrides in args.scenarios or [("default", [])]:
+            for n in range(max(1, args.repeat)):
+                label = name if args.repeat <= 1 else f"{name}#{n + 1}"
+                print(f"running {label} {' '.join(overrides)}".rstrip())
+                r = run_scenario(name, overrides, corpus_dir, site, ollama, workdir, args.quiet)
+                r["scenario"] = label
+                results.append(r)
+    finally:
+        site.close()
+        ollama.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print()
+    print_table(results, baseline)
+    stages = results[-1]["stage_times"]
+    if stages:
+        print(f"\nbusiest stages ({results[-1]['scenario']}):")
+        for stage, t in list(stages.items())[:6]:
+            print(f"  {stage:22} {t['total_s']:8.2f}s  {t['calls']:5} calls  p95 {t['p95_ms']} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
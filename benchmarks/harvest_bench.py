@@ -0,0 +1,124 @@
+"""Check the streaming link harvester against the old BeautifulSoup one, and time both.
+
+    python benchmarks/harvest_bench.py [--corpus DIR] [--repeat 20]
+
+Every *.html file in the corpus (default: benchmarks/fixtures/html) must give
+exactly the same candidate list from both implementations. A synthetic listing
+page with a few thousand links is added to show the speedup on large pages.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import config  # noqa: E402
+from data_vocab import DATA_HINT_RE  # noqa: E402
+from url_grounding import (  # noqa: E402
+    _TEXT_URL_RE,
+    harvest_urls,
+    normalize_http_url,
+)
+
+
+def harvest_urls_soup(page_url, raw_html, text, max_urls):
+    """The pre-streaming implementation, kept verbatim as the reference."""
+    seen = {}
+    out = []
+
+    def remember(u):
+        if not u or u in seen:
+            return
+        seen[u] = None
+        out.append(u)
+
+    if raw_html:
+        try:
+            soup = BeautifulSoup(raw_html, "lxml")
+            for tag in soup.find_all(["a", "link", "script", "img", "source", "iframe"]):
+                href = tag.get("href") or tag.get("src")
+                remember(normalize_http_url(page_url, href))
+        except Exception:
+            pass
+
+    plain = text or ""
+    for m in _TEXT_URL_RE.finditer(plain):
+        remember(normalize_http_url(page_url, m.group(0)))
+
+    def sort_key(u):
+        low = u.lower()
+        bump = 2 if DATA_HINT_RE.search(low) else 0
+        return (-bump, u)
+
+    out.sort(key=sort_key)
+    cap = max_urls if max_urls > 0 else 120
+    return out[:cap]
+
+
+def synthetic_listing(n_links=4000):
+    rows = []
+    for i in range(n_links):
+        ext = ("csv", "json", "html", "png", "zip")[i % 5]
+        rows.append(f'<li><a href="/datasets/item-{i}/file.{ext}">Item {i}</a>'
+                    f'<img src="/thumbs/{i % 50}.png"><a href="/">Home</a></li>')
+    return "<html><body><ul>" + "".join(rows) + "</ul></body></html>"
+
+
+def load_corpus(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        name = os.path.basename(path)
+        pages.append((name, f"https://data.example.org/pages/{name}", html))
+    return pages
+
+
+def timed(fn, pages, repeat, cap):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for _, url, html in pages:
+            fn(url, html, None, cap)
+    return time.perf_counter() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--corpus", default=os.path.join(ROOT, "benchmarks", "fixtures", "html"))
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    cap = config.MAX_CANDIDATE_URLS
+    pages = load_corpus(args.corpus)
+    pages.append(("synthetic-listing", "https://data.example.org/list", synthetic_listing()))
+
+    mismatches = 0
+    for name, url, html in pages:
+        for limit in (cap, 0, 5):
+            want = harvest_urls_soup(url, html, None, limit)
+            got = harvest_urls(url, html, None, limit)
+            if got != want:
+                mismatches += 1
+                print(f"MISMATCH {name} (max_urls={limit}): {len(got)} vs {len(want)} urls")
+    print(f"{len(pages)} pages checked, {mismatches} mismatches")
+
+    soup_s = timed(harvest_urls_soup, pages, args.repeat, cap)
+    fast_s = timed(harvest_urls, pages, args.repeat, cap)
+    n = len(pages) * args.repeat
+    print(f"BeautifulSoup: {soup_s * 1000 / n:8.2f} ms/page")
+    print(f"Streaming    : {fast_s * 1000 / n:8.2f} ms/page  ({soup_s / fast_s:.1f}x faster)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
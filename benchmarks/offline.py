@@ -0,0 +1,537 @@
+"""Offline stand-ins for everything a run talks to: search, the web and Ollama.
+
+Used by e2e_bench.py (and record_corpus.py, which writes the corpus format).
+
+A corpus directory holds `corpus.json` plus the recorded bodies under `pages/`:
+
+    {"topic": "...",
+     "queries": {"query text": ["https://host/page", ...], ...},
+     "pages": {"https://host/page": {"file": "pages/<sha1>.html", "status": 200,
+                                     "content_type": "text/html; charset=utf-8"}, ...}}
+
+- SiteServer serves the pages with configurable latency. Every recorded host
+  gets its own loopback address (127.0.0.2, 127.0.0.3, ...), so per-host
+  politeness, connection limits and robots.txt behave as they do on the real
+  web. Absolute links to recorded hosts are rewritten to the local addresses.
+- ReplayProvider is a SearchProvider that answers with the recorded results.
+- FakeOllama answers /api/tags and /api/chat deterministically. Prefill and
+  generation are simulated from the prompt and reply sizes, with at most
+  `parallel` requests "on the GPU" at once, the way OLLAMA_NUM_PARALLEL works.
+- synthetic_corpus() writes a generated corpus when no recording is at hand.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from query_dedup import normalize_query  # noqa: E402
+from search_engine import SearchProvider  # noqa: E402
+
+CORPUS_FILE = "corpus.json"
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _unit(text: str) -> float:
+    """Deterministic number in [0, 1) for a string (same on every run)."""
+    return zlib.crc32(text.encode("utf-8")) / 2**32
+
+
+class Corpus:
+    def __init__(
+        self, root: str, topic: str, queries: Dict[str, List[str]], pages: Dict[str, dict]
+    ):
+        self.root = root
+        self.topic = topic
+        self.queries = queries
+        self.pages = pages
+        self._by_query = {normalize_query(q): urls for q, urls in queries.items()}
+
+    @classmethod
+    def load(cls, root: str) -> "Corpus":
+        with open(os.path.join(root, CORPUS_FILE), encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(root, data.get("topic", ""), data["queries"], data["pages"])
+
+    def save(self) -> None:
+        with open(os.path.join(self.root, CORPUS_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"topic": self.topic, "queries": self.queries, "pages": self.pages}, f, indent=1
+            )
+
+    def add_page(self, url: str, status: int, body: bytes = b"", content_type: str = "") -> None:
+        entry = {"status": status, "content_type": content_type}
+        if body:
+            name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+            ext = ".html" if "html" in content_type or not content_type else ".bin"
+            entry["file"] = f"pages/{name}{ext}"
+            os.makedirs(os.path.join(self.root, "pages"), exist_ok=True)
+            with open(os.path.join(self.root, entry["file"]), "wb") as f:
+                f.write(body)
+        self.pages[url] = entry
+
+    def results(self, query: str) -> List[str]:
+        return self._by_query.get(normalize_query(query), [])
+
+    def body(self, url: str) -> Optional[bytes]:
+        entry = self.pages.get(url)
+        if not entry or "file" not in entry:
+            return None
+        with open(os.path.join(self.root, entry["file"]), "rb") as f:
+            return f.read()
+
+    def origins(self) -> List[str]:
+        seen = dict.fromkeys(_origin(u) for u in self.pages)
+        for urls in self.queries.values():
+            seen.update(dict.fromkeys(_origin(u) for u in urls))
+        return sorted(seen)
+
+
+class HostMap:
+    """Recorded origin <-> local loopback address, the same in every process for a corpus."""
+
+    def __init__(self, origins: List[str], port: int):
+        self.port = port
+        self.local: Dict[str, str] = {}
+        self.origin_of: Dict[str, str] = {}
+        for i, origin in enumerate(origins):
+            address = self.address(i)
+            self.local[origin] = f"http://{address}:{port}"
+            self.origin_of[address] = origin
+        self._by_host = {
+            origin.split("://", 1)[1].encode("utf-8"): base.encode("utf-8")
+            for origin, base in self.local.items()
+        }
+        # longest first, so "stats1.x" doesn't claim the start of "stats12.x"
+        hosts = b"|".join(re.escape(h) for h in sorted(self._by_host, key=len, reverse=True))
+        self._link_re = re.compile(rb"https?://(" + hosts + rb")(?=[/\"'?#\s<]|$)")
+
+    @staticmethod
+    def address(i: int) -> str:
+        return f"127.0.{i // 250}.{2 + i % 250}"
+
+    def local_url(self, url: str) -> str:
+        origin = _origin(url)
+        base = self.local.get(origin)
+        return base + url[len(origin):] if base else url
+
+    def rewrite(self, body: bytes) -> bytes:
+        """Absolute links to recorded hosts -> their local addresses."""
+        if not self._by_host:
+            return body
+        return self._link_re.sub(lambda m: self._by_host[m.group(1)], body)
+
+
+class SiteServer:
+    """All recorded hosts, each on its own loopback address, sharing one port number."""
+
+    def __init__(self, corpus: Corpus, latency: float = 0.05, jitter: float = 0.5):
+        self.corpus = corpus
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._bodies: Dict[str, bytes] = {}
+        self._servers: List[ThreadingHTTPServer] = []
+        self.hosts: Optional[HostMap] = None
+
+    def start(self) -> "SiteServer":
+        origins = self.corpus.origins()
+        handler = self._handler()
+        server = ThreadingHTTPServer((HostMap.address(0), 0), handler)
+        self._servers.append(server)
+        self.hosts = HostMap(origins, server.server_address[1])
+        for address in list(self.hosts.origin_of)[1:]:
+            self._servers.append(ThreadingHTTPServer((address, self.hosts.port), handler))
+        for s in self._servers:
+            s.daemon_threads = True
+            threading.Thread(target=s.serve_forever, name="fake-site", daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        for s in self._servers:
+            s.shutdown()
+            s.server_close()
+
+    def page(self, url: str) -> Tuple[int, str, Optional[bytes]]:
+        entry = self.corpus.pages.get(url)
+        if entry is None:
+            return 404, "text/plain", None
+        with self._lock:
+            body = self._bodies.get(url)
+        if body is None:
+            body = self.corpus.body(url)
+            if body is not None and "html" in (entry.get("content_type") or "html"):
+                body = self.hosts.rewrite(body)
+            with self._lock:
+                self._bodies[url] = body
+        return entry.get("status", 200), entry.get("content_type") or "text/html", body
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, head_only: bool) -> None:
+                with site._lock:
+                    site.requests += 1
+                if self.path == "/robots.txt":
+                    self._reply(200, "text/plain", b"User-agent: *\nAllow: /\n", head_only)
+                    return
+                origin = site.hosts.origin_of.get(self.server.server_address[0], "")
+                url = origin + self.path
+                delay = site.latency * (1 + site.jitter * (2 * _unit(url) - 1))
+                time.sleep(max(0.0, delay))
+                status, ctype, body = site.page(url)
+                self._reply(status, ctype, body or b"", head_only)
+
+            def _reply(self, status, ctype, body, head_only):
+                m = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+                if m and status == 200 and body:
+                    start = int(m.group(1))
+                    end = min(int(m.group(2) or len(body) - 1), len(body) - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                    body = body[start : end + 1]
+                else:
+                    self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Last-Modified", "Mon, 06 Jan 2025 00:00:00 GMT")
+                self.end_headers()
+                if not head_only:
+                    try:
+                        self.wfile.write(body)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+
+            def do_GET(self):
+                self._serve(False)
+
+            def do_HEAD(self):
+                self._serve(True)
+
+        return Handler
+
+
+class ReplayProvider(SearchProvider):
+    """Recorded search results, pointed at the local SiteServer addresses."""
+
+    name = "replay"
+
+    def __init__(self, corpus: Corpus, hosts: HostMap, latency: float = 0.0):
+        super().__init__(interval=0.0)
+        self.corpus = corpus
+        self.hosts = hosts
+        self.latency = latency
+
+    def search(self, query: str, num_results: int) -> List[str]:
+        time.sleep(self.latency)
+        return [self.hosts.local_url(u) for u in self.corpus.results(query)[:num_results]]
+
+
+_DATA_LINK_RE = re.compile(r"\.(?:csv|tsv|json|jsonl|xlsx?|zip|parquet|gz)(?:\?|$)", re.I)
+_DATA_WORD_RE = re.compile(r"\b(?:dataset|datasets|csv|download|data)\b", re.I)
+
+
+class FakeOllama:
+    """Deterministic /api/tags + /api/chat with simulated prefill and generation time.
+
+    A request costs `overhead` + prompt_tokens / prefill_tps + reply_tokens / gen_tps
+    seconds while holding one of `parallel` slots. speed=0 makes every call instant.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        queries: List[str],
+        parallel: int = 2,
+        prefill_tps: float = 2000.0,
+        gen_tps: float = 80.0,
+        overhead: float = 0.02,
+        speed: float = 1.0,
+    ):
+        self.model = model
+        self.queries = list(queries)
+        self.prefill_tps = prefill_tps
+        self.gen_tps = gen_tps
+        self.overhead = overhead
+        self.speed = speed
+        self._slots = threading.Semaphore(max(1, parallel))
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> Dict[str, int]:
+        with self._lock:
+            calls, self.calls = self.calls, {}
+        return calls
+
+    def reply(self, prompt: str) -> Tuple[str, str]:
+        """(kind, reply text) for one of the prompts the crawler sends."""
+        if '"queries"' in prompt:
+            m = re.search(r"batch (\d+) of (\d+)", prompt)
+            batch, batches = (int(m.group(1)) - 1, int(m.group(2))) if m else (0, 1)
+            return "query_gen", json.dumps({"queries": self.queries[batch::batches]})
+        if '"verdicts"' in prompt:
+            blocks = re.findall(r'\[(\d+)\]\n"""(.*?)"""', prompt, re.S)
+            verdicts = [
+                {"index": int(i), "relevant": bool(_DATA_WORD_RE.search(text))}
+                for i, text in blocks
+            ]
+            return "relevance_batch", json.dumps({"verdicts": verdicts})
+        if '"relevant"' in prompt:
+            snippet = prompt.split('"""')[1] if prompt.count('"""') >= 2 else ""
+            relevant = bool(_DATA_WORD_RE.search(snippet))
+            return "relevance", json.dumps({"relevant": relevant, "reason": "data words"})
+        if "selected_indices" in prompt:
+            block = prompt.split("Candidate URLs", 1)[-1]
+            picks = [
+                (int(i), url)
+                for i, url in re.findall(r"^(\d+): (\S+)$", block, re.M)
+                if _DATA_LINK_RE.search(url)
+            ][:5]
+            content = prompt.split('"""')[1].strip() if prompt.count('"""') >= 2 else ""
+            formats = {_DATA_LINK_RE.search(url).group(0).strip(".?").upper() for _, url in picks}
+            return "extract", json.dumps(
+                {
+                    "dataset_name": content.split("\n", 1)[0][:80],
+                    "description": content[:160],
+                    "formats": sorted(formats),
+                    "license": "CC-BY-4.0" if "CC BY" in content else "Unknown",
+                    "relevance_score": 7 if picks else 3,
+                    "selected_indices": [i for i, _ in picks],
+                }
+            )
+        return "text", "The topic calls for CSV and JSON datasets from statistics offices."
+
+    def _timing(self, prompt: str, reply: str) -> Tuple[int, int, float, float]:
+        prompt_tokens = max(1, len(prompt) // 4)
+        reply_tokens = max(1, len(reply) // 4)
+        return (
+            prompt_tokens,
+            reply_tokens,
+            prompt_tokens / self.prefill_tps,
+            reply_tokens / self.gen_tps,
+        )
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, obj, status=200):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/api/tags"):
+                    self._json({"models": [{"name": fake.model}]})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                if not self.path.startswith("/api/chat"):
+                    self._json({"error": "not found"}, 404)
+                    return
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                prompt = "\n".join(m.get("content", "") for m in req.get("messages", []))
+                kind, reply = fake.reply(prompt)
+                with fake._lock:
+                    fake.calls[kind] = fake.calls.get(kind, 0) + 1
+                prompt_tokens, reply_tokens, prefill, generate = fake._timing(prompt, reply)
+                stats = {
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prefill * 1e9),
+                    "eval_count": reply_tokens,
+                    "eval_duration": int(generate * 1e9),
+                }
+                with fake._slots:
+                    time.sleep(fake.speed * (fake.overhead + prefill))
+                    if not req.get("stream"):
+                        time.sleep(fake.speed * generate)
+                        message = {"role": "assistant", "content": reply}
+                        self._json({"model": fake.model, "message": message, "done": True, **stats})
+                        return
+                    self._stream(reply, generate, stats)
+
+            def _stream(self, reply, generate, stats):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                pieces = [reply[i : i + 4] for i in range(0, len(reply), 4)]
+                per_piece = fake.speed * generate / max(1, len(pieces))
+                try:
+                    for piece in pieces:
+                        time.sleep(per_piece)
+                        chunk = {"message": {"role": "assistant", "content": piece}, "done": False}
+                        self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                    last = {"message": {"role": "assistant", "content": ""}, "done": True, **stats}
+                    self.wfile.write((json.dumps(last) + "\n").encode("utf-8"))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped early (JsonFieldScanner)
+                self.close_connection = True
+
+        return Handler
+
+
+# --- synthetic corpus ---------------------------------------------------------
+
+_TOPIC = "household energy consumption"
+_REGIONS = ["north", "south", "east", "west", "coastal", "alpine", "urban", "rural"]
+_FILLER = (
+    "Analysts have argued for years about what drives the numbers, and this piece "
+    "looks at the debate from several angles without settling it. "
+)
+
+
+def _dataset_page(rng: random.Random, origin: str, n: int, title: str) -> Tuple[str, List[str]]:
+    region = rng.choice(_REGIONS)
+    files = [
+        f"{origin}/files/{region}-energy-{n}.{ext}"
+        for ext in rng.sample(["csv", "zip", "json", "xlsx", "parquet"], rng.randint(1, 3))
+    ]
+    rows = "".join(
+        f"<tr><td>{2010 + r}</td><td>{rng.randint(200, 900)}</td><td>kWh</td></tr>"
+        for r in range(rng.randint(5, 15))
+    )
+    paragraphs = "".join(
+        f"<p>Monthly household electricity and gas readings for the {region} region, "
+        f"collected by the energy survey programme (wave {n}, part {i}). Each record "
+        f"has the household id, the month, the meter reading and the tariff.</p>"
+        for i in range(rng.randint(3, 10))
+    )
+    links = "".join(f'<li><a href="{u}">{u.rsplit("/", 1)[-1]}</a></li>' for u in files)
+    html = (
+        f"<html><head><title>{title}</title>"
+        f'<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script>'
+        f'</head><body><nav><a href="/">Home</a> <a href="/about">About</a> '
+        f'<a href="/privacy">Privacy</a></nav><article><h1>{title}</h1>{paragraphs}'
+        f"<h2>Download the dataset</h2><ul>{links}</ul><table>{rows}</table>"
+        f"<p>License: CC BY 4.0. Download the data as CSV or use the API.</p></article>"
+        f'<footer><a href="https://twitter.com/intent/tweet?u={origin}">Share</a>'
+        f' <img src="/static/logo.png"></footer></body></html>'
+    )
+    return html, files
+
+
+def _blog_page(rng: random.Random, n: int, paragraphs: int = 0) -> str:
+    body = "".join(
+        f"<p>{_FILLER * rng.randint(2, 5)} Opinion {n}.{i} on what people pay at home.</p>"
+        for i in range(paragraphs or rng.randint(4, 12))
+    )
+    return (
+        f"<html><head><title>Column {n}</title></head><body><nav><a href='/'>Home</a></nav>"
+        f"<article><h1>Why bills keep rising ({n})</h1>{body}</article></body></html>"
+    )
+
+
+def synthetic_corpus(
+    root: str, queries: int = 24, results: int = 20, hosts: int = 30, seed: int = 0
+) -> Corpus:
+    """Dataset pages, their mirrors, blog posts, listings and a few heavy or broken pages."""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    corpus = Corpus(root, _TOPIC, {}, {})
+    kinds = ["stats", "data", "blog", "news", "portal"]
+    origins = [f"https://{rng.choice(kinds)}{i}.example.org" for i in range(hosts)]
+
+    urls: List[str] = []
+    datasets: List[Tuple[str, str]] = []
+    for n in range(max(1, queries * results * 2 // 3)):
+        origin = rng.choice(origins)
+        roll = rng.random()
+        url = f"{origin}/page/{n}"
+        if roll < 0.35:
+            title = f"Household energy survey {n}: monthly readings"
+            html, files = _dataset_page(rng, origin, n, title)
+            datasets.append((url, html))
+            for f in files:
+                rows = f"household,month,kwh\n{n},1,{rng.randint(1, 999)}\n"
+                corpus.add_page(f, 200, rows.encode("utf-8"), "text/csv")
+        elif roll < 0.45 and datasets:
+            # mirror: same page on another host, same file names
+            src_url, src_html = rng.choice(datasets)
+            html = src_html.replace(_origin(src_url), origin).replace("</h1>", " (mirror)</h1>", 1)
+        elif roll < 0.75:
+            html = _blog_page(rng, n)
+        elif roll < 0.9:
+            picks = rng.sample(datasets, min(len(datasets), rng.randint(5, 30))) if datasets else []
+            items = "".join(
+                f'<li><a href="{u}">Dataset {u.rsplit("/", 1)[-1]}</a></li>' for u, _ in picks
+            )
+            html = (
+                f"<html><head><title>Catalogue {n}</title></head><body><h1>Energy data "
+                f"catalogue</h1><p>Browse household energy datasets.</p><ul>{items}</ul>"
+                f"</body></html>"
+            )
+        elif roll < 0.95:
+            html = _blog_page(rng, n, paragraphs=2000)  # ~1.5 MB
+        else:
+            corpus.add_page(url, rng.choice([404, 500, 403]))
+            urls.append(url)
+            continue
+        corpus.add_page(url, 200, html.encode("utf-8"), "text/html; charset=utf-8")
+        urls.append(url)
+
+    templates = [
+        "{t} dataset filetype:csv",
+        "{t} {r} data download",
+        "site:{h} {t}",
+        '"{t}" {r} monthly readings',
+        "{t} open data {r} json",
+        "{r} {t} survey microdata",
+    ]
+    while len(corpus.queries) < queries:
+        q = rng.choice(templates).format(
+            t=_TOPIC, r=rng.choice(_REGIONS), h=urlsplit(rng.choice(origins)).netloc
+        )
+        if q in corpus.queries:
+            q = f"{q} {len(corpus.queries)}"
+        corpus.queries[q] = rng.sample(urls, min(results, len(urls)))
+    corpus.save()
+    return corpus
@@ -0,0 +1,96 @@
+"""Time the parse stage (decode + trafilatura + link harvest) on threads vs processes.
+
+    python benchmarks/parse_bench.py [--corpus DIR] [--pages 400] [--workers N]
+
+Pages are read as raw bytes from the corpus (default: benchmarks/fixtures/html,
+plus a few synthetic article pages) and fed round-robin to a ParsePool, the same
+way the pipeline's parse stage does. Both modes must return identical payloads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+from parse_pool import ParsePool  # noqa: E402
+
+
+def synthetic_article(seed, paragraphs=120):
+    body = []
+    for i in range(paragraphs):
+        body.append(
+            f"<p>Paragraph {i} of article {seed}. The survey covers household energy use, "
+            f"with monthly readings per region and a <a href='/files/{seed}-{i}.csv'>CSV "
+            f"extract</a> for each year.</p>"
+        )
+        if i % 20 == 0:
+            body.append(
+                "<table>" + "".join(
+                    f"<tr><td>{r}</td><td>{r * seed}</td><td>kWh</td></tr>" for r in range(15)
+                ) + "</table>"
+            )
+    return (
+        f"<html><head><title>Article {seed}</title></head><body><nav><a href='/'>Home</a>"
+        f"</nav><article><h1>Energy survey {seed}</h1>{''.join(body)}</article></body></html>"
+    ).encode("utf-8")
+
+
+def load_corpus(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "rb") as f:
+            pages.append((f"https://data.example.org/pages/{os.path.basename(path)}", f.read()))
+    for seed in range(1, 5):
+        pages.append((f"https://data.example.org/articles/{seed}", synthetic_article(seed)))
+    return pages
+
+
+def run(pool, pages, n_pages):
+    started = time.perf_counter()
+    futures = [
+        pool.submit(*pages[i % len(pages)]) for i in range(n_pages)
+    ]
+    results = [f.result() for f in futures]
+    return time.perf_counter() - started, results
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--corpus", default=os.path.join(ROOT, "benchmarks", "fixtures", "html"))
+    ap.add_argument("--pages", type=int, default=400)
+    ap.add_argument("--workers", type=int, default=config.PARSE_WORKERS)
+    args = ap.parse_args()
+
+    pages = load_corpus(args.corpus)
+    print(f"{len(pages)} distinct pages, {args.pages} parses, {args.workers} workers")
+
+    timings = {}
+    outputs = {}
+    for label, processes in (("threads", False), ("processes", True)):
+        pool = ParsePool(workers=args.workers, processes=processes)
+        try:
+            # Warm up: process workers import trafilatura on first use
+            concurrent.futures.wait([pool.submit(*p) for p in pages[: args.workers]])
+            timings[label], outputs[label] = run(pool, pages, args.pages)
+        finally:
+            pool.close()
+        print(f"{label:<10}: {args.pages / timings[label]:8.1f} pages/s")
+
+    same = outputs["threads"] == outputs["processes"]
+    print(f"processes vs threads: {timings['threads'] / timings['processes']:.2f}x, "
+          f"payloads {'identical' if same else 'DIFFER'}")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""How often would the local pre-filter have overruled the LLM?
+
+Record a corpus first by running a session with RELEVANCE_CORPUS_PATH set (every
+page is then LLM-judged and logged with its local score), then:
+
+    python benchmarks/prefilter_agreement.py corpus.jsonl [--accept 5 --reject -1]
+
+Prints the confusion counts at the given thresholds and a small sweep, so the
+thresholds can be tuned against what the model actually decided.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from prefilter import score_page  # noqa: E402
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def agreement(rows, scores, accept, reject):
+    out = dict.fromkeys(
+        ("auto_accept", "auto_reject", "to_llm", "false_accept", "false_reject"), 0
+    )
+    for row, score in zip(rows, scores):
+        if score.topic_coverage > 0 and score.accept_score >= accept:
+            out["auto_accept"] += 1
+            out["false_accept"] += not row["llm_relevant"]
+        elif score.score <= reject:
+            out["auto_reject"] += 1
+            out["false_reject"] += bool(row["llm_relevant"])
+        else:
+            out["to_llm"] += 1
+    decided = out["auto_accept"] + out["auto_reject"]
+    wrong = out["false_accept"] + out["false_reject"]
+    out["llm_calls_avoided_pct"] = round(100.0 * decided / len(rows), 1) if rows else 0.0
+    out["agreement_pct"] = round(100.0 * (decided - wrong) / decided, 1) if decided else 100.0
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("corpus")
+    ap.add_argument("--accept", type=float, default=None)
+    ap.add_argument("--reject", type=float, default=None)
+    args = ap.parse_args()
+
+    accept = config.PREFILTER_ACCEPT_SCORE if args.accept is None else args.accept
+    reject = config.PREFILTER_REJECT_SCORE if args.reject is None else args.reject
+
+    rows = load(args.corpus)
+    started = time.perf_counter()
+    scores = [score_page(r["query"], r["url"], r["text"], r["candidates"]) for r in rows]
+    elapsed = time.perf_counter() - started
+
+    relevant = sum(1 for r in rows if r["llm_relevant"])
+    print(f"{len(rows)} pages, {relevant} judged relevant by the LLM")
+    print(f"Scoring took {elapsed * 1000:.1f} ms ({elapsed * 1e6 / max(1, len(rows)):.0f} us/page)")
+    print(f"\nThresholds accept>={accept} reject<={reject}:")
+    for k, v in agreement(rows, scores, accept, reject).items():
+        print(f"  {k}: {v}")
+
+    print("\nSweep (accept, reject) -> avoided% / agreement% / false accepts / false rejects")
+    for a in (3.0, 4.0, 5.0, 6.0):
+        for r in (-2.0, -1.0, 0.0, 1.0):
+            res = agreement(rows, scores, a, r)
+            print(
+                f"  ({a:>4}, {r:>4}) -> {res['llm_calls_avoided_pct']:>5}% / "
+                f"{res['agreement_pct']:>5}% / {res['false_accept']} / {res['false_reject']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
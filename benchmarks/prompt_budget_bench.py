@@ -0,0 +1,102 @@
+"""Measure what the extraction prompt budget saves, and (optionally) what it costs in quality.
+
+    python benchmarks/prompt_budget_bench.py [--corpus DIR] [--query TEXT] [--ollama]
+
+Every page in the corpus (default: benchmarks/fixtures/html plus the synthetic
+articles from parse_bench) is parsed the way the pipeline does it. The
+estimated prompt size is then reported with and without EXTRACT_PROMPT_BUDGET.
+
+With --ollama, extract_info runs both ways against the configured Ollama
+server, with the LLM cache off. The bench reports wall time per call, how often
+both prompts pick the same download links, and the mean |relevance_score|
+difference, so a budget change can be checked before it ships.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import config  # noqa: E402
+import prompt_budget  # noqa: E402
+from parse_bench import load_corpus  # noqa: E402
+from parse_pool import parse_page  # noqa: E402
+
+
+def picked(result, candidates):
+    if not isinstance(result, dict):
+        return set()
+    idx = result.get("selected_indices") or []
+    return {candidates[i] for i in idx if isinstance(i, int) and 0 <= i < len(candidates)}
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--corpus", default=os.path.join(ROOT, "benchmarks", "fixtures", "html"))
+    ap.add_argument("--query", default="household energy survey csv")
+    ap.add_argument("--ollama", action="store_true", help="also run extract_info both ways")
+    args = ap.parse_args()
+
+    pages = []
+    for url, body in load_corpus(args.corpus):
+        payload = parse_page(url, body, config.MAX_CANDIDATE_URLS)
+        if payload and payload["text"]:
+            pages.append(payload)
+
+    print(f"{len(pages)} pages with text")
+    print(f"{'page':50} {'cands':>5} {'tok before':>10} {'tok after':>9}")
+    for p in pages:
+        plan = prompt_budget.plan_extract(
+            p["text"], args.query, p["candidates"], max_reply_tokens=700
+        )
+        print(
+            f"{p['url'][-50:]:50} {len(p['candidates']):5} "
+            f"{plan.tokens_before:10} {plan.tokens_after:9}"
+        )
+    for k, v in prompt_budget.stats().items():
+        print(f"  {k}: {v}")
+
+    if not args.ollama:
+        return
+
+    from llm_engine import LLMEngine
+
+    with config.overrides(LLM_CACHE_ENABLED=False, OLLAMA_STREAM=False):
+        llm = LLMEngine()
+        results = {}
+        for budget in (False, True):
+            with config.overrides(EXTRACT_PROMPT_BUDGET=budget):
+                started = time.perf_counter()
+                results[budget] = [
+                    llm.extract_info(p["text"], args.query, p["candidates"]) for p in pages
+                ]
+                elapsed = time.perf_counter() - started
+            label = "budgeted" if budget else "text[:6000]"
+            print(f"{label:12} {elapsed / len(pages):6.2f}s per extraction")
+
+    same_links = 0
+    score_diff = []
+    for p, old, new in zip(pages, results[False], results[True]):
+        same_links += picked(old, p["candidates"]) == picked(new, p["candidates"])
+        if isinstance(old, dict) and isinstance(new, dict):
+            try:
+                score_diff.append(
+                    abs(int(old.get("relevance_score", 0)) - int(new.get("relevance_score", 0)))
+                )
+            except (TypeError, ValueError):
+                pass
+    print(f"same selected links: {same_links}/{len(pages)}")
+    if score_diff:
+        print(f"mean |relevance_score| difference: {sum(score_diff) / len(score_diff):.2f}")
+
+
+if __name__ == "__main__":
+    main()
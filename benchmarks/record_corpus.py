@@ -0,0 +1,105 @@
+"""Record a replayable corpus (search results + page bodies) for e2e_bench.py.
+
+    python benchmarks/record_corpus.py OUT_DIR --session SESSION_ID
+    python benchmarks/record_corpus.py OUT_DIR --topic TEXT --queries-file FILE [--results 20]
+
+With --session, the queries and the search results come from that session's
+journal under DATA_DIR, so the corpus replays what the crawler actually saw.
+With --queries-file (one query per line), every query is searched live with
+the configured SEARCH_PROVIDERS. Each result page is then fetched once
+through the normal fetch path (HTTP cache, robots.txt, host pacing) and its
+status and body are stored under OUT_DIR; failures replay as their HTTP
+status, or as 404 when no response came back (robots.txt, timeouts). See
+offline.py for the format.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import config  # noqa: E402
+import journal  # noqa: E402
+import offline  # noqa: E402
+import runner  # noqa: E402
+from crawler import ContentFetcher  # noqa: E402
+from politeness import FetchError  # noqa: E402
+
+
+def from_session(session_id):
+    session_dir = os.path.join(config.DATA_DIR, session_id)
+    if not journal.exists(session_dir):
+        raise SystemExit(f"No session journal in {session_dir}")
+    log = journal.SessionJournal(session_dir)
+    try:
+        results = {}
+        for idx, query in enumerate(log.queries()):
+            links = log.search_links(idx)
+            if links is not None:
+                results[query] = links
+        return log.meta("topic", ""), results
+    finally:
+        log.close()
+
+
+def from_search(queries, results):
+    from search_engine import SearchEngine
+
+    engine = SearchEngine()
+    try:
+        return {q: engine.perform_search(q, num_results=results) for q in queries}
+    finally:
+        engine.close()
+
+
+def record(corpus, fetcher, url):
+    try:
+        resp = fetcher.get(url)
+    except FetchError as e:
+        print(f"  {e.reason:18} {url}")
+        status = re.search(r"\(status (\d+)\)", str(e))
+        corpus.add_page(url, int(status.group(1)) if status else 404)
+        return
+    corpus.add_page(url, 200, resp.body, resp.headers.get("content-type", "text/html"))
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("out", help="corpus directory to write")
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--session", help="session id under DATA_DIR to take searches from")
+    source.add_argument("--queries-file", help="search these queries live")
+    ap.add_argument("--topic", default="", help="topic for --queries-file corpora")
+    ap.add_argument("--results", type=int, default=20, help="results per query (live search)")
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args()
+
+    if args.session:
+        topic, results = from_session(args.session)
+    else:
+        topic = args.topic
+        results = from_search(runner.load_topics(args.queries_file), args.results)
+
+    os.makedirs(args.out, exist_ok=True)
+    corpus = offline.Corpus(args.out, topic, results, {})
+    urls = list(dict.fromkeys(u for links in results.values() for u in links))
+    print(f"{len(results)} queries, {len(urls)} distinct pages")
+    fetcher = ContentFetcher()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(lambda u: record(corpus, fetcher, u), urls))
+    corpus.save()
+    stored = sum(1 for p in corpus.pages.values() if "file" in p)
+    print(f"wrote {args.out}: {stored}/{len(urls)} pages with a body")
+
+
+if __name__ == "__main__":
+    main()
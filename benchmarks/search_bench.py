@@ -0,0 +1,107 @@
+"""Time SearchEngine against fake local providers: serial fallback vs. fan-out + cache.
+
+    python benchmarks/search_bench.py [--queries 40] [--latency 0.3] [--interval 0.5]
+
+Two fake providers answer after --latency seconds; "google" fails on every
+fifth query. The baseline mimics the old engine: ask Google, sleep the pause,
+and only ask DuckDuckGo when Google came back empty. The new engine asks both
+concurrently under per-provider intervals and caches merged results, so the
+second half of the workload (the same queries reworded) is served from the
+cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import search_cache  # noqa: E402
+from search_engine import SearchEngine, SearchProvider  # noqa: E402
+
+
+class FakeProvider(SearchProvider):
+    def __init__(self, name, interval, latency, fail_every=0):
+        super().__init__(interval)
+        self.name = name
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def search(self, query, num_results):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("rate limited")
+        n = int(query.split()[-1])
+        return [f"https://{self.name}.example/{n}/{i}" for i in range(num_results)]
+
+
+def workload(queries):
+    first = [f"weather dataset csv {i}" for i in range(queries // 2)]
+    # same queries again, reworded the way a second query-generation batch might
+    again = [f"CSV  Weather dataset {i}" for i in range(queries // 2)]
+    return first + again
+
+
+def serial_fallback(queries, latency, interval):
+    google = FakeProvider("google", interval, latency, fail_every=5)
+    ddgs = FakeProvider("ddgs", interval, latency)
+    for q in queries:
+        try:
+            links = google.search(q, 10)
+        except RuntimeError:
+            links = []
+        time.sleep(interval)
+        if not links:
+            ddgs.search(q, 10)
+            time.sleep(interval)
+
+
+def fan_out(queries, latency, interval, cache_path):
+    providers = [
+        FakeProvider("google", interval, latency, fail_every=5),
+        FakeProvider("ddgs", interval, latency),
+    ]
+    cache = search_cache.SearchCache(path=cache_path, ttl=3600)
+    engine = SearchEngine(providers=providers, cache=cache)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for q in queries:
+            engine.perform_search(q, num_results=10)
+    engine.close()
+    return engine.stats()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=40)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--interval", type=float, default=0.5)
+    args = ap.parse_args()
+    queries = workload(args.queries)
+
+    t0 = time.perf_counter()
+    serial_fallback(queries, args.latency, args.interval)
+    serial = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        stats = fan_out(queries, args.latency, args.interval, os.path.join(tmp, "s.sqlite"))
+        fanned = time.perf_counter() - t0
+
+    print(f"{len(queries)} queries, latency {args.latency}s, interval {args.interval}s")
+    print(f"serial + fallback : {serial:6.2f}s")
+    print(f"fan-out + cache   : {fanned:6.2f}s  ({serial / fanned:.1f}x)")
+    for k, v in stats.items():
+        print(f"  {k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Write a synthetic session into each row store and time reloading it.
+
+    python benchmarks/store_bench.py [--rows 100000] [--backends sqlite,parquet,csv]
+
+For every backend: append --rows rows through the normal flush policy, then
+time a lookup by url, a lookup by query, a full load and a CSV export.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+
+def fake_row(i, queries):
+    url = f"https://data.example.org/datasets/{i}"
+    return {
+        "query": f"query {i % queries}",
+        "url": url,
+        "source_url": url,
+        "dataset_name": f"Dataset {i}",
+        "formats": ["CSV", "JSON"],
+        "verified_download_links": [f"{url}/data.csv", f"{url}/data.json"],
+        "download_links": [f"{url}/data.csv"],
+        "candidates_count": 12,
+        "license": "CC-BY-4.0",
+        "relevance": 8,
+        "saved_at": "2024-01-01T00:00:00",
+        "local_path": f"/tmp/{i}.txt",
+    }
+
+
+def timed(fn):
+    started = time.perf_counter()
+    out = fn()
+    return (time.perf_counter() - started) * 1000, out
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--backends", default="sqlite,parquet,csv")
+    args = ap.parse_args()
+
+    probe = f"https://data.example.org/datasets/{args.rows // 2}"
+    print(f"{'backend':<8} {'write s':>8} {'by url ms':>10} {'by query ms':>12} "
+          f"{'full load ms':>13} {'export ms':>10}")
+    for backend in args.backends.split(","):
+        with tempfile.TemporaryDirectory() as session_dir:
+            store = storage.open_store(session_dir, backend)
+
+            def write():
+                for i in range(args.rows):
+                    store.append(fake_row(i, args.queries))
+                store.flush()
+
+            write_ms, _ = timed(write)
+            url_ms, hit = timed(lambda: store.load(url=probe))
+            query_ms, _ = timed(lambda: store.load(query="query 7"))
+            full_ms, df = timed(store.load)
+            export_ms, _ = timed(
+                lambda: store.export_csv(os.path.join(session_dir, "export.csv"))
+            )
+            store.close()
+            assert len(df) == args.rows and len(hit) == 1
+            print(f"{backend:<8} {write_ms / 1000:8.2f} {url_ms:10.1f} {query_ms:12.1f} "
+                  f"{full_ms:13.0f} {export_ms:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
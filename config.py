@@ -1,4 +1,8 @@
+import contextlib
+import contextvars
 import os
+import sys
+import types
 
 WORKSPACE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(WORKSPACE_DIR, "data")
@@ -30,20 +34,226 @@ def _env_float(key: str, default: float) -> float:
         return default
 
 
+def _env_bool(key: str, default: bool) -> bool:
+    v = os.environ.get(key)
+    if v is None or not v.strip():
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+
 # Ollama HTTP API — defaults picked for a small GPU + room left for context
 OLLAMA_BASE_URL = _env_str("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
 OLLAMA_MODEL = _env_str("OLLAMA_MODEL", "llama3.2:3b")
 OLLAMA_REQUEST_TIMEOUT = _env_float("OLLAMA_REQUEST_TIMEOUT", 600.0)
+# Requests in flight at once — match the server's OLLAMA_NUM_PARALLEL — and the
+# cap on queued + in-flight requests before producers are held back
+OLLAMA_NUM_PARALLEL = _env_int("OLLAMA_NUM_PARALLEL", 2)
+LLM_QUEUE_MAX = _env_int("LLM_QUEUE_MAX", 16)
+# Stream JSON replies and hang up as soon as the fields we need are complete
+OLLAMA_STREAM = _env_bool("OLLAMA_STREAM", True)
+# Context window the server runs the model with; only used to size prompts
+OLLAMA_NUM_CTX = _env_int("OLLAMA_NUM_CTX", 4096)
+
+# Relevance filter — snippets judged per Ollama call (adaptive, capped by the
+# context window) and how long the pipeline waits to fill a batch
+RELEVANCE_BATCH_SIZE = _env_int("RELEVANCE_BATCH_SIZE", 8)
+RELEVANCE_BATCH_LINGER = _env_float("RELEVANCE_BATCH_LINGER", 0.25)
+
+# Local pre-filter ahead of the LLM gate (see prefilter.score_page). On-topic pages
+# whose topic score (no portal/link points) reaches ACCEPT skip the LLM as relevant;
+# pages whose full score is at/below REJECT skip it as irrelevant.
+PREFILTER_ENABLED = _env_bool("PREFILTER_ENABLED", True)
+PREFILTER_ACCEPT_SCORE = _env_float("PREFILTER_ACCEPT_SCORE", 5.0)
+PREFILTER_REJECT_SCORE = _env_float("PREFILTER_REJECT_SCORE", -1.0)
+# When set, every page is LLM-judged and logged here with its local score
+RELEVANCE_CORPUS_PATH = _env_str("RELEVANCE_CORPUS_PATH", "")
+
+# Memo of byte-identical Ollama requests, shared across sessions
+LLM_CACHE_ENABLED = _env_bool("LLM_CACHE_ENABLED", True)
+LLM_CACHE_PATH = _env_str("LLM_CACHE_PATH", os.path.join(DATA_DIR, "_cache", "llm.sqlite"))
+LLM_CACHE_MAX_ENTRIES = _env_int("LLM_CACHE_MAX_ENTRIES", 50_000)
 
 MAX_CANDIDATE_URLS = _env_int("MAX_CANDIDATE_URLS", 120)
+# Extraction prompts get the most informative passages and a compressed candidate
+# list within these token budgets (see prompt_budget.py); False/0 disables and sends
+# text[:6000] with every candidate as before
+EXTRACT_PROMPT_BUDGET = _env_bool("EXTRACT_PROMPT_BUDGET", True)
+EXTRACT_CONTENT_TOKENS = _env_int("EXTRACT_CONTENT_TOKENS", 1000)
+EXTRACT_CANDIDATE_TOKENS = _env_int("EXTRACT_CANDIDATE_TOKENS", 900)
+
+# Relevant pages whose text SimHash is within SIMHASH_MAX_DISTANCE bits (of 64) of
+# a page already extracted this session reuse that extraction (see simhash.py)
+SIMHASH_ENABLED = _env_bool("SIMHASH_ENABLED", True)
+SIMHASH_MAX_DISTANCE = _env_int("SIMHASH_MAX_DISTANCE", 4)
 
 MAX_SEARCH_QUERIES = _env_int("MAX_SEARCH_QUERIES", 200)
+# Query-generation prompts per topic; MAX_SEARCH_QUERIES is split evenly across them
+QUERY_GEN_BATCHES = _env_int("QUERY_GEN_BATCHES", 4)
+# Generated queries whose term sets overlap at least this much (Jaccard) are
+# searched once; see query_dedup.py. 1.0 only merges reorderings / case variants.
+QUERY_DEDUP_ENABLED = _env_bool("QUERY_DEDUP_ENABLED", True)
+QUERY_DEDUP_THRESHOLD = _env_float("QUERY_DEDUP_THRESHOLD", 0.75)
 MAX_RESULTS_PER_QUERY = _env_int("MAX_RESULTS_PER_QUERY", 100)
+# Adaptive query order (see query_scheduler.py): queries whose operator patterns
+# have paid off run first, low-yield patterns ask for fewer results, and the
+# run stops once recent queries stop producing useful pages.
+QUERY_ADAPTIVE = _env_bool("QUERY_ADAPTIVE", True)
+QUERY_EXPLORATION = _env_float("QUERY_EXPLORATION", 0.5)  # UCB bonus weight
+QUERY_ADAPT_MIN_QUERIES = _env_int("QUERY_ADAPT_MIN_QUERIES", 2)
+QUERY_LOW_YIELD = _env_float("QUERY_LOW_YIELD", 0.05)
+QUERY_LOW_YIELD_RESULTS = _env_int("QUERY_LOW_YIELD_RESULTS", 20)
+QUERY_STOP_YIELD = _env_float("QUERY_STOP_YIELD", 0.01)  # 0 disables the early stop
+QUERY_STOP_WINDOW = _env_int("QUERY_STOP_WINDOW", 10)
+QUERY_STOP_MIN_QUERIES = _env_int("QUERY_STOP_MIN_QUERIES", 20)
+# Queries searched ahead of the oldest unfinished one; smaller reacts faster to yields
+QUERY_LOOKAHEAD = _env_int("QUERY_LOOKAHEAD", 4)
 DELAY_BETWEEN_SEARCHES = _env_float("DELAY_BETWEEN_SEARCHES", 2.0)
 
+# Search providers queried side by side for every query (see search_engine.py).
+# DELAY_BETWEEN_SEARCHES paces Google; DDGS_SEARCH_INTERVAL paces DuckDuckGo.
+SEARCH_PROVIDERS = _env_str("SEARCH_PROVIDERS", "google,ddgs")
+DDGS_SEARCH_INTERVAL = _env_float("DDGS_SEARCH_INTERVAL", 1.0)
+SEARCH_ERROR_COOLDOWN = _env_float("SEARCH_ERROR_COOLDOWN", 5.0)
+SEARCH_RRF_K = _env_float("SEARCH_RRF_K", 60.0)  # rank fusion damping
+# Query -> links memo shared across sessions; normalized queries share entries
+SEARCH_CACHE_ENABLED = _env_bool("SEARCH_CACHE_ENABLED", True)
+SEARCH_CACHE_PATH = _env_str(
+    "SEARCH_CACHE_PATH", os.path.join(DATA_DIR, "_cache", "search.sqlite")
+)
+SEARCH_CACHE_TTL = _env_float("SEARCH_CACHE_TTL", 3 * 24 * 3600.0)
+SEARCH_CACHE_MAX_ENTRIES = _env_int("SEARCH_CACHE_MAX_ENTRIES", 100_000)
+
 USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
     "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 )
 
 MAX_QUERIES_NO_RESULTS_TRACKED = _env_int("MAX_QUERIES_NO_RESULTS_TRACKED", 80)
+
+# Page fetching — one pooled async HTTP client shared by every worker
+FETCH_CONCURRENCY = _env_int("FETCH_CONCURRENCY", 64)
+FETCH_PER_HOST = _env_int("FETCH_PER_HOST", 4)
+FETCH_TIMEOUT = _env_float("FETCH_TIMEOUT", 30.0)
+FETCH_CONNECT_TIMEOUT = _env_float("FETCH_CONNECT_TIMEOUT", 10.0)
+# Bodies past this are dropped as too_large. Every in-flight fetch may hold this
+# much, so it bounds memory as well as bandwidth; data portals' HTML is far smaller.
+FETCH_MAX_BYTES = _env_int("FETCH_MAX_BYTES", 5_000_000)
+FETCH_MAX_REDIRECTS = _env_int("FETCH_MAX_REDIRECTS", 5)
+
+FETCH_RETRIES = _env_int("FETCH_RETRIES", 2)  # extra tries after a 429/503, timeout or reset
+
+# Per-host pacing (see politeness.py): requests/second per host start at HOST_RATE,
+# grow by HOST_RATE_STEP per success up to HOST_MAX_RATE (or robots Crawl-delay),
+# and halve on 429/503/timeouts. Requests that would wait longer than
+# HOST_MAX_WAIT seconds for their host are dropped as "host_backoff".
+HOST_RATE = _env_float("HOST_RATE", 1.0)
+HOST_MAX_RATE = _env_float("HOST_MAX_RATE", 4.0)
+HOST_MIN_RATE = _env_float("HOST_MIN_RATE", 0.05)
+HOST_RATE_STEP = _env_float("HOST_RATE_STEP", 0.1)
+HOST_BURST = _env_int("HOST_BURST", 2)
+HOST_MAX_WAIT = _env_float("HOST_MAX_WAIT", 60.0)
+ROBOTS_ENABLED = _env_bool("ROBOTS_ENABLED", True)
+ROBOTS_USER_AGENT = _env_str("ROBOTS_USER_AGENT", "*")
+ROBOTS_TTL = _env_float("ROBOTS_TTL", 24 * 3600.0)
+
+# On-disk response cache under DATA_DIR, shared by every session
+HTTP_CACHE_ENABLED = _env_bool("HTTP_CACHE_ENABLED", True)
+HTTP_CACHE_DIR = _env_str("HTTP_CACHE_DIR", os.path.join(DATA_DIR, "_cache", "http"))
+HTTP_CACHE_TTL = _env_float("HTTP_CACHE_TTL", 7 * 24 * 3600.0)
+HTTP_CACHE_MAX_BYTES = _env_int("HTTP_CACHE_MAX_BYTES", 2_000_000_000)
+
+# HTML decode + trafilatura + link harvest run in a process pool so they scale past the GIL.
+# PARSE_IN_PROCESSES=0 falls back to a thread pool (handy under debuggers).
+PARSE_IN_PROCESSES = _env_bool("PARSE_IN_PROCESSES", True)
+PARSE_WORKERS = _env_int("PARSE_WORKERS", os.cpu_count() or 4)
+
+# Session rows: "sqlite" (indexed by url and query), "parquet" (needs pyarrow) or "csv".
+# Buffered rows are written once STORE_FLUSH_ROWS pile up or STORE_FLUSH_SECONDS pass.
+STORE_BACKEND = _env_str("STORE_BACKEND", "sqlite")
+STORE_FLUSH_ROWS = _env_int("STORE_FLUSH_ROWS", 50)
+STORE_FLUSH_SECONDS = _env_float("STORE_FLUSH_SECONDS", 5.0)
+STORE_EXPORT_CSV = _env_bool("STORE_EXPORT_CSV", True)
+
+# Page texts go to a compressed archive under <session>/pages, one copy per distinct text
+ARCHIVE_CODEC = _env_str("ARCHIVE_CODEC", "zstd")  # falls back to gzip without zstandard
+ARCHIVE_SEGMENT_BYTES = _env_int("ARCHIVE_SEGMENT_BYTES", 64_000_000)
+
+# Query pipeline — workers per stage and the bound on each stage's inbox.
+# Search stays at one worker by default so Google sees the same pacing as before.
+# Fetch workers mostly sit waiting on the async engine, so there can be many.
+PIPELINE_SEARCH_WORKERS = _env_int("PIPELINE_SEARCH_WORKERS", 1)
+PIPELINE_FETCH_WORKERS = _env_int("PIPELINE_FETCH_WORKERS", 64)
+# Parse workers only hand pages to the parse pool and wait, so one per pool process.
+PIPELINE_PARSE_WORKERS = _env_int("PIPELINE_PARSE_WORKERS", PARSE_WORKERS)
+PIPELINE_FILTER_WORKERS = _env_int("PIPELINE_FILTER_WORKERS", 2)
+PIPELINE_EXTRACT_WORKERS = _env_int("PIPELINE_EXTRACT_WORKERS", 2)
+PIPELINE_FETCH_QUEUE_SIZE = _env_int("PIPELINE_FETCH_QUEUE_SIZE", 200)
+PIPELINE_PARSE_QUEUE_SIZE = _env_int("PIPELINE_PARSE_QUEUE_SIZE", 100)
+PIPELINE_FILTER_QUEUE_SIZE = _env_int("PIPELINE_FILTER_QUEUE_SIZE", 50)
+PIPELINE_EXTRACT_QUEUE_SIZE = _env_int("PIPELINE_EXTRACT_QUEUE_SIZE", 20)
+PIPELINE_SAVE_QUEUE_SIZE = _env_int("PIPELINE_SAVE_QUEUE_SIZE", 50)
+# Raw bodies fetched but not yet parsed, in bytes; fetch workers wait above it.
+# Queue sizes count pages, this keeps a run of large pages from piling up in RAM.
+PIPELINE_BODY_BUDGET = _env_int("PIPELINE_BODY_BUDGET", 128_000_000)
+
+# Download link probes (see link_probe.py): HEAD, or a one-byte ranged GET, per
+# verified link, on a connection pool of their own. Rows never wait for them;
+# late answers update the saved row, and the end of a run waits at most
+# PROBE_WAIT seconds for them. Links still unanswered then keep status 0.
+PROBE_ENABLED = _env_bool("PROBE_ENABLED", True)
+PROBE_CONCURRENCY = _env_int("PROBE_CONCURRENCY", 64)
+PROBE_PER_HOST = _env_int("PROBE_PER_HOST", 2)
+PROBE_TIMEOUT = _env_float("PROBE_TIMEOUT", 10.0)
+PROBE_WAIT = _env_float("PROBE_WAIT", 20.0)
+PROBE_BACKOFF = _env_float("PROBE_BACKOFF", 30.0)  # host pause after a 429/503 without Retry-After
+# Link -> probe result memo shared across sessions; timeouts and 429/503 are not kept
+PROBE_CACHE_ENABLED = _env_bool("PROBE_CACHE_ENABLED", True)
+PROBE_CACHE_PATH = _env_str("PROBE_CACHE_PATH", os.path.join(DATA_DIR, "_cache", "links.sqlite"))
+PROBE_CACHE_TTL = _env_float("PROBE_CACHE_TTL", 24 * 3600.0)
+PROBE_CACHE_MAX_ENTRIES = _env_int("PROBE_CACHE_MAX_ENTRIES", 200_000)
+
+# Topics run side by side by runner.run_topics, sharing the services above
+TOPIC_CONCURRENCY = _env_int("TOPIC_CONCURRENCY", 2)
+
+# Live metrics (per-stage latency histograms, in-flight gauges, LLM token
+# counters) over HTTP at /metrics (Prometheus) and /metrics.json. 0 = off;
+# the numbers still land in research_summary.json and the report.
+METRICS_PORT = _env_int("METRICS_PORT", 0)
+METRICS_HOST = _env_str("METRICS_HOST", "127.0.0.1")
+
+
+# Per-run overrides. runner.run_topic enters overrides(...) and every `config.X`
+# read in that context (and in threads started with a copy of it) sees the
+# override instead of the module value. Shared services — the fetch engine, the
+# LLM scheduler, the caches, the parse pool — are built once, from whichever run
+# creates them first.
+_overrides: contextvars.ContextVar[dict] = contextvars.ContextVar("config_overrides", default={})
+
+
+class _ConfigModule(types.ModuleType):
+    def __getattribute__(self, name):
+        active = _overrides.get()
+        if name in active:
+            return active[name]
+        return super().__getattribute__(name)
+
+
+def knobs() -> dict:
+    """Every setting (upper-case module attribute) with its current value."""
+    module = sys.modules[__name__]
+    return {k: getattr(module, k) for k in dir(module) if k.isupper()}
+
+
+@contextlib.contextmanager
+def overrides(**values):
+    unknown = sorted(set(values) - set(knobs()))
+    if unknown:
+        raise KeyError(f"Unknown config setting(s): {', '.join(unknown)}")
+    token = _overrides.set({**_overrides.get(), **values})
+    try:
+        yield
+    finally:
+        _overrides.reset(token)
+
+
+sys.modules[__name__].__class__ = _ConfigModule
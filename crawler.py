@@ -1,9 +1,30 @@
-import concurrent.futures
+import config
+import frontier
+import metrics
+import politeness
+import simhash
+from fetch_engine import FetchResponse, shared_engine
+from http_cache import shared_cache
+from parse_pool import shared_pool
+from politeness import FetchError
+from prefilter import CorpusRecorder, score_page
+from url_grounding import harvest_urls, normalize_page_url
 
-import trafilatura
 
-import config
-from url_grounding import harvest_urls
+# trafilatura treats anything shorter than this as a failed download
+_MIN_BODY_BYTES = 10
+
+
+# Relevance prompts: chars of page text per snippet, rough token costs for batching
+_SNIPPET_CHARS = 1200
+_VERDICT_TOKENS = 20
+_BATCH_PROMPT_TOKENS = 250
+
+_CACHE_COUNTERS = {
+    "hit": "http_cache_hits",
+    "revalidated": "http_cache_revalidated",
+    "": "http_cache_misses",
+}
 
 
 def _attach_verified_links(raw_llm: dict | None, candidates: list[str]) -> dict:
@@ -31,35 +52,108 @@ def _attach_verified_links(raw_llm: dict | None, candidates: list[str]) -> dict:
     return row
 
 
+def _merge_grounded(own: list[str], earlier: list[str], candidates: list[str]) -> list[str]:
+    """Links an earlier near-duplicate page picked, mapped onto this page's own candidates.
+
+    Exact matches carry over; otherwise a candidate with the same file name
+    (a mirror of the same download) stands in. Nothing off this page is added.
+    None when some earlier link has no counterpart here: the pages point at
+    different files after all, so the model should look at this one.
+    """
+    def file_name(url):
+        name = url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+        return name if "." in name else None
+
+    merged = list(own)
+    by_name = {}
+    for url in candidates:
+        by_name.setdefault(file_name(url), url)
+    by_name.pop(None, None)
+    for url in earlier:
+        mapped = url if url in candidates else by_name.get(file_name(url))
+        if mapped is None:
+            return None
+        if mapped not in merged:
+            merged.append(mapped)
+    return merged
+
+
 class ContentFetcher:
-    def fetch_url(self, url):
-        """Grab HTML via trafilatura; body text can be empty but we still keep HTML for link parsing."""
+    def __init__(self, engine=None, cache=None):
+        self.engine = engine or shared_engine()
+        self.cache = cache if cache is not None else shared_cache()
+
+    def get(self, url):
+        """Raw response, cache first, then the shared engine.
+
+        Errors, non-200s and empty/oversized bodies raise FetchError with a reason
+        (see politeness.py).
+        """
         try:
-            downloaded = trafilatura.fetch_url(url)
-            if not downloaded:
-                return None
-            text = trafilatura.extract(
-                downloaded, include_comments=False, include_tables=True
-            )
-            return {
-                "url": url,
-                "text": text or "",
-                "raw_html": downloaded,
-            }
-        except Exception:
-            return None
+            resp = self._download(url)
+        except FetchError:
+            raise
+        except Exception as e:
+            raise FetchError(politeness.OTHER, url, f"{type(e).__name__}: {e}") from e
+        reason = self.unusable_reason(resp)
+        if reason:
+            raise FetchError(reason, url, f"status {resp.status}")
+        return resp
+
+    def _download(self, url):
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            body = self.cache.read(entry)
+            if body is not None:
+                return FetchResponse(url, entry.final_url, 200, body, cache="hit")
+
+        resp = self.engine.fetch(url, self.cache.validators(entry) if entry else None)
+        if resp.status == 304 and entry:
+            body = self.cache.read(entry)
+            if body is None:
+                resp = self.engine.fetch(url)
+            else:
+                self.cache.refresh(entry)
+                return FetchResponse(url, entry.final_url, 200, body, cache="revalidated")
+
+        if self.cache and self.usable(resp):
+            self.cache.store(url, resp)
+        return resp
+
+    @staticmethod
+    def unusable_reason(resp):
+        """None for a page worth parsing, else the FetchError reason."""
+        if resp.status != 200:
+            return politeness.http_reason(resp.status)
+        if resp.truncated:
+            return politeness.TOO_LARGE
+        if len(resp.body) < _MIN_BODY_BYTES:
+            return politeness.EMPTY
+        return None
+
+    @classmethod
+    def usable(cls, resp):
+        return resp is not None and cls.unusable_reason(resp) is None
 
 
 class FilterAgent:
     def __init__(self, llm_engine):
         self.llm = llm_engine
+        self.batch_size = max(1, min(config.RELEVANCE_BATCH_SIZE, self._context_fit()))
+
+    @staticmethod
+    def _context_fit():
+        """How many snippets (plus their verdicts) fit in the model context at ~4 chars/token."""
+        per_snippet = _SNIPPET_CHARS // 4 + _VERDICT_TOKENS + 10
+        room = config.OLLAMA_NUM_CTX - _BATCH_PROMPT_TOKENS
+        return max(1, room // per_snippet)
 
     def is_relevant(self, query, article_text):
         """Quick yes/no pass before we burn tokens on full extraction."""
         if not article_text:
             return False
 
-        snippet = article_text[:1200]
+        snippet = article_text[:_SNIPPET_CHARS]
         prompt = f"""Snippet from a web page:
 \"\"\"{snippet}\"\"\"
 
@@ -69,56 +163,231 @@ Ignore pure opinion/blog unless it embeds data tables or download links.
 Answer ONLY valid JSON (no other text):
 {{"relevant": true or false, "reason": "short phrase"}}"""
 
-        response = self.llm.generate_json(prompt, max_tokens=120)
+        response = self.llm.generate_json(
+            prompt, max_tokens=120, until_fields=("relevant",)
+        )
         if response and isinstance(response, dict):
             return bool(response.get("relevant", False))
         return False
 
+    def are_relevant(self, query, texts):
+        """Batch version of is_relevant: one call per batch_size snippets, verdicts by index.
+
+        Snippets the batch answer leaves out (or a batch that won't parse) fall back
+        to single calls. The batch size halves after a bad answer and creeps back up
+        after good ones, never past what fits in OLLAMA_NUM_CTX.
+        """
+        verdicts = [False] * len(texts)
+        todo = [i for i, t in enumerate(texts) if t]
+        while todo:
+            chunk, todo = todo[: self.batch_size], todo[self.batch_size :]
+            if len(chunk) == 1:
+                verdicts[chunk[0]] = self.is_relevant(query, texts[chunk[0]])
+                continue
+
+            answered = self._judge_batch(query, [texts[i] for i in chunk])
+            if len(answered) == len(chunk):
+                self.batch_size = min(
+                    self.batch_size + 1, config.RELEVANCE_BATCH_SIZE, self._context_fit()
+                )
+            else:
+                self.batch_size = max(1, self.batch_size // 2)
+            for pos, i in enumerate(chunk):
+                if pos in answered:
+                    verdicts[i] = answered[pos]
+                else:
+                    verdicts[i] = self.is_relevant(query, texts[i])
+        return verdicts
+
+    def _judge_batch(self, query, texts):
+        """{position: verdict} for every snippet the model answered cleanly."""
+        blocks = "\n\n".join(
+            f"[{i}]\n\"\"\"{t[:_SNIPPET_CHARS]}\"\"\"" for i, t in enumerate(texts)
+        )
+        prompt = f"""Snippets from {len(texts)} different web pages, numbered [0] to [{len(texts) - 1}]:
+
+{blocks}
+
+Task: For EACH snippet, does that page likely contain a DOWNLOADABLE DATASET, RAW DATA TABLES, or API / bulk data access related to: "{query}"?
+Ignore pure opinion/blog unless it embeds data tables or download links.
+
+Answer ONLY valid JSON (no other text), one entry per snippet:
+{{"verdicts": [{{"index": 0, "relevant": true or false}}, ...]}}"""
+
+        response = self.llm.generate_json(
+            prompt,
+            max_tokens=_VERDICT_TOKENS * len(texts) + 40,
+            until_fields=("verdicts",),
+        )
+        items = response.get("verdicts") if isinstance(response, dict) else None
+        answered = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            idx, rel = item.get("index"), item.get("relevant")
+            if isinstance(idx, int) and 0 <= idx < len(texts) and isinstance(rel, bool):
+                answered[idx] = rel
+        return answered
+
 
 class LinkAnalyzer:
-    def __init__(self, llm_engine):
+    def __init__(self, llm_engine, journal=None):
         self.fetcher = ContentFetcher()
+        self.parser = shared_pool()
         self.llm = llm_engine
         self.filter = FilterAgent(llm_engine)
+        self.frontier = frontier.SeenFrontier(journal)
+        # text fingerprint -> (url, LLM extraction, verified links) of pages extracted so far
+        self.near_dups = (
+            simhash.NearDupIndex(config.SIMHASH_MAX_DISTANCE) if config.SIMHASH_ENABLED else None
+        )
+        # Pages a resumed session already judged relevant but never saved
+        self.prejudged = set()
+        self.recorder = (
+            CorpusRecorder(config.RELEVANCE_CORPUS_PATH)
+            if config.RELEVANCE_CORPUS_PATH
+            else None
+        )
+
+    def resume(self, verdicts, saved_keys):
+        """Carry over an interrupted session's verdicts (see journal.SessionJournal.url_verdicts).
+
+        Irrelevant pages, and relevant ones whose row made it to the store, are
+        skipped outright. Relevant pages that were never saved get fetched again
+        but skip the relevance call; failed fetches get another try.
+        """
+        settled = {}
+        for key, verdict in verdicts.items():
+            if verdict == frontier.IRRELEVANT or (
+                verdict == frontier.RELEVANT and key in saved_keys
+            ):
+                settled[key] = verdict
+            elif verdict == frontier.RELEVANT:
+                self.prejudged.add(key)
+        self.frontier.restore(settled)
+
+    def fresh_links(self, links, run=None):
+        """Drop URLs an earlier query already claimed; their verdict stands for the session."""
+        fresh = [url for url in links if self.frontier.claim(url) is None]
+        if run and len(fresh) < len(links):
+            run.bump("frontier_skipped", len(links) - len(fresh))
+        return fresh
+
+    def download(self, url, run=None):
+        """Network half of a fetch; None (and a failure tick) when nothing usable came back.
+
+        Waits first while the LLM queue is full, so fetching can't run far ahead of the model.
+        """
+        with metrics.timed("fetch.backpressure"):
+            self.llm.wait_for_room()
+        try:
+            with metrics.timed("fetch"):
+                resp = self.fetcher.get(url)
+        except FetchError as e:
+            resp = None
+            self.frontier.record(url, frontier.FAILED)
+            if run:
+                run.fail(e.reason)
+        if run and resp is not None and self.fetcher.cache:
+            run.bump(_CACHE_COUNTERS[resp.cache])
+        return resp
+
+    def parse(self, url, resp, run=None):
+        """CPU half of a fetch, done in the parse pool: {url, text, candidates}, no raw HTML."""
+        try:
+            with metrics.timed("parse"):
+                payload = self.parser.parse(url, resp.body)
+        except Exception:
+            payload = None
+        for step, seconds in (payload or {}).pop("timings", {}).items():
+            metrics.observe(step, seconds)
+        if not payload:
+            self.frontier.record(url, frontier.FAILED)
+        if run:
+            if payload:
+                run.bump("pages_fetched")
+            else:
+                run.fail(politeness.PARSE)
+        return payload
+
+    def judge_many(self, query, payloads, run=None):
+        """Relevance gate for a batch of payloads from the same query.
+
+        The local pre-filter settles clear-cut pages; only the rest cost an LLM call.
+        With RELEVANCE_CORPUS_PATH set it runs in shadow mode instead: the LLM judges
+        every page and each verdict is stored next to the local score.
+        """
+        verdicts = [None] * len(payloads)
+        scores = [None] * len(payloads)
+        for i, payload in enumerate(payloads):
+            print(f"Analyzing content from: {payload['url']}")
+            if not payload["text"]:
+                verdicts[i] = False
+            elif normalize_page_url(payload["url"]) in self.prejudged:
+                verdicts[i] = True
+            elif config.PREFILTER_ENABLED or self.recorder:
+                scores[i] = score_page(
+                    query, payload["url"], payload["text"], payload.get("candidates") or []
+                )
+                if not self.recorder:
+                    verdicts[i] = scores[i].verdict()
+                    if run and verdicts[i] is not None:
+                        run.bump("prefilter_accepted" if verdicts[i] else "prefilter_rejected")
+
+        ask = [i for i, v in enumerate(verdicts) if v is None]
+        with metrics.timed("relevance"):
+            if len(ask) == 1:
+                verdicts[ask[0]] = self.filter.is_relevant(query, payloads[ask[0]]["text"])
+            elif ask:
+                answers = self.filter.are_relevant(query, [payloads[i]["text"] for i in ask])
+                for i, relevant in zip(ask, answers):
+                    verdicts[i] = relevant
+        if self.recorder:
+            for i in ask:
+                self.recorder.record(query, payloads[i], scores[i], verdicts[i])
+
+        for payload, relevant in zip(payloads, verdicts):
+            if not relevant:
+                self.frontier.record(payload["url"], frontier.IRRELEVANT)
+                continue
+            self.frontier.record(payload["url"], frontier.RELEVANT)
+            if run:
+                run.bump("pages_relevant")
+            print(f"Found relevant data: {payload['url']}")
+        return verdicts
+
+    def extract(self, query, payload, run=None):
+        """Let the model pick among the page's candidate URLs (harvested here if parse didn't).
+
+        A page whose text is a near-duplicate of one already extracted this session
+        (see simhash.py) reuses that answer instead of calling the model again.
+        """
+        candidates = payload.get("candidates")
+        if candidates is None:
+            candidates = harvest_urls(
+                payload["url"],
+                payload.pop("raw_html", None),
+                payload.get("text"),
+                config.MAX_CANDIDATE_URLS,
+            )
+        fp = simhash.fingerprint(payload["text"]) if self.near_dups is not None else None
+        match = self.near_dups.find(fp) if fp is not None else None
+        if match:
+            bits, (source, extracted, verified) = match
+            row = _attach_verified_links(extracted, candidates)
+            links = _merge_grounded(row["verified_download_links"], verified, candidates)
+            if links is not None:
+                print(f"Near-duplicate of {source} ({bits} bits apart), reusing its extraction")
+                row["verified_download_links"] = row["download_links"] = links
+                payload.update(row)
+                if run:
+                    run.bump("extractions_saved")
+                return payload
 
-    def process_links(self, query, links, run=None):
-        """Fetch in parallel, relevance filter, then structured pull with grounded URLs."""
-        kept = []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as pool:
-            pending = {pool.submit(self.fetcher.fetch_url, url): url for url in links}
-
-            for future in concurrent.futures.as_completed(pending):
-                url = pending[future]
-                try:
-                    payload = future.result()
-                    if not payload:
-                        if run:
-                            run.fetch_failures += 1
-                        continue
-
-                    if run:
-                        run.pages_fetched += 1
-
-                    print(f"Analyzing content from: {url}")
-                    if self.filter.is_relevant(query, payload["text"]):
-                        if run:
-                            run.pages_relevant += 1
-                        print(f"Found relevant data: {url}")
-
-                        candidates = harvest_urls(
-                            payload["url"],
-                            payload.get("raw_html"),
-                            payload.get("text"),
-                            config.MAX_CANDIDATE_URLS,
-                        )
-
-                        extracted = self.llm.extract_info(
-                            payload["text"], query, candidates
-                        )
-                        payload.update(_attach_verified_links(extracted, candidates))
-                        kept.append(payload)
-                except Exception as e:
-                    print(f"Error analyzing {url}: {e}")
-
-        return kept
+        with metrics.timed("extract"):
+            extracted = self.llm.extract_info(payload["text"], query, candidates)
+        payload.update(_attach_verified_links(extracted, candidates))
+        if fp is not None and extracted:
+            selected = {k: v for k, v in extracted.items() if k != "selected_indices"}
+            self.near_dups.add(fp, (payload["url"], selected, payload["verified_download_links"]))
+        return payload
@@ -4,12 +4,25 @@ import time
 from datetime import datetime
 from typing import Any, Dict, Optional
 
-import pandas as pd
-
 import config
+import metrics
+import storage
+from page_archive import PageArchive
 from session_stats import RunTotals
 from url_grounding import normalize_page_url
 
+_SECTION_TITLES = {
+    "http_cache": "HTTP cache",
+    "fetch_failure_reasons": "Fetch failures by reason",
+    "host_pacing": "Host pacing",
+    "search": "Search providers",
+    "prompt_budget": "Extraction prompt budget",
+    "llm_cache": "LLM cache",
+    "llm_scheduler": "LLM scheduler",
+    "page_archive": "Page archive",
+    "link_probe": "Download link checks",
+}
+
 
 class DataManager:
     def __init__(
@@ -22,89 +35,106 @@ class DataManager:
         self.session_dir = os.path.join(config.DATA_DIR, session_id)
         os.makedirs(self.session_dir, exist_ok=True)
         self.csv_file = os.path.join(self.session_dir, "dataset.csv")
-        self.pending_rows = []
+        self.store = storage.open_store(self.session_dir)
+        self.archive = PageArchive(self.session_dir)
         self.already_saved = set()
         self.run = run
 
     def save_article(self, query: str, article_data: dict) -> bool:
-        """Write the txt snapshot + queue a CSV row. False means we skipped a duplicate page."""
+        """Archive the page text + append a store row. False means we skipped a duplicate page."""
         page_url = article_data.get("url") or ""
         key = normalize_page_url(page_url)
         if key in self.already_saved:
             if self.run:
-                self.run.duplicates_skipped += 1
+                self.run.bump("duplicates_skipped")
             return False
         self.already_saved.add(key)
 
-        safe_query = "".join([c if c.isalnum() else "_" for c in query])[:50]
-        query_dir = os.path.join(self.session_dir, safe_query)
-        os.makedirs(query_dir, exist_ok=True)
+        with metrics.timed("store.save"):
+            self._append(query, page_url, article_data)
 
-        filename = "".join([c if c.isalnum() else "_" for c in page_url])[-50:] + ".txt"
-        file_path = os.path.join(query_dir, filename)
+        if self.run:
+            self.run.bump("records_saved")
+            self.run.track_source(page_url)
 
-        verified = article_data.get("verified_download_links") or article_data.get(
-            "download_links", []
-        )
+        return True
+
+    def spill(self, article_data: dict) -> dict:
+        """Move an extracted page's text into the archive ahead of save_article.
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(f"URL: {page_url}\n")
-            f.write(f"Query: {query}\n")
-            f.write(f"Dataset Name: {article_data.get('dataset_name', 'N/A')}\n")
-            f.write(f"Formats: {article_data.get('formats', [])}\n")
-            f.write(f"Verified download links (grounded): {verified}\n")
-            f.write(f"Candidates offered to model: {article_data.get('candidates_count', 0)}\n")
-            f.write(f"License: {article_data.get('license', 'Unknown')}\n")
-            f.write(f"Description: {article_data.get('description', 'N/A')}\n")
-            f.write("-" * 80 + "\n")
-            f.write(article_data.get("text") or "")
+        Rows can wait a while to be saved in query order; this way they wait
+        without the page text (or the candidate list, which extraction is done
+        with). save_article links the stored text to the URL as usual.
+        """
+        if "content_hash" not in article_data:
+            article_data["content_hash"] = self.archive.put_text(article_data.pop("text", ""))
+        article_data.pop("candidates", None)
+        return article_data
+
+    def _append(self, query: str, page_url: str, article_data: dict) -> None:
+        digest = article_data.get("content_hash")
+        if digest:
+            self.archive.link(page_url, digest, query)
+        else:
+            digest = self.archive.put(page_url, article_data.get("text") or "", query)
 
         saved_at = datetime.now().isoformat(timespec="seconds")
 
-        self.pending_rows.append(
+        self.store.append(
             {
                 "query": query,
                 "url": page_url,
                 "source_url": page_url,
                 "dataset_name": article_data.get("dataset_name", "N/A"),
-                "formats": str(article_data.get("formats", [])),
-                "verified_download_links": str(
-                    article_data.get("verified_download_links", [])
+                "description": article_data.get("description", "N/A"),
+                "formats": list(article_data.get("formats") or []),
+                "verified_download_links": list(
+                    article_data.get("verified_download_links") or []
                 ),
-                "download_links": str(article_data.get("download_links", [])),
+                "download_links": list(article_data.get("download_links") or []),
                 "candidates_count": article_data.get("candidates_count", 0),
                 "license": article_data.get("license", "Unknown"),
                 "relevance": article_data.get("relevance_score", 0),
                 "saved_at": saved_at,
-                "local_path": file_path,
+                "content_hash": digest,
+                "local_path": self.archive.locator(digest),
+                **self._probe_fields(article_data),
             }
         )
 
-        if self.run:
-            self.run.records_saved += 1
-            self.run.track_source(page_url)
-
-        if len(self.pending_rows) >= 10:
-            self.flush_csv()
+    @staticmethod
+    def _probe_fields(article_data: dict) -> Dict[str, list]:
+        return {c: list(article_data.get(c) or []) for c in storage.PROBE_COLUMNS}
 
-        return True
+    def update_links(self, article_data: dict) -> None:
+        """Write link probe answers that arrived after the row was saved."""
+        self.store.update(article_data.get("url") or "", self._probe_fields(article_data))
 
-    def flush_csv(self):
-        if not self.pending_rows:
-            return
-
-        chunk = pd.DataFrame(self.pending_rows)
-        if os.path.exists(self.csv_file):
-            chunk.to_csv(self.csv_file, mode="a", header=False, index=False)
-        else:
-            chunk.to_csv(self.csv_file, index=False)
+    def resume(self) -> None:
+        """Reload what an interrupted run of this session already saved."""
+        rows = self.store.load()
+        self.already_saved = {normalize_page_url(u) for u in rows["url"]}
+        if self.run:
+            self.run.restore(
+                {
+                    "records_saved": len(rows),
+                    "saved_sources": list(dict.fromkeys(rows["url"])),
+                }
+            )
 
-        self.pending_rows = []
+    def flush(self) -> None:
+        with metrics.timed("store.flush"):
+            self.store.flush()
 
     def close(self) -> None:
-        self.flush_csv()
+        if config.STORE_EXPORT_CSV:
+            with metrics.timed("store.export_csv"):
+                self.store.export_csv(self.csv_file)
+        self.store.close()
         if self.run:
+            self.run.stats["page_archive"] = self.archive.stats()
             self._write_reports()
+        self.archive.close()
 
     def _write_reports(self) -> None:
         assert self.run is not None
@@ -115,12 +145,36 @@ class DataManager:
         cfg_snapshot: Dict[str, Any] = {
             "OLLAMA_BASE_URL": config.OLLAMA_BASE_URL,
             "OLLAMA_MODEL": config.OLLAMA_MODEL,
+            "OLLAMA_NUM_PARALLEL": config.OLLAMA_NUM_PARALLEL,
             "MAX_SEARCH_QUERIES": config.MAX_SEARCH_QUERIES,
             "MAX_RESULTS_PER_QUERY": config.MAX_RESULTS_PER_QUERY,
             "MAX_CANDIDATE_URLS": config.MAX_CANDIDATE_URLS,
+            "HTTP_CACHE_ENABLED": config.HTTP_CACHE_ENABLED,
+            "HTTP_CACHE_TTL": config.HTTP_CACHE_TTL,
+            "HOST_RATE": config.HOST_RATE,
+            "HOST_MAX_RATE": config.HOST_MAX_RATE,
+            "ROBOTS_ENABLED": config.ROBOTS_ENABLED,
+            "LLM_CACHE_ENABLED": config.LLM_CACHE_ENABLED,
+            "SEARCH_PROVIDERS": config.SEARCH_PROVIDERS,
+            "QUERY_DEDUP_THRESHOLD": (
+                config.QUERY_DEDUP_THRESHOLD if config.QUERY_DEDUP_ENABLED else None
+            ),
+            "SEARCH_CACHE_ENABLED": config.SEARCH_CACHE_ENABLED,
+            "EXTRACT_CONTENT_TOKENS": (
+                config.EXTRACT_CONTENT_TOKENS if config.EXTRACT_PROMPT_BUDGET else None
+            ),
+            "SIMHASH_MAX_DISTANCE": (
+                config.SIMHASH_MAX_DISTANCE if config.SIMHASH_ENABLED else None
+            ),
+            "PREFILTER_ENABLED": config.PREFILTER_ENABLED,
+            "PREFILTER_ACCEPT_SCORE": config.PREFILTER_ACCEPT_SCORE,
+            "PREFILTER_REJECT_SCORE": config.PREFILTER_REJECT_SCORE,
+            "STORE_BACKEND": config.STORE_BACKEND,
+            "PROBE_ENABLED": config.PROBE_ENABLED,
         }
 
         by_domain = dict(self.run.by_hostname())
+        session_metrics = metrics.current()
         summary = {
             "topic": self.run.topic,
             "session_dir": self.session_dir,
@@ -129,21 +183,44 @@ class DataManager:
             "duration_seconds": round(ended - self.run.started_at, 2),
             "counts": {
                 "queries_executed": self.run.queries_executed,
+                "queries_merged": sum(len(v) for v in self.run.queries_merged.values()),
                 "search_hits_total": self.run.search_hits_total,
                 "pages_fetched": self.run.pages_fetched,
                 "pages_relevant": self.run.pages_relevant,
+                "prefilter_accepted": self.run.prefilter_accepted,
+                "prefilter_rejected": self.run.prefilter_rejected,
+                "relevance_llm_calls_avoided": (
+                    self.run.prefilter_accepted + self.run.prefilter_rejected
+                ),
                 "records_saved": self.run.records_saved,
                 "duplicates_skipped": self.run.duplicates_skipped,
+                "frontier_skipped": self.run.frontier_skipped,
+                "extractions_saved": self.run.extractions_saved,
                 "fetch_failures": self.run.fetch_failures,
                 "search_failures": self.run.search_failures,
             },
+            "http_cache": self.run.http_cache_stats(),
+            "fetch_failure_reasons": dict(
+                sorted(self.run.fetch_failure_reasons.items(), key=lambda x: -x[1])
+            ),
+            **self.run.stats,
+            "stage_times": session_metrics.breakdown() if session_metrics else {},
+            "llm_throughput": session_metrics.llm_throughput() if session_metrics else {},
             "by_domain": by_domain,
             "sources": self.run.saved_sources,
             "queries_no_results": self.run.queries_no_results,
+            "queries_merged": self.run.queries_merged,
             "config": cfg_snapshot,
             "methodology_note": (
                 "Download targets are grounded: only URLs harvested from each page may "
                 "appear as verified_download_links; the LLM selects candidate indices only."
+                + (
+                    " Each verified link was then probed (HEAD, or a one-byte ranged GET); "
+                    "link_status, link_content_type, link_content_length and "
+                    "link_last_modified hold the answers, status 0 meaning none came back."
+                    if config.PROBE_ENABLED
+                    else ""
+                )
             ),
         }
 
@@ -166,6 +243,48 @@ class DataManager:
         for k, v in summary["counts"].items():
             lines.append(f"| {k.replace('_', ' ')} | {v} |")
 
+        for section in ["http_cache", "fetch_failure_reasons", *self.run.stats]:
+            if not summary[section]:
+                continue
+            title = _SECTION_TITLES.get(section, section.replace("_", " ").capitalize())
+            lines.extend(["", f"## {title}", ""])
+            lines.extend(["| Metric | Value |", "|--------|-------|"])
+            for k, v in summary[section].items():
+                lines.append(f"| {k.replace('_', ' ')} | {v} |")
+
+        if summary["stage_times"]:
+            lines.extend(["", "## Where the time went", ""])
+            lines.append(
+                "Stages overlap (threads, processes), so the totals add up to more than "
+                "the wall-clock duration."
+            )
+            lines.extend(
+                [
+                    "",
+                    "| Stage | Calls | Total s | Mean ms | p95 ms | Max ms |",
+                    "|-------|-------|---------|---------|--------|--------|",
+                ]
+            )
+            for name, t in summary["stage_times"].items():
+                lines.append(
+                    f"| {name} | {t['calls']} | {t['total_s']} | {t['mean_ms']} "
+                    f"| {t['p95_ms']} | {t['max_ms']} |"
+                )
+
+        if summary["llm_throughput"]:
+            lines.extend(["", "## LLM throughput", ""])
+            lines.extend(
+                [
+                    "| Lane | Calls | Prompt tokens | Prompt tok/s | Generated tokens | Gen tok/s |",
+                    "|------|-------|---------------|--------------|------------------|-----------|",
+                ]
+            )
+            for lane, t in summary["llm_throughput"].items():
+                lines.append(
+                    f"| {lane} | {t['calls']} | {t['prompt_tokens']} | {t['prompt_tokens_per_s']} "
+                    f"| {t['eval_tokens']} | {t['eval_tokens_per_s']} |"
+                )
+
         lines.extend(
             [
                 "",
@@ -192,6 +311,11 @@ class DataManager:
             for q in self.run.queries_no_results[:40]:
                 lines.append(f"- `{q}`")
 
+        if self.run.queries_merged:
+            lines.extend(["", "## Near-duplicate queries merged", ""])
+            for kept, variants in self.run.queries_merged.items():
+                lines.append(f"- `{kept}` ← " + ", ".join(f"`{v}`" for v in variants))
+
         lines.extend(
             [
                 "",
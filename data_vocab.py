@@ -0,0 +1,30 @@
+"""Words and URL patterns that mark data pages, shared by link ranking and page scoring.
+
+url_grounding ranks candidate links with DATA_HINT_RE, prefilter scores pages
+with all four, and prompt_budget uses the same vocabulary to pick passages.
+"""
+
+from __future__ import annotations
+
+import re
+
+# A candidate link that looks like a data file or a download/API endpoint
+DATA_HINT_RE = re.compile(
+    r"\.(?:csv|json|jsonl|parquet|zip|gz|tgz|tar|tsv|sqlite|db)(?:\?|$)|"
+    r"(?:download|dataset|dump|api|blob|raw)",
+    re.I,
+)
+# A link (or a file name in the text) that points at a data file
+DATA_FILE_RE = re.compile(
+    r"\.(?:csv|json|jsonl|parquet|zip|gz|tgz|tar|tsv|sqlite|db|xlsx?|xml|h5|nc)(?:\?|$)",
+    re.I,
+)
+DATA_WORDS = frozenset(
+    "dataset datasets data csv json parquet download downloads api records columns rows "
+    "schema license corpus dump bulk table tables zip".split()
+)
+# Query words that say nothing about the topic
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is of on or the to with dataset datasets "
+    "data download".split()
+)
@@ -0,0 +1,199 @@
+"""Shared asyncio HTTP client for page fetches.
+
+One aiohttp session (and its keep-alive connection pool) lives on a background
+event loop for the whole process. Worker threads hand it URLs and block on the
+result, so connections are reused across pages, queries and topics. Every
+request first takes a slot from the per-host scheduler in politeness.py, and
+429/503s and network errors are retried up to FETCH_RETRIES times.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import aiohttp
+
+import config
+from politeness import (
+    BACKOFF_STATUSES,
+    CONNECTION,
+    REDIRECTS,
+    TIMEOUT,
+    FetchError,
+    HostScheduler,
+)
+
+_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass
+class FetchResponse:
+    url: str
+    final_url: str
+    status: int
+    body: bytes
+    # lower-cased header names
+    headers: Dict[str, str] = field(default_factory=dict)
+    truncated: bool = False
+    # "hit" / "revalidated" when the body came out of the HTTP cache
+    cache: str = ""
+
+
+class FetchEngine:
+    """Global + per-host connection limits, timeouts and a streaming body cap."""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_redirects: Optional[int] = None,
+    ):
+        self.concurrency = concurrency or config.FETCH_CONCURRENCY
+        self.per_host = per_host or config.FETCH_PER_HOST
+        self.timeout = timeout or config.FETCH_TIMEOUT
+        self.connect_timeout = connect_timeout or config.FETCH_CONNECT_TIMEOUT
+        self.max_bytes = max_bytes or config.FETCH_MAX_BYTES
+        self.max_redirects = max_redirects or config.FETCH_MAX_REDIRECTS
+
+        self.hosts = HostScheduler(self._get_robots)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="fetch-engine", daemon=True
+        )
+        self._thread.start()
+        self._session: aiohttp.ClientSession = self._run(self._open_session())
+        self._closed = False
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _open_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.timeout, sock_connect=self.connect_timeout
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={
+                "User-Agent": config.USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+                "Accept-Encoding": "gzip, deflate",
+            },
+        )
+
+    async def fetch_async(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> FetchResponse:
+        """Polite GET with retries. Network failures raise FetchError; HTTP errors come back as responses."""
+        attempts = 1 + max(0, config.FETCH_RETRIES)
+        attempt = 0
+        while True:
+            attempt += 1
+            last = attempt >= attempts
+            await self.hosts.acquire(url)
+            try:
+                resp = await self._get(url, headers)
+            except asyncio.TimeoutError:
+                self.hosts.feedback(url, 0)
+                if last:
+                    raise FetchError(TIMEOUT, url)
+                continue
+            except aiohttp.TooManyRedirects:
+                raise FetchError(REDIRECTS, url)
+            except aiohttp.ClientError as e:
+                self.hosts.feedback(url, 0)
+                if last:
+                    raise FetchError(CONNECTION, url, type(e).__name__)
+                continue
+            self.hosts.feedback(url, resp.status, resp.headers.get("retry-after"))
+            if resp.status not in BACKOFF_STATUSES or last:
+                return resp
+
+    async def _get(self, url: str, headers: Optional[Dict[str, str]]) -> FetchResponse:
+        """Stream the body and stop reading once it passes max_bytes."""
+        async with self._session.get(
+            url,
+            headers=headers,
+            allow_redirects=True,
+            max_redirects=self.max_redirects,
+        ) as resp:
+            chunks: List[bytes] = []
+            size = 0
+            truncated = False
+            if resp.content_length and resp.content_length > self.max_bytes:
+                truncated = True
+            else:
+                async for chunk in resp.content.iter_chunked(_CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        truncated = True
+                        break
+                    chunks.append(chunk)
+            return FetchResponse(
+                url=url,
+                final_url=str(resp.url),
+                status=resp.status,
+                body=b"".join(chunks),
+                headers={k.lower(): v for k, v in resp.headers.items()},
+                truncated=truncated,
+            )
+
+    async def _get_robots(self, origin: str) -> Optional[str]:
+        """robots.txt for scheme://host[:port]; None when there is none to obey."""
+        resp = await self._get(f"{origin}/robots.txt", None)
+        if resp.status != 200 or resp.truncated:
+            return None
+        return resp.body.decode("utf-8", errors="replace")
+
+    async def _host_stats(self):
+        return self.hosts.stats()
+
+    def host_stats(self) -> Dict[str, object]:
+        """HostScheduler.stats(), read on the engine loop."""
+        return self._run(self._host_stats())
+
+    def submit(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> concurrent.futures.Future:
+        """Schedule a fetch on the engine loop; the future resolves to a FetchResponse."""
+        return asyncio.run_coroutine_threadsafe(self.fetch_async(url, headers), self._loop)
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        return self.submit(url, headers).result()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._run(self._session.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+_shared: Optional[FetchEngine] = None
+_shared_lock = threading.Lock()
+
+
+def shared_engine() -> FetchEngine:
+    """Process-wide engine so keep-alive connections survive across queries."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = FetchEngine()
+            atexit.register(_shared.close)
+        return _shared
@@ -0,0 +1,50 @@
+"""Session-wide memory of every page URL we have already claimed, and what came of it."""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, Optional
+
+from url_grounding import normalize_page_url
+
+PENDING = "pending"
+FAILED = "failed"
+IRRELEVANT = "irrelevant"
+RELEVANT = "relevant"
+
+
+class SeenFrontier:
+    """Keyed by normalize_page_url, so search-engine variants of one page collapse."""
+
+    def __init__(self, journal=None):
+        self._verdicts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.journal = journal
+
+    def claim(self, url: str) -> Optional[str]:
+        """Take ownership of a URL. Returns None for a new one, else the earlier verdict."""
+        key = normalize_page_url(url)
+        with self._lock:
+            prior = self._verdicts.get(key)
+            if prior is None:
+                self._verdicts[key] = PENDING
+            return prior
+
+    def record(self, url: str, verdict: str) -> None:
+        with self._lock:
+            self._verdicts[normalize_page_url(url)] = verdict
+        if self.journal and verdict != PENDING:
+            self.journal.record_url(url, verdict)
+
+    def restore(self, verdicts: Dict[str, str]) -> None:
+        """Preload verdicts (keyed by normalize_page_url) from an earlier run."""
+        with self._lock:
+            self._verdicts.update(verdicts)
+
+    def verdict(self, url: str) -> Optional[str]:
+        with self._lock:
+            return self._verdicts.get(normalize_page_url(url))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._verdicts)
@@ -0,0 +1,201 @@
+"""On-disk HTTP response cache shared by every session under config.DATA_DIR.
+
+Bodies are stored once per sha256 digest (content-addressed blobs); a small
+SQLite index maps normalize_page_url keys to a digest plus the validators we
+need for conditional requests (ETag / Last-Modified). Entries younger than the
+TTL are served without touching the network, older ones are revalidated, and
+the least recently used entries go first once the blobs pass the size budget.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import config
+from url_grounding import normalize_page_url
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+"""
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    final_url: str
+    digest: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class HttpCache:
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.root = root or config.HTTP_CACHE_DIR
+        self.ttl = config.HTTP_CACHE_TTL if ttl is None else ttl
+        self.max_bytes = max_bytes or config.HTTP_CACHE_MAX_BYTES
+        self.blob_dir = os.path.join(self.root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.root, "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._total = self._blob_bytes()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _blob_bytes(self) -> int:
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)"
+        ).fetchone()
+        return int(row[0])
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        key = normalize_page_url(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, final_url, digest, size, etag, last_modified, stored_at "
+                "FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    @staticmethod
+    def validators(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Headers for a conditional GET; empty when the entry has nothing to compare."""
+        headers: Dict[str, str] = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def read(self, entry: CacheEntry) -> Optional[bytes]:
+        """Body for an entry (None if the blob went missing) and bump its LRU stamp."""
+        try:
+            with open(self._blob_path(entry.digest), "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                (time.time(), entry.key),
+            )
+        return body
+
+    def refresh(self, entry: CacheEntry) -> None:
+        """Server said 304: the stored body is good for another TTL."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, entry.key),
+            )
+
+    def store(self, url: str, resp) -> None:
+        """Keep a 200 response unless the server asked us not to."""
+        if "no-store" in (resp.headers.get("cache-control") or "").lower():
+            return
+        digest = hashlib.sha256(resp.body).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+        # two fetches of the same body must not both count it, and eviction must
+        # not drop the blob between the write and the index row
+        with self._lock, self._db:
+            new_blob = not os.path.exists(path)
+            if new_blob:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(resp.body)
+                os.replace(tmp, path)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, final_url, digest, size, etag, last_modified, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_page_url(url),
+                    resp.final_url,
+                    digest,
+                    len(resp.body),
+                    resp.headers.get("etag"),
+                    resp.headers.get("last-modified"),
+                    now,
+                    now,
+                ),
+            )
+            if new_blob:
+                self._total += len(resp.body)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the blobs fit again (caller holds the lock)."""
+        self._total = self._blob_bytes()
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT key, digest FROM entries ORDER BY accessed_at ASC"
+        ).fetchall()
+        for key, digest in rows:
+            if self._total <= target:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            still_used = self._db.execute(
+                "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if still_used:
+                continue
+            path = self._blob_path(digest)
+            try:
+                self._total -= os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_shared: Optional[HttpCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> Optional[HttpCache]:
+    """The fetcher's response cache, built on first use; None if HTTP_CACHE_ENABLED is off."""
+    global _shared
+    if not config.HTTP_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpCache()
+        return _shared
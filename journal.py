@@ -0,0 +1,123 @@
+"""Durable record of a session's progress, so a crashed run can pick up where it stopped.
+
+journal.sqlite in the session directory holds the topic, the generated
+queries, each query's search results once fetched, and the frontier verdict of
+every URL that was judged. A query is marked done only after its rows are
+flushed to the row store, together with a snapshot of the RunTotals counters;
+`python main.py --resume <session_id>` replays the journal and runs just the
+queries that never got there, without searching or judging pages again.
+Counters come from the snapshot of the last finished query, so work that was
+in flight at the crash is counted again when it is redone.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from url_grounding import normalize_page_url
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    idx INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    links TEXT,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS urls (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+FILENAME = "journal.sqlite"
+
+
+def exists(session_dir: str) -> bool:
+    return os.path.exists(os.path.join(session_dir, FILENAME))
+
+
+class SessionJournal:
+    def __init__(self, session_dir: str):
+        self.path = os.path.join(session_dir, FILENAME)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def set_meta(self, key: str, value: Any) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+
+    def meta(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def record_queries(self, queries: List[str]) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO queries (idx, query) VALUES (?, ?)",
+                list(enumerate(queries)),
+            )
+
+    def queries(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT query FROM queries ORDER BY idx").fetchall()
+        return [r[0] for r in rows]
+
+    def done_queries(self) -> set:
+        with self._lock:
+            rows = self._db.execute("SELECT idx FROM queries WHERE done = 1").fetchall()
+        return {r[0] for r in rows}
+
+    def record_search(self, idx: int, links: List[str]) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE queries SET links = ? WHERE idx = ?", (json.dumps(links), idx)
+            )
+
+    def search_links(self, idx: int) -> Optional[List[str]]:
+        """Search results stored by an earlier run, or None if the query was never searched."""
+        with self._lock:
+            row = self._db.execute("SELECT links FROM queries WHERE idx = ?", (idx,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def finish_query(self, idx: int, totals: Dict[str, Any]) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE queries SET done = 1 WHERE idx = ?", (idx,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('totals', ?)",
+                (json.dumps(totals),),
+            )
+
+    def record_url(self, url: str, verdict: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO urls (key, url, verdict, updated_at) VALUES (?, ?, ?, ?)",
+                (normalize_page_url(url), url, verdict, time.time()),
+            )
+
+    def url_verdicts(self) -> Dict[str, str]:
+        """normalize_page_url key -> last frontier verdict."""
+        with self._lock:
+            rows = self._db.execute("SELECT key, verdict FROM urls").fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,86 @@
+"""Incremental reader for the top-level fields of a JSON object arriving token by token.
+
+feed() takes each streamed chunk; a field counts as resolved once its value is
+complete *and* followed by ',' or '}', so a number like 12 is never cut short
+of 123. done() turns true when every wanted field is in, or when the object
+closes, which is the signal to stop the generation early.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Collection, Dict, Optional
+
+_decoder = json.JSONDecoder()
+_WS = " \t\r\n"
+
+
+class JsonFieldScanner:
+    def __init__(self, wanted: Optional[Collection[str]] = None):
+        self.wanted = set(wanted or ())
+        self.fields: Dict[str, Any] = {}
+        self.closed = False
+        self._buf = ""
+        self._pos = -1  # -1 until the opening brace shows up
+        self._broken = False
+
+    def feed(self, chunk: str) -> bool:
+        self._buf += chunk
+        self._advance()
+        return self.done()
+
+    def done(self) -> bool:
+        if self._broken:
+            return False
+        if self.closed:
+            return True
+        return bool(self.wanted) and self.wanted.issubset(self.fields)
+
+    def _skip_ws(self, i: int) -> int:
+        while i < len(self._buf) and self._buf[i] in _WS:
+            i += 1
+        return i
+
+    def _advance(self) -> None:
+        if self._broken:
+            return
+        buf = self._buf
+        if self._pos < 0:
+            start = buf.find("{")
+            if start < 0:
+                return
+            self._pos = start + 1
+
+        while not self.closed:
+            i = self._skip_ws(self._pos)
+            if i >= len(buf):
+                return
+            if buf[i] == "}":
+                self.closed = True
+                self._pos = i + 1
+                return
+            if buf[i] == ",":
+                i = self._skip_ws(i + 1)
+                if i >= len(buf):
+                    return
+            try:
+                key, i = _decoder.raw_decode(buf, i)
+            except json.JSONDecodeError:
+                return
+            i = self._skip_ws(i)
+            if i >= len(buf):
+                return
+            if buf[i] != ":" or not isinstance(key, str):
+                # Not an object we understand; let the caller read the whole answer
+                self._broken = True
+                return
+            i = self._skip_ws(i + 1)
+            try:
+                value, end = _decoder.raw_decode(buf, i)
+            except json.JSONDecodeError:
+                return
+            end = self._skip_ws(end)
+            if end >= len(buf):
+                return
+            self.fields[key] = value
+            self._pos = end
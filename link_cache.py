@@ -0,0 +1,45 @@
+"""Persistent url -> probe result memo for link_probe.py, shared by every session.
+
+Download links repeat a lot across pages, queries and topics (the same portal
+files show up again and again), so a link is only asked about once per
+PROBE_CACHE_TTL. Transient answers (timeouts, 429/503) are never stored.
+Storage, expiry and the PROBE_CACHE_MAX_ENTRIES cap are sqlite_cache's.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Optional
+
+import config
+import sqlite_cache
+from sqlite_cache import SqliteCache
+
+
+class LinkCache(SqliteCache):
+    table = "probe_results"
+    columns = ("result",)
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        super().__init__(
+            path or config.PROBE_CACHE_PATH,
+            max_entries or config.PROBE_CACHE_MAX_ENTRIES,
+            ttl=config.PROBE_CACHE_TTL if ttl is None else ttl,
+        )
+
+    def get(self, url: str) -> Optional[dict]:
+        values = self.get_values(url)
+        return None if values is None else json.loads(values[0])
+
+    def put(self, url: str, result: dict) -> None:
+        self.put_values(url, (json.dumps(result),))
+
+
+def shared_cache() -> Optional[LinkCache]:
+    """None when PROBE_CACHE_ENABLED is off, so probes always go to the network."""
+    return sqlite_cache.shared(LinkCache, config.PROBE_CACHE_ENABLED)
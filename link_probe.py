@@ -0,0 +1,328 @@
+"""Ask the server about each verified download link: status, content type, size, last change.
+
+_attach_verified_links only guarantees a link appeared on its page; this checks
+that it still resolves and what it points at. Each link gets a HEAD request;
+servers that refuse HEAD (400/403/405/406/501 are the usual answers) or
+answer it without a Content-Length get a GET for the first byte instead, whose
+Content-Range carries the full size. Nothing past the headers is read.
+
+LinkProber runs its own aiohttp session on its own loop, so probes never take
+connections or host-rate tokens from page fetches: PROBE_CONCURRENCY requests
+at once, at most PROBE_PER_HOST per host, and a host that answers 429/503 is
+left alone for its Retry-After (or PROBE_BACKOFF seconds). The same URL asked
+for twice while in flight is probed once, and answers are memoized across
+sessions in link_cache.py.
+
+RowProbes ties probes to a session's rows without holding any row back: rows
+are saved with their links marked pending, and answers that arrive later are
+written into the stored row.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import config
+import link_cache
+import metrics
+from politeness import BACKOFF_STATUSES, retry_after_seconds
+
+# HEAD answers that say nothing about the file; a ranged GET gets another chance
+_HEAD_REFUSED = frozenset({400, 403, 405, 406, 501})
+_CONTENT_RANGE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+@dataclass
+class ProbeResult:
+    url: str
+    # 0 when no HTTP answer came back (see error)
+    status: int = 0
+    content_type: str = ""
+    content_length: Optional[int] = None
+    last_modified: str = ""
+    final_url: str = ""
+    method: str = ""
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+    @property
+    def is_html(self) -> bool:
+        return self.content_type in ("text/html", "application/xhtml+xml")
+
+    @property
+    def transient(self) -> bool:
+        return self.status == 0 or self.status in BACKOFF_STATUSES
+
+
+def _length(resp: aiohttp.ClientResponse) -> Optional[int]:
+    match = _CONTENT_RANGE.match(resp.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1))
+    if resp.status == 206:
+        return None
+    value = resp.headers.get("Content-Length", "")
+    return int(value) if value.isdigit() else None
+
+
+class LinkProber:
+    """HEAD (then ranged GET) probes on a background loop, with a shared result cache."""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[link_cache.LinkCache] = None,
+    ):
+        self.concurrency = concurrency or config.PROBE_CONCURRENCY
+        self.per_host = per_host or config.PROBE_PER_HOST
+        self.timeout = timeout or config.PROBE_TIMEOUT
+        self.cache = cache if cache is not None else link_cache.shared_cache()
+        self.probed = 0
+        self.range_fallbacks = 0
+        self.backoffs = 0
+
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._parked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="link-prober", daemon=True
+        )
+        self._thread.start()
+        self._session: aiohttp.ClientSession = asyncio.run_coroutine_threadsafe(
+            self._open_session(), self._loop
+        ).result()
+        self._closed = False
+
+    async def _open_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": config.USER_AGENT, "Accept": "*/*"},
+        )
+
+    def submit(self, url: str) -> concurrent.futures.Future:
+        """A future resolving to the link's ProbeResult; cached answers resolve at once."""
+        cached = self.cache.get(url) if self.cache else None
+        if cached is not None:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_result(ProbeResult(**cached))
+            return future
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is None:
+                future = asyncio.run_coroutine_threadsafe(self._probe(url), self._loop)
+                self._inflight[url] = future
+                future.add_done_callback(lambda f, url=url: self._finished(url, f))
+            return future
+
+    def _finished(self, url: str, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._inflight.pop(url, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if self.cache and not result.transient:
+            self.cache.put(url, asdict(result))
+
+    async def _probe(self, url: str) -> ProbeResult:
+        host = urlsplit(url).netloc.lower()
+        pause = self._parked.get(host, 0.0) - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        self.probed += 1
+        try:
+            result = await self._request("HEAD", url)
+            if result.status in _HEAD_REFUSED or (
+                result.ok and result.content_length is None
+            ):
+                self.range_fallbacks += 1
+                result = await self._request("GET", url, {"Range": "bytes=0-0"})
+        except asyncio.TimeoutError:
+            return ProbeResult(url, error="timeout")
+        except aiohttp.ClientError as e:
+            return ProbeResult(url, error=type(e).__name__)
+        return result
+
+    async def _request(
+        self, method: str, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> ProbeResult:
+        async with self._session.request(
+            method,
+            url,
+            headers=headers,
+            allow_redirects=True,
+            max_redirects=config.FETCH_MAX_REDIRECTS,
+        ) as resp:
+            if resp.status in BACKOFF_STATUSES:
+                self.backoffs += 1
+                pause = retry_after_seconds(resp.headers.get("Retry-After"))
+                self._parked[urlsplit(url).netloc.lower()] = time.monotonic() + (
+                    config.PROBE_BACKOFF if pause is None else pause
+                )
+            return ProbeResult(
+                url=url,
+                status=resp.status,
+                content_type=resp.headers.get("Content-Type", "").split(";")[0].strip().lower(),
+                content_length=_length(resp),
+                last_modified=resp.headers.get("Last-Modified", ""),
+                final_url=str(resp.url),
+                method=method,
+            )
+
+    def stats(self) -> Dict[str, object]:
+        stats: Dict[str, object] = {
+            "probed": self.probed,
+            "range_fallbacks": self.range_fallbacks,
+            "backoffs": self.backoffs,
+        }
+        if self.cache:
+            stats.update({f"cache_{k}": v for k, v in self.cache.stats().items()})
+        return stats
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+def annotate(row: dict, results: List[ProbeResult]) -> None:
+    """Store the probe answers on the row, one entry per verified_download_links entry."""
+    row["link_status"] = [r.status for r in results]
+    row["link_content_type"] = [r.content_type for r in results]
+    row["link_content_length"] = [r.content_length for r in results]
+    row["link_last_modified"] = [r.last_modified for r in results]
+
+
+def _outcome(url: str, future: concurrent.futures.Future) -> ProbeResult:
+    if future.cancelled():
+        return ProbeResult(url, error="cancelled")
+    if future.exception() is not None:
+        return ProbeResult(url, error=type(future.exception()).__name__)
+    return future.result()
+
+
+@dataclass
+class _Pending:
+    links: List[str]
+    futures: List[concurrent.futures.Future]
+    context: contextvars.Context
+    started: float = field(default_factory=time.monotonic)
+    left: int = 0
+    saved: bool = False
+
+
+class RowProbes:
+    """Probes for a session's rows that never hold a row back.
+
+    start(row) marks the row's links pending and submits them. Answers that land
+    before the row is saved go into the row itself; ones that land after go to
+    `late(row)` (DataManager.update_links). The writer saves probed rows through
+    save(), so an answer can't slip in between the two. close() gives outstanding
+    probes up to `wait` seconds, then stops taking answers.
+    """
+
+    _KEY = "_link_probes"
+
+    def __init__(self, prober: LinkProber, late: Callable[[dict], None]):
+        self.prober = prober
+        self.late = late
+        self.counts = Counter(
+            dict.fromkeys(("links", "ok", "html", "dead", "unreachable", "pending"), 0)
+        )
+        self._outstanding = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def start(self, row: dict) -> None:
+        links = list(row["verified_download_links"])
+        annotate(row, [ProbeResult(url, error="pending") for url in links])
+        pending = _Pending(links, [], contextvars.copy_context(), left=len(links))
+        row[self._KEY] = pending
+        with self._cond:
+            self._outstanding += 1
+            self.counts["links"] += len(links)
+        pending.futures = [self.prober.submit(url) for url in links]
+        for future in pending.futures:
+            future.add_done_callback(lambda _f, row=row: self._landed(row))
+
+    def _landed(self, row: dict) -> None:
+        pending: _Pending = row[self._KEY]
+        with self._cond:
+            pending.left -= 1
+            if pending.left or self._closed:
+                return
+            results = [_outcome(u, f) for u, f in zip(pending.links, pending.futures)]
+            annotate(row, results)
+            self.counts.update(_category(r) for r in results)
+            if pending.saved:
+                try:
+                    self.late(row)
+                except Exception as e:
+                    print(f"Error recording link checks for {row.get('url')}: {e}")
+            self._outstanding -= 1
+            self._cond.notify_all()
+        pending.context.run(metrics.observe, "probe", time.monotonic() - pending.started)
+
+    def save(self, row: dict, save: Callable[[dict], bool]) -> bool:
+        with self._cond:
+            saved = save(row)
+            if saved and self._KEY in row:
+                row[self._KEY].saved = True
+            return saved
+
+    def close(self, wait: float) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._outstanding == 0, timeout=wait)
+            self._closed = True
+            self.counts["pending"] = self.counts["links"] - sum(
+                v for k, v in self.counts.items() if k not in ("links", "pending")
+            )
+
+
+def _category(result: ProbeResult) -> str:
+    if result.status == 0:
+        return "unreachable"
+    if not result.ok:
+        return "dead"
+    return "html" if result.is_html else "ok"
+
+
+_shared: Optional[LinkProber] = None
+_shared_lock = threading.Lock()
+
+
+def shared_prober() -> LinkProber:
+    """Process-wide prober so its connection pool and in-flight dedup span sessions."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LinkProber()
+            atexit.register(_shared.close)
+        return _shared
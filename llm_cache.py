@@ -0,0 +1,57 @@
+"""Persistent memo of Ollama answers, shared by every session under config.DATA_DIR.
+
+Keys are a sha256 over (model, prompt, options, format), plus the early-stop
+field set for streamed JSON replies, so only byte-identical requests hit. The
+table is capped at LLM_CACHE_MAX_ENTRIES; when it overflows the least
+recently used tenth is dropped.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Collection, Dict, Optional
+
+import config
+import sqlite_cache
+from sqlite_cache import SqliteCache
+
+
+def cache_key(
+    model: str,
+    prompt: str,
+    options: Dict[str, Any],
+    fmt: Optional[str],
+    until_fields: Optional[Collection[str]] = None,
+) -> str:
+    """until_fields is the early-stop field set of a streamed reply, None for a full reply."""
+    request: Dict[str, Any] = {"model": model, "prompt": prompt, "options": options, "format": fmt}
+    if until_fields is not None:
+        # an early-stopped reply holds only these fields; keep it apart from full ones
+        request["until_fields"] = sorted(until_fields)
+    blob = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache(SqliteCache):
+    """Least recently used answers go first; no TTL, an answer to the same request stays good."""
+
+    table = "answers"
+    columns = ("model", "content")
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        super().__init__(
+            path or config.LLM_CACHE_PATH, max_entries or config.LLM_CACHE_MAX_ENTRIES
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        values = self.get_values(key)
+        return None if values is None else values[1]
+
+    def put(self, key: str, model: str, content: str) -> None:
+        self.put_values(key, (model, content), replace=False)
+
+
+def shared_cache() -> Optional[LLMCache]:
+    """The LLMCache every engine in the process reads; None with LLM_CACHE_ENABLED off."""
+    return sqlite_cache.shared(LLMCache, config.LLM_CACHE_ENABLED)
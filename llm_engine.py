@@ -1,10 +1,17 @@
 import json
 import re
-from typing import Any, List, Optional
+from typing import Any, Callable, Collection, List, Optional
 
 import requests
 
 import config
+import llm_cache
+import metrics
+import prompt_budget
+from json_stream import JsonFieldScanner
+from llm_scheduler import EXTRACT, LANE_NAMES, QUERY_GEN, RELEVANCE, shared_scheduler
+
+_EXTRACT_REPLY_TOKENS = 700
 
 
 class LLMEngine:
@@ -12,8 +19,10 @@ class LLMEngine:
         self.base = config.OLLAMA_BASE_URL.rstrip("/")
         self.model = config.OLLAMA_MODEL
         self.timeout = config.OLLAMA_REQUEST_TIMEOUT
+        self.cache = llm_cache.shared_cache()
         print(f"Connecting to Ollama at {self.base} (model={self.model})...")
         self._ping_ollama_and_pick_model()
+        self.scheduler = shared_scheduler(self.base, self.timeout)
 
     def _ping_ollama_and_pick_model(self) -> None:
         try:
@@ -58,7 +67,17 @@ class LLMEngine:
         temperature: float,
         stop: Optional[List[str]] = None,
         json_mode: bool = False,
-    ) -> str:
+        priority: int = RELEVANCE,
+        until_fields: Optional[Collection[str]] = None,
+        parse: Optional[Callable[[str], Any]] = None,
+    ) -> Any:
+        """One chat completion. For JSON replies, until_fields turns on streaming with an
+        early stop once those top-level fields are complete (an empty collection means
+        "when the object closes"); the reply is then just the resolved fields as JSON.
+
+        With `parse`, the reply comes back parsed, and it is only cached when parse
+        returns something other than None, so a garbled answer is asked again next time.
+        """
         payload: dict[str, Any] = {
             "model": self.model,
             "messages": [{"role": "user", "content": prompt}],
@@ -74,50 +93,110 @@ class LLMEngine:
         if stop:
             payload["options"]["stop"] = stop
 
-        try:
-            r = requests.post(
-                f"{self.base}/api/chat",
-                json=payload,
-                timeout=self.timeout,
+        scanner = None
+        if json_mode and config.OLLAMA_STREAM and until_fields is not None:
+            scanner = JsonFieldScanner(until_fields)
+
+        key = None
+        if self.cache:
+            key = llm_cache.cache_key(
+                self.model,
+                prompt,
+                payload["options"],
+                payload.get("format"),
+                until_fields=until_fields if scanner else None,
             )
-            r.raise_for_status()
+            hit = self.cache.get(key)
+            if hit is not None:
+                parsed = parse(hit) if parse else hit
+                if parsed is not None:
+                    return parsed
+                self.cache.discard(key)
+
+        lane = LANE_NAMES[priority]
+        try:
+            with metrics.timed(f"llm.{lane}"):
+                data = self.scheduler.post(payload, priority, scanner)
         except requests.RequestException as e:
             raise RuntimeError(f"Ollama request failed: {e}") from e
+        self._count_tokens(lane, data)
 
-        data = r.json()
-        msg = data.get("message") or {}
-        content = msg.get("content")
+        if data.get("early_stop"):
+            content = json.dumps(scanner.fields)
+        else:
+            content = (data.get("message") or {}).get("content")
         if not content:
             raise RuntimeError(f"Empty response from Ollama: {data}")
-        return content.strip()
-
-    def generate_json(self, prompt: str, max_tokens: int = 1000):
-        text = self._chat(
+        content = content.strip()
+        parsed = parse(content) if parse else content
+        if key and parsed is not None:
+            self.cache.put(key, self.model, content)
+        return parsed
+
+    @staticmethod
+    def _count_tokens(lane: str, data: dict) -> None:
+        """Ollama's token counts and timings (nanoseconds) for the metrics registry."""
+        metrics.count(f"llm.{lane}.calls")
+        metrics.count(f"llm.{lane}.prompt_tokens", int(data.get("prompt_eval_count") or 0))
+        metrics.count(f"llm.{lane}.prompt_seconds", (data.get("prompt_eval_duration") or 0) / 1e9)
+        metrics.count(f"llm.{lane}.eval_tokens", int(data.get("eval_count") or 0))
+        metrics.count(f"llm.{lane}.eval_seconds", (data.get("eval_duration") or 0) / 1e9)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache else {"enabled": False}
+
+    def wait_for_room(self, timeout: Optional[float] = None) -> bool:
+        """Let producers (the fetch side) hold off while the LLM queue is full."""
+        return self.scheduler.wait_for_room(timeout)
+
+    def generate_json(
+        self,
+        prompt: str,
+        max_tokens: int = 1000,
+        priority: int = RELEVANCE,
+        until_fields: Collection[str] = (),
+    ):
+        return self._chat(
             prompt,
             max_tokens=max_tokens,
             temperature=0.3,
             stop=["```\n\n", "User:"],
             json_mode=True,
+            priority=priority,
+            until_fields=until_fields,
+            parse=self._extract_json,
         )
-        return self._extract_json(text)
 
-    def generate_text(self, prompt: str, max_tokens: int = 500):
-        return self._chat(prompt, max_tokens=max_tokens, temperature=0.2)
+    def generate_text(self, prompt: str, max_tokens: int = 500, priority: int = QUERY_GEN):
+        return self._chat(prompt, max_tokens=max_tokens, temperature=0.2, priority=priority)
 
     def extract_info(self, text: str, query: str, candidate_urls: Optional[List[str]] = None):
-        """Same JSON shape as always; links only come in via indices into candidate_urls."""
+        """Same JSON shape as always; links only come in via indices into candidate_urls.
+
+        With EXTRACT_PROMPT_BUDGET on, prompt_budget picks the passages and
+        compresses the candidate list; selected_indices are mapped back onto
+        candidate_urls before returning.
+        """
         candidates = list(candidate_urls or [])[: config.MAX_CANDIDATE_URLS]
-        if candidates:
-            numbered = "\n".join(f"{i}: {u}" for i, u in enumerate(candidates))
-            candidate_block = numbered
+        index_map = None
+        if config.EXTRACT_PROMPT_BUDGET:
+            plan = prompt_budget.plan_extract(text, query, candidates, _EXTRACT_REPLY_TOKENS)
+            content, candidate_block, index_map = (
+                plan.content, plan.candidate_block, plan.index_map
+            )
+            if not index_map:
+                candidate_block = ""
         else:
+            content = (text or "")[:6000]
+            candidate_block = "\n".join(f"{i}: {u}" for i, u in enumerate(candidates))
+        if not candidate_block:
             candidate_block = "(No http(s) links could be extracted from this page HTML/text.)"
 
         prompt = f"""You are a Dataset Scraper Agent. Use ONLY facts supported by the Content below.
 User topic: "{query}"
 
-Content (truncated):
-\"\"\"{(text or '')[:6000]}\"\"\"
+Content (excerpts):
+\"\"\"{content}\"\"\"
 
 Candidate URLs — these are the ONLY links you may treat as dataset/download targets.
 You MUST choose targets by listing their integer indices (selected_indices). Do NOT invent URLs.
@@ -135,14 +214,22 @@ Return ONLY valid JSON with these keys:
 
 Do not include download_links or any URL strings in the JSON."""
 
-        raw = self._chat(
+        result = self._chat(
             prompt,
-            max_tokens=700,
+            max_tokens=_EXTRACT_REPLY_TOKENS,
             temperature=0.25,
             stop=["```\n\n", "User:"],
             json_mode=True,
+            priority=EXTRACT,
+            until_fields=(),
+            parse=self._extract_json,
         )
-        return self._extract_json(raw)
+        if index_map is not None and isinstance(result, dict):
+            result["selected_indices"] = prompt_budget.remap_indices(
+                result.get("selected_indices"), index_map
+            )
+            # stray URL strings are checked against the original candidates later
+        return result
 
     def _extract_json(self, text: str):
         try:
@@ -0,0 +1,225 @@
+"""Priority scheduler in front of Ollama's /api/chat.
+
+A fixed number of worker threads (OLLAMA_NUM_PARALLEL, to match the server)
+share one pooled requests.Session and pull jobs lowest-lane-first, so page
+extraction never waits behind a pile of relevance checks. The number of jobs
+queued or in flight is capped at LLM_QUEUE_MAX; submit() blocks beyond that,
+and wait_for_room() lets the fetch side hold off until the model catches up.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+# Lanes, most urgent first
+EXTRACT = 0
+RELEVANCE = 1
+QUERY_GEN = 2
+LANE_NAMES = {EXTRACT: "extract", RELEVANCE: "relevance", QUERY_GEN: "query_gen"}
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    payload: Dict[str, Any] = field(compare=False)
+    future: Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    scanner: Any = field(compare=False, default=None)
+
+
+@dataclass
+class _LaneStats:
+    requests: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float,
+        parallel: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self.base = base_url.rstrip("/")
+        self.timeout = timeout
+        self.parallel = max(1, parallel or config.OLLAMA_NUM_PARALLEL)
+        self.max_queue = max(self.parallel, max_queue or config.LLM_QUEUE_MAX)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.parallel)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._room = threading.Condition()
+        self._outstanding = 0
+        self._seq = itertools.count()
+
+        self._stats_lock = threading.Lock()
+        self._lanes = {lane: _LaneStats() for lane in LANE_NAMES}
+        self._eval_tokens = 0
+        self._eval_seconds = 0.0
+        self._prompt_tokens = 0
+        self._prompt_seconds = 0.0
+        self._early_stops = 0
+
+        for n in range(self.parallel):
+            threading.Thread(target=self._work, name=f"llm-{n}", daemon=True).start()
+
+    def submit(
+        self, payload: Dict[str, Any], priority: int = RELEVANCE, scanner=None
+    ) -> Future:
+        """Queue a chat request; blocks while LLM_QUEUE_MAX jobs are already outstanding.
+
+        With a scanner (see json_stream.JsonFieldScanner) the reply is streamed and
+        the connection dropped as soon as scanner.feed() says the answer is in, which
+        makes Ollama stop generating.
+        """
+        with self._room:
+            while self._outstanding >= self.max_queue:
+                self._room.wait()
+            self._outstanding += 1
+        fut: Future = Future()
+        self._queue.put(
+            _Job(priority, next(self._seq), payload, fut, time.monotonic(), scanner)
+        )
+        return fut
+
+    def post(
+        self, payload: Dict[str, Any], priority: int = RELEVANCE, scanner=None
+    ) -> Dict[str, Any]:
+        return self.submit(payload, priority, scanner).result()
+
+    def saturated(self) -> bool:
+        with self._room:
+            return self._outstanding >= self.max_queue
+
+    def wait_for_room(self, timeout: Optional[float] = None) -> bool:
+        """Backpressure hook for producers: block until the queue has a free slot."""
+        with self._room:
+            return self._room.wait_for(
+                lambda: self._outstanding < self.max_queue, timeout=timeout
+            )
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            waited = time.monotonic() - job.enqueued_at
+            try:
+                data = self._send(job)
+                self._record(job.priority, waited, data)
+                job.future.set_result(data)
+            except BaseException as e:
+                self._record(job.priority, waited, None)
+                job.future.set_exception(e)
+            finally:
+                with self._room:
+                    self._outstanding -= 1
+                    self._room.notify_all()
+
+    def _send(self, job: _Job) -> Dict[str, Any]:
+        url = f"{self.base}/api/chat"
+        if job.scanner is None:
+            r = self.session.post(url, json=job.payload, timeout=self.timeout)
+            r.raise_for_status()
+            return r.json()
+
+        parts = []
+        first_token_at = None
+        with self.session.post(
+            url, json={**job.payload, "stream": True}, timeout=self.timeout, stream=True
+        ) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                piece = (chunk.get("message") or {}).get("content") or ""
+                parts.append(piece)
+                if chunk.get("done"):
+                    chunk["message"] = {"role": "assistant", "content": "".join(parts)}
+                    return chunk
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                if piece and job.scanner.feed(piece):
+                    # Leaving the with-block closes the connection; Ollama cancels the rest.
+                    return {
+                        "message": {"role": "assistant", "content": "".join(parts)},
+                        "done": False,
+                        "early_stop": True,
+                        "eval_count": len(parts),
+                        "eval_duration": int((time.monotonic() - first_token_at) * 1e9),
+                    }
+        return {"message": {"role": "assistant", "content": "".join(parts)}}
+
+    def _record(self, lane: int, waited: float, data: Optional[Dict[str, Any]]) -> None:
+        with self._stats_lock:
+            stats = self._lanes[lane]
+            stats.requests += 1
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            if data:
+                # Ollama reports durations in nanoseconds
+                self._eval_tokens += int(data.get("eval_count") or 0)
+                self._eval_seconds += (data.get("eval_duration") or 0) / 1e9
+                self._prompt_tokens += int(data.get("prompt_eval_count") or 0)
+                self._prompt_seconds += (data.get("prompt_eval_duration") or 0) / 1e9
+                self._early_stops += bool(data.get("early_stop"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = {
+                "parallel": self.parallel,
+                "max_queue": self.max_queue,
+                "early_stops": self._early_stops,
+                "eval_tokens": self._eval_tokens,
+                "eval_tokens_per_second": (
+                    round(self._eval_tokens / self._eval_seconds, 2)
+                    if self._eval_seconds
+                    else 0.0
+                ),
+                "prompt_tokens": self._prompt_tokens,
+                "prompt_tokens_per_second": (
+                    round(self._prompt_tokens / self._prompt_seconds, 2)
+                    if self._prompt_seconds
+                    else 0.0
+                ),
+            }
+            for lane, s in self._lanes.items():
+                name = LANE_NAMES[lane]
+                out[f"{name}_requests"] = s.requests
+                out[f"{name}_avg_wait_s"] = (
+                    round(s.wait_seconds / s.requests, 3) if s.requests else 0.0
+                )
+                out[f"{name}_max_wait_s"] = round(s.max_wait_seconds, 3)
+            return out
+
+
+_shared: Dict[str, LLMScheduler] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler(base_url: str, timeout: float) -> LLMScheduler:
+    """One scheduler per Ollama server, so concurrent sessions share its slots and queue."""
+    key = base_url.rstrip("/")
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = LLMScheduler(key, timeout)
+        return _shared[key]
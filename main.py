@@ -1,116 +1,93 @@
+import argparse
 import sys
 
 import config
-from crawler import LinkAnalyzer
-from data_manager import DataManager
-from llm_engine import LLMEngine
-from search_engine import SearchEngine
-from session_stats import RunTotals
-
-
-def main():
-    print("=== AI Research Agent ===")
-
-    user_query = input(
-        "\nEnter the topic you want to find datasets for "
-        "(e.g. 'Bitcoin transactions 2023'): "
-    ).strip()
-    if not user_query:
-        print("Query cannot be empty.")
-        return
-
-    run = RunTotals(topic=user_query)
-
-    try:
-        llm = LLMEngine()
-        searcher = SearchEngine(pause=config.DELAY_BETWEEN_SEARCHES, run=run)
-        analyzer = LinkAnalyzer(llm)
-        store = DataManager(run=run)
-    except Exception as e:
-        print(f"Failed to initialize: {e}")
-        return
-
+import runner
+
+
+def _parse_override(text):
+    """KEY=VALUE from --set, converted to the type of the current setting."""
+    key, sep, raw = text.partition("=")
+    key = key.strip().upper()
+    knobs = config.knobs()
+    if not sep or key not in knobs:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE with a config setting, got {text!r}")
+    current = knobs[key]
+    raw = raw.strip()
     try:
-        print("\nAnalyzing topic for potential dataset sources...")
-        analysis_prompt = (
-            f"Analyze the following topic to find DATASETS. Identify key file formats "
-            f"(CSV/JSON), repository names, and technical terms:\nTopic: {user_query}\n"
-            f"Keep it concise."
-        )
-        analysis = llm.generate_text(analysis_prompt)
-        print(f"Analysis: {analysis}")
-
-        print(f"\nGenerating {config.MAX_SEARCH_QUERIES} dataset search queries...")
-        generated_queries = []
-        batches = 4
-        queries_per_batch = config.MAX_SEARCH_QUERIES // batches
-
-        for i in range(batches):
-            prompt = f"""
-You are an expert Data Engineer. Based on the topic "{user_query}", generate a list of {queries_per_batch} Google search queries to find DOWNLOADABLE DATASETS.
-Use advanced operators like: filetype:csv, filetype:json, filetype:parquet, "dataset", "corpus", "dump", site:kaggle.com, site:huggingface.co
-Return ONLY valid JSON format:
-{{
-  "queries": [
-    "query 1",
-    ...
-    "query {queries_per_batch}"
-  ]
-}}
-"""
-            print(f"Generating batch {i + 1}/{batches}...")
-            result = llm.generate_json(prompt, max_tokens=2048)
-            if result and "queries" in result:
-                generated_queries.extend(result["queries"])
-            else:
-                print("Failed to generate queries for this batch.")
+        if isinstance(current, bool):
+            return key, raw.lower() in ("1", "true", "yes", "on")
+        if isinstance(current, int):
+            return key, int(raw)
+        if isinstance(current, float):
+            return key, float(raw)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{key} needs a {type(current).__name__}, got {raw!r}")
+    return key, raw
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find downloadable datasets for a topic.")
+    parser.add_argument("topics", nargs="*", help="topics to research (prompted for if none)")
+    parser.add_argument(
+        "--topics-file", metavar="FILE", help="file with one topic per line (# comments ok)"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="SESSION_ID",
+        help="continue an interrupted session (a directory name under DATA_DIR)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        metavar="N",
+        help=f"topics to run at once (default TOPIC_CONCURRENCY={config.TOPIC_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--set",
+        dest="overrides",
+        type=_parse_override,
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a config setting for this run, e.g. --set MAX_SEARCH_QUERIES=40",
+    )
+    args = parser.parse_args(argv)
+    overrides = dict(args.overrides)
+
+    topics = list(args.topics)
+    if args.topics_file:
+        topics.extend(runner.load_topics(args.topics_file))
+    if args.resume and topics:
+        parser.error("--resume cannot be combined with new topics")
 
-        generated_queries = list(dict.fromkeys(generated_queries))
-        print(f"Total unique queries generated: {len(generated_queries)}")
-
-        if not generated_queries:
-            print("No queries generated. Exiting.")
-            return
-
-        total_processed = 0
-
-        for i, query in enumerate(generated_queries):
-            run.queries_executed += 1
-            print(f"\n[{i + 1}/{len(generated_queries)}] Processing Query: {query}")
-
-            links = searcher.perform_search(
-                query, num_results=config.MAX_RESULTS_PER_QUERY
-            )
-            print(f"Found {len(links)} links.")
-            run.search_hits_total += len(links)
-
-            if (
-                not links
-                and len(run.queries_no_results)
-                < config.MAX_QUERIES_NO_RESULTS_TRACKED
-            ):
-                run.queries_no_results.append(query)
-
-            useful_data = analyzer.process_links(query, links, run=run)
-            print(f"Found {len(useful_data)} useful articles.")
-
-            for article in useful_data:
-                store.save_article(query, article)
-
-            total_processed += len(links)
-            print("-" * 50)
+    print("=== AI Research Agent ===")
 
-        print(
-            f"\n=== Job complete. Processed {total_processed} search hits. "
-            f"Data and reports: {store.session_dir} ==="
-        )
-    finally:
-        store.close()
+    if args.resume:
+        results = [runner.run_topic(resume=args.resume, **overrides)]
+    else:
+        if not topics:
+            topic = input(
+                "\nEnter the topic you want to find datasets for "
+                "(e.g. 'Bitcoin transactions 2023'): "
+            ).strip()
+            if not topic:
+                print("Query cannot be empty.")
+                return 1
+            topics = [topic]
+        results = runner.run_topics(topics, concurrency=args.concurrency, **overrides)
+
+    if len(results) > 1:
+        print("\n=== Batch summary ===")
+        for r in results:
+            status = "ok" if r.ok else f"FAILED: {r.error}"
+            print(f"- {r.topic}: {r.records_saved} rows in {r.session_dir or '-'} ({status})")
+    return 0 if all(r.ok for r in results) else 1
 
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\nAborted by user.")
         sys.exit(0)
@@ -0,0 +1,263 @@
+"""Where the wall-clock time goes: per-stage latency histograms, in-flight gauges, counters.
+
+Hot paths wrap their work in `metrics.timed("fetch")` and bump counters with
+`metrics.count("llm.extract.eval_tokens", n)`. Each observation lands in the
+process-wide registry (what the optional HTTP endpoint serves) and in the
+session's registry when one is bound to the current context via bind().
+runner._run_session binds one per session. Pipeline stage threads and the
+search pool run in copies of that context, so concurrent topics keep their own
+numbers for research_summary.json / research_report.md.
+
+With METRICS_PORT set, a small HTTP server on METRICS_HOST serves the
+process-wide registry while runs are going: /metrics in the Prometheus text
+format, /metrics.json as JSON.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+import config
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS += (30.0, 60.0, 120.0, 300.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile, interpolated linearly inside the bucket holding it.
+
+        Buckets are narrowed to the smallest and largest values seen (the +Inf
+        bucket ends at the maximum), so a stage whose calls all land in one wide
+        bucket still gets distinct p50/p95 instead of that bucket's bound.
+        """
+        if not self.n:
+            return 0.0
+        rank = q * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = max(BUCKETS[i - 1] if i else 0.0, self.min)
+                hi = min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.max
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, int] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, delta: int) -> None:
+        with self._lock:
+            self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage time, busiest first."""
+        with self._lock:
+            rows = sorted(self.histograms.items(), key=lambda x: -x[1].total)
+            return {
+                name: {
+                    "calls": h.n,
+                    "total_s": round(h.total, 3),
+                    "mean_ms": round(1000 * h.total / h.n, 1) if h.n else 0.0,
+                    "p50_ms": round(1000 * h.quantile(0.5), 1),
+                    "p95_ms": round(1000 * h.quantile(0.95), 1),
+                    "max_ms": round(1000 * h.max, 1),
+                }
+                for name, h in rows
+            }
+
+    def llm_throughput(self) -> Dict[str, Dict[str, float]]:
+        """Per LLM lane: calls, prompt / generated tokens and tokens per second."""
+        with self._lock:
+            lanes: Dict[str, Dict[str, float]] = {}
+            for key, value in self.counters.items():
+                parts = key.split(".")
+                if len(parts) == 3 and parts[0] == "llm":
+                    lanes.setdefault(parts[1], {})[parts[2]] = value
+        out = {}
+        for lane, c in sorted(lanes.items()):
+            prompt_s, eval_s = c.get("prompt_seconds", 0.0), c.get("eval_seconds", 0.0)
+            out[lane] = {
+                "calls": int(c.get("calls", 0)),
+                "prompt_tokens": int(c.get("prompt_tokens", 0)),
+                "eval_tokens": int(c.get("eval_tokens", 0)),
+                "prompt_tokens_per_s": round(c.get("prompt_tokens", 0) / prompt_s, 1)
+                if prompt_s
+                else 0.0,
+                "eval_tokens_per_s": round(c.get("eval_tokens", 0) / eval_s, 1) if eval_s else 0.0,
+            }
+        return out
+
+    def to_json(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "stages": self.breakdown(),
+            "in_flight": gauges,
+            "counters": counters,
+            "llm": self.llm_throughput(),
+        }
+
+    def prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                metric = "crawler_stage_seconds"
+                label = f'stage="{name}"'
+                cumulative = 0
+                for bound, c in zip((*BUCKETS, "+Inf"), h.counts):
+                    cumulative += c
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{label}}} {h.total}")
+                lines.append(f"{metric}_count{{{label}}} {h.n}")
+            for name, v in sorted(self.gauges.items()):
+                lines.append(f'crawler_in_flight{{stage="{name}"}} {v}')
+            for name, v in sorted(self.counters.items()):
+                lines.append(f"crawler_{_metric_name(name)}_total {v}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+_process = Metrics()
+_session: contextvars.ContextVar[Optional[Metrics]] = contextvars.ContextVar(
+    "session_metrics", default=None
+)
+
+
+def shared_metrics() -> Metrics:
+    return _process
+
+
+def current() -> Optional[Metrics]:
+    """The session registry bound to this context, if any."""
+    return _session.get()
+
+
+@contextlib.contextmanager
+def bind(session: Metrics) -> Iterator[Metrics]:
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+
+
+def _targets() -> List[Metrics]:
+    session = _session.get()
+    return [_process, session] if session is not None else [_process]
+
+
+def observe(name: str, seconds: float) -> None:
+    for m in _targets():
+        m.observe(name, seconds)
+
+
+def count(name: str, n: float = 1) -> None:
+    for m in _targets():
+        m.count(name, n)
+
+
+@contextlib.contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Time the block into histogram `name` and count it as in flight meanwhile."""
+    targets = _targets()
+    for m in targets:
+        m.gauge(name, 1)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for m in targets:
+            m.gauge(name, -1)
+            m.observe(name, elapsed)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(_process.to_json(), indent=2).encode("utf-8")
+            ctype = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = _process.prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def serve() -> Optional[str]:
+    """Start the endpoint once per process when METRICS_PORT is set; returns its URL."""
+    global _server
+    if not config.METRICS_PORT:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(
+                    (config.METRICS_HOST, config.METRICS_PORT), _Handler
+                )
+            except OSError as e:
+                print(f"Metrics endpoint disabled: {e}")
+                return None
+            threading.Thread(
+                target=_server.serve_forever, name="metrics-http", daemon=True
+            ).start()
+            print(f"Metrics at http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+        host, port = _server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
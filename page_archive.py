@@ -0,0 +1,210 @@
+"""Session page archive: each distinct page text stored once, compressed, in segment files.
+
+Texts are keyed by the sha256 of their content. A new text is compressed as
+one independent zstd (or gzip) frame and appended to the current segment under
+<session>/pages/; a SQLite index maps hash -> (segment, offset, length) and
+url -> hash. The same page text reached from another URL or query only adds
+an index row. Reads go through a memory map of the segment, so fetching one
+page never reads the rest of the file.
+
+Store rows point at their text with local_path = pages/<hash>, relative to the
+session directory; locator() builds it and the command line resolves it:
+
+    python page_archive.py SESSION_DIR URL           # print an archived page
+    python page_archive.py SESSION_DIR pages/<hash>  # same, by a row's local_path
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+
+try:
+    import zstandard
+except ImportError:  # gzip still works, just larger and slower
+    zstandard = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_length INTEGER NOT NULL,
+    codec TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES blobs (hash),
+    query TEXT,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_hash ON pages (hash);
+"""
+
+
+class PageArchive:
+    def __init__(
+        self,
+        session_dir: str,
+        codec: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+    ):
+        self.root = os.path.join(session_dir, "pages")
+        os.makedirs(self.root, exist_ok=True)
+        codec = (codec or config.ARCHIVE_CODEC).lower()
+        self.codec = "zstd" if codec == "zstd" and zstandard is not None else "gzip"
+        self.segment_bytes = segment_bytes or config.ARCHIVE_SEGMENT_BYTES
+        self.dedup_hits = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.root, "index.sqlite"), check_same_thread=False, timeout=30
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        last = self._db.execute("SELECT MAX(segment) FROM blobs").fetchone()[0]
+        self._segment = last or 0
+        self._out = open(self._segment_path(self._segment), "ab")
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._zc = zstandard.ZstdCompressor(level=3) if zstandard else None
+        self._zd = zstandard.ZstdDecompressor() if zstandard else None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, f"segment-{segment:05d}.bin")
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._zc.compress(raw)
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+
+    def _decompress(self, data: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            if self._zd is None:
+                raise RuntimeError("zstandard is needed to read this archive")
+            return self._zd.decompress(data)
+        return gzip.decompress(data)
+
+    def put(self, url: str, text: str, query: str = "") -> str:
+        """Archive a page's text under its URL; returns the content hash."""
+        digest = self.put_text(text)
+        self.link(url, digest, query)
+        return digest
+
+    def put_text(self, text: str) -> str:
+        """Store the text alone (no URL yet) and return its hash; see link()."""
+        raw = (text or "").encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock, self._db:
+            known = self._db.execute(
+                "SELECT 1 FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            if known:
+                self.dedup_hits += 1
+            else:
+                frame = self._compress(raw)
+                if self._out.tell() and self._out.tell() + len(frame) > self.segment_bytes:
+                    self._out.close()
+                    self._segment += 1
+                    self._out = open(self._segment_path(self._segment), "ab")
+                offset = self._out.tell()
+                self._out.write(frame)
+                self._out.flush()  # before the index row commits
+                self._db.execute(
+                    "INSERT INTO blobs (hash, segment, offset, length, raw_length, codec) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (digest, self._segment, offset, len(frame), len(raw), self.codec),
+                )
+        return digest
+
+    def link(self, url: str, digest: str, query: str = "") -> None:
+        """Point url at text stored earlier with put_text()."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, hash, query, stored_at) VALUES (?, ?, ?, ?)",
+                (url, digest, query, time.time()),
+            )
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT segment, offset, length, codec FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            segment, offset, length, codec = row
+            frame = self._view(segment, offset + length)[offset : offset + length]
+        return self._decompress(frame, codec).decode("utf-8")
+
+    @staticmethod
+    def locator(digest: str) -> str:
+        return f"pages/{digest}"
+
+    def get_url(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM pages WHERE url = ?", (url,)).fetchone()
+        return self.get(row[0]) if row else None
+
+    def _view(self, segment: int, needed: int) -> mmap.mmap:
+        """Map a segment, remapping when it has grown past the current view (caller holds the lock)."""
+        view = self._maps.get(segment)
+        if view is None or len(view) < needed:
+            if view is not None:
+                view.close()
+            with open(self._segment_path(segment), "rb") as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = view
+        return view
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pages, = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()
+            blobs, raw, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_length), 0), COALESCE(SUM(length), 0) "
+                "FROM blobs"
+            ).fetchone()
+        return {
+            "codec": self.codec,
+            "pages": pages,
+            "unique_texts": blobs,
+            "dedup_hits": self.dedup_hits,
+            "segments": self._segment + 1,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+            "compression_ratio": round(raw / stored, 2) if stored else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
+            self._out.close()
+            self._db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python page_archive.py SESSION_DIR URL|pages/HASH")
+    archive = PageArchive(sys.argv[1])
+    target = sys.argv[2]
+    try:
+        if target.startswith("pages/"):
+            page = archive.get(target[len("pages/") :])
+        else:
+            page = archive.get_url(target)
+    finally:
+        archive.close()
+    if page is None:
+        sys.exit(f"{sys.argv[2]} is not in the archive")
+    print(page)
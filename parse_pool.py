@@ -0,0 +1,110 @@
+"""CPU half of a fetch — decode, trafilatura.extract, harvest_urls — off the GIL.
+
+Workers get the raw response bytes (cheap to pickle, no decode in the parent)
+and send back only what the rest of the pipeline reads: the page text and its
+candidate URLs. The raw HTML never comes back across the process boundary.
+"""
+
+from __future__ import annotations
+
+import atexit
+import concurrent.futures
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+import trafilatura
+from trafilatura.utils import decode_file
+
+import config
+from url_grounding import harvest_urls
+
+
+def parse_page(url: str, body: bytes, max_urls: int) -> dict:
+    """Runs inside a pool worker; `timings` holds seconds per step for metrics."""
+    started = time.perf_counter()
+    html = decode_file(body)
+    text = trafilatura.extract(html, include_comments=False, include_tables=True) or ""
+    extracted = time.perf_counter()
+    candidates = harvest_urls(url, html, text, max_urls)
+    return {
+        "url": url,
+        "text": text,
+        "candidates": candidates,
+        "timings": {
+            "parse.trafilatura": extracted - started,
+            "parse.harvest_urls": time.perf_counter() - extracted,
+        },
+    }
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    """Worker initializer: quit once the parent is gone instead of lingering as an orphan."""
+
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1.0)
+        os._exit(0)
+
+    threading.Thread(target=watch, name="parent-watch", daemon=True).start()
+
+
+class ParsePool:
+    def __init__(self, workers: Optional[int] = None, processes: Optional[bool] = None):
+        self.workers = max(1, workers or config.PARSE_WORKERS)
+        self.processes = config.PARSE_IN_PROCESSES if processes is None else processes
+        self._lock = threading.Lock()
+        self._executor = self._make_executor()
+        # bumped on every rebuild, so threads that saw the same broken pool rebuild it once
+        self._generation = 0
+
+    def _make_executor(self) -> concurrent.futures.Executor:
+        if self.processes:
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_exit_with_parent,
+                initargs=(os.getpid(),),
+            )
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="parse"
+        )
+
+    def submit(self, url: str, body: bytes) -> concurrent.futures.Future:
+        return self._submit(url, body)[0]
+
+    def _submit(self, url: str, body: bytes) -> Tuple[concurrent.futures.Future, int]:
+        with self._lock:
+            future = self._executor.submit(parse_page, url, body, config.MAX_CANDIDATE_URLS)
+            return future, self._generation
+
+    def parse(self, url: str, body: bytes) -> dict:
+        future, generation = self._submit(url, body)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died (segfault in a parser, OOM kill); start a fresh pool once.
+            with self._lock:
+                if self._generation == generation:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._make_executor()
+                    self._generation += 1
+            return self.submit(url, body).result()
+
+    def close(self) -> None:
+        with self._lock:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_shared: Optional[ParsePool] = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool() -> ParsePool:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ParsePool()
+            atexit.register(_shared.close)
+        return _shared
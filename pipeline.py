@@ -0,0 +1,479 @@
+"""Staged query pipeline: search -> fetch -> parse -> relevance -> extraction -> persistence.
+
+Every stage has its own worker threads and a bounded inbox, so query N+1 is
+already searching while query N's pages are being fetched and judged. Rows are
+committed to the DataManager in query order, which keeps dataset.csv the same as
+the old one-query-at-a-time loop (the first query to save a page still wins).
+With a SessionJournal, search results are journaled and each query is marked
+done once its rows are flushed, which is what --resume picks up from.
+
+Queries are handed to the search stage by a QueryScheduler, at most
+QUERY_LOOKAHEAD ahead of the oldest unfinished one, so each pick can use the
+yields of the queries finished so far. "Query order" above means the order
+the scheduler picked them in.
+
+Memory stays flat however many results a query brings: raw bodies wait for
+the parser under a byte budget (PIPELINE_BODY_BUDGET), the parser hands back
+only text and candidate links, and an extracted page's text goes into the
+session archive right away. Rows held for query order are small.
+
+An extracted row's verified download links are probed in the background
+(link_probe.RowProbes, PROBE_ENABLED). The row doesn't wait for them: answers
+that arrive after it was saved are written into the stored row, and the end
+of the run waits at most PROBE_WAIT seconds for stragglers.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Collection, Dict, List, Optional
+
+import config
+import link_probe
+import metrics
+from query_scheduler import QueryScheduler
+from session_stats import RunTotals
+
+_STOP = object()
+
+
+@dataclass
+class QueryTicket:
+    """Book-keeping for one query while its pages are spread over the stages."""
+
+    index: int
+    query: str
+    num_results: int = 0
+    links: int = 0
+    kept: int = 0
+    # pages fetched / judged relevant / extracted with verified links, for the scheduler
+    fetched: int = 0
+    relevant: int = 0
+    with_links: int = 0
+    finished: bool = False
+    held: List[dict] = field(default_factory=list, repr=False)
+    _pending: int = field(default=0, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def expect(self, n: int) -> None:
+        with self._lock:
+            self._pending = n
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def release(self) -> bool:
+        """One page is done with; True when it was the query's last one."""
+        with self._lock:
+            self._pending -= 1
+            return self._pending == 0
+
+
+class ByteBudget:
+    """Soft cap on bytes held between two stages: wait for room, then add; release when done."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.held = 0
+        self.peak = 0
+        self._room = threading.Condition()
+
+    def wait_for_room(self) -> None:
+        with self._room:
+            self._room.wait_for(lambda: self.limit <= 0 or self.held < self.limit)
+
+    def add(self, n: int) -> None:
+        with self._room:
+            self.held += n
+            self.peak = max(self.peak, self.held)
+
+    def release(self, n: int) -> None:
+        with self._room:
+            self.held -= n
+            self._room.notify_all()
+
+
+class Stage:
+    """A pool of worker threads draining one bounded inbox.
+
+    With batch_size set, the handler gets a list: whatever else arrives within
+    `linger` seconds of the first item, up to batch_size() items.
+
+    A handler that raises doesn't take its worker down: the error is printed
+    and `on_error` gets the item (or batch) so its query can still finish.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        queue_size: int,
+        handler: Callable,
+        batch_size: Optional[Callable[[], int]] = None,
+        linger: float = 0.0,
+        on_error: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.inbox: queue.Queue = queue.Queue(maxsize=max(0, queue_size))
+        self.handler = handler
+        self.batch_size = batch_size
+        self.linger = linger
+        self.on_error = on_error
+        self._abort = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for n in range(self.workers):
+            # Each worker runs in a copy of the caller's context, so per-run config
+            # overrides (config.overrides) reach the stage handlers.
+            t = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._loop,),
+                name=f"{self.name}-{n}",
+                daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+
+    def _loop(self) -> None:
+        while not self._abort.is_set():
+            try:
+                item = self.inbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                return
+            if self.batch_size is None:
+                self._handle(item)
+                continue
+
+            items = [item]
+            stopping = False
+            deadline = time.monotonic() + self.linger
+            while len(items) < self.batch_size():
+                try:
+                    nxt = self.inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stopping = True
+                    break
+                items.append(nxt)
+            self._handle(items)
+            if stopping:
+                return
+
+    def _handle(self, work) -> None:
+        try:
+            self.handler(work)
+        except Exception as e:
+            print(f"Error in {self.name} stage: {e}")
+            if self.on_error is not None:
+                try:
+                    self.on_error(work)
+                except Exception as e:
+                    print(f"Error in {self.name} stage cleanup: {e}")
+
+    def close(self) -> None:
+        """Let the inbox drain, then wait for every worker to exit."""
+        for _ in self._threads:
+            self.inbox.put(_STOP)
+        for t in self._threads:
+            t.join()
+
+    def abort(self) -> None:
+        self._abort.set()
+
+    def depth(self) -> int:
+        return self.inbox.qsize()
+
+
+class QueryPipeline:
+    def __init__(self, searcher, analyzer, store, run: RunTotals, journal=None):
+        self.searcher = searcher
+        self.analyzer = analyzer
+        self.store = store
+        self.run = run
+        self.journal = journal
+        self._tickets: List[QueryTicket] = []
+        self._total = 0
+        self._next_commit = 0
+        self._progress = threading.Condition()
+        self.scheduler: Optional[QueryScheduler] = None
+        self.bodies = ByteBudget(config.PIPELINE_BODY_BUDGET)
+        self.probes: Optional[link_probe.RowProbes] = None
+        if config.PROBE_ENABLED:
+            self.probes = link_probe.RowProbes(link_probe.shared_prober(), store.update_links)
+
+        # A page whose handler failed counts as done with, so its query still commits.
+        page_failed = lambda item: self._done_with(item[0])  # noqa: E731
+        self.search = Stage(
+            "search",
+            config.PIPELINE_SEARCH_WORKERS,
+            0,
+            self._search,
+            on_error=self._search_failed,
+        )
+        self.fetch = Stage(
+            "fetch",
+            config.PIPELINE_FETCH_WORKERS,
+            config.PIPELINE_FETCH_QUEUE_SIZE,
+            self._fetch,
+            on_error=page_failed,
+        )
+        self.parse = Stage(
+            "parse",
+            config.PIPELINE_PARSE_WORKERS,
+            config.PIPELINE_PARSE_QUEUE_SIZE,
+            self._parse,
+            on_error=page_failed,
+        )
+        self.filter = Stage(
+            "filter",
+            config.PIPELINE_FILTER_WORKERS,
+            config.PIPELINE_FILTER_QUEUE_SIZE,
+            self._filter,
+            batch_size=lambda: analyzer.filter.batch_size,
+            linger=config.RELEVANCE_BATCH_LINGER,
+            on_error=lambda items: [page_failed(item) for item in items],
+        )
+        self.extract = Stage(
+            "extract",
+            config.PIPELINE_EXTRACT_WORKERS,
+            config.PIPELINE_EXTRACT_QUEUE_SIZE,
+            self._extract,
+            on_error=page_failed,
+        )
+        # One writer only: rows have to reach the store in query order.
+        self.save = Stage("save", 1, config.PIPELINE_SAVE_QUEUE_SIZE, self._save)
+        self.stages = [
+            self.search,
+            self.fetch,
+            self.parse,
+            self.filter,
+            self.extract,
+            self.save,
+        ]
+
+    def depths(self) -> Dict[str, int]:
+        return {s.name: s.depth() for s in self.stages}
+
+    def run_queries(self, queries: List[str], done: Collection[int] = ()) -> int:
+        """Push every query through the stages; returns how many search hits were processed.
+
+        Indices in `done` belong to queries a resumed session already finished.
+        """
+        self.scheduler = QueryScheduler([(i, q) for i, q in enumerate(queries) if i not in done])
+        self._tickets = []
+        self._total = len(queries)
+        self._next_commit = 0
+        lookahead = max(1, config.QUERY_LOOKAHEAD)
+
+        for stage in self.stages:
+            stage.start()
+        try:
+            while True:
+                with self._progress:
+                    while len(self._tickets) - self._next_commit >= lookahead:
+                        self._progress.wait(0.5)
+                picked = self.scheduler.next_query()
+                if picked is None:
+                    break
+                ticket = QueryTicket(*picked)
+                self._tickets.append(ticket)
+                self.search.inbox.put(ticket)
+            # Closing in stage order means each inbox has seen all of its work first.
+            for stage in self.stages:
+                stage.close()
+        except BaseException:
+            for stage in self.stages:
+                stage.abort()
+            raise
+
+        self.run.stats["query_scheduler"] = self.scheduler.stats()
+        self.run.stats["memory"] = {"peak_unparsed_body_bytes": self.bodies.peak}
+        if self.probes is not None:
+            self.probes.close(config.PROBE_WAIT)
+            self.run.stats["link_probe"] = {**self.probes.counts, **self.probes.prober.stats()}
+        if self.scheduler.stopped_early:
+            print(
+                f"Stopping early: recent queries yield too little; "
+                f"{self.scheduler.skipped} queries left for --resume."
+            )
+        return sum(t.links for t in self._tickets)
+
+    def _done_with(self, ticket: QueryTicket) -> None:
+        if ticket.release():
+            self.save.inbox.put(ticket)
+
+    @staticmethod
+    def _journaled(write: Callable, *args):
+        """A journal read or write that can fail; the query goes on unjournaled (None)."""
+        try:
+            return write(*args)
+        except Exception as e:
+            print(f"Journal error ({write.__name__}): {e}")
+            return None
+
+    def _search_failed(self, ticket: QueryTicket) -> None:
+        # nothing was handed on yet (the fan-out is the handler's last step)
+        self.save.inbox.put(ticket)
+
+    def _search(self, ticket: QueryTicket) -> None:
+        self.run.bump("queries_executed")
+        print(f"\n[{ticket.index + 1}/{self._total}] Processing Query: {ticket.query}")
+        links = self._journaled(self.journal.search_links, ticket.index) if self.journal else None
+        if links is None:
+            try:
+                with metrics.timed("search"):
+                    links = self.searcher.perform_search(
+                        ticket.query, num_results=ticket.num_results
+                    )
+            except Exception as e:
+                print(f"Search failed for '{ticket.query}': {e}")
+                links = []
+            else:
+                if self.journal:
+                    self._journaled(self.journal.record_search, ticket.index, links)
+        print(f"Found {len(links)} links for: {ticket.query}")
+        self.run.bump("search_hits_total", len(links))
+
+        if (
+            not links
+            and len(self.run.queries_no_results) < config.MAX_QUERIES_NO_RESULTS_TRACKED
+        ):
+            self.run.queries_no_results.append(ticket.query)
+
+        ticket.links = len(links)
+        fresh = self.analyzer.fresh_links(links, self.run)
+        if not fresh:
+            self.save.inbox.put(ticket)
+            return
+        ticket.expect(len(fresh))
+        for url in fresh:
+            self.fetch.inbox.put((ticket, url))
+
+    def _fetch(self, item) -> None:
+        ticket, url = item
+        with metrics.timed("fetch.body_budget"):
+            self.bodies.wait_for_room()
+        try:
+            resp = self.analyzer.download(url, self.run)
+        except Exception as e:
+            print(f"Error analyzing {url}: {e}")
+            resp = None
+        if resp:
+            ticket.count("fetched")
+            self.bodies.add(len(resp.body))
+            self.parse.inbox.put((ticket, url, resp))
+        else:
+            self._done_with(ticket)
+
+    def _parse(self, item) -> None:
+        ticket, url, resp = item
+        try:
+            payload = self.analyzer.parse(url, resp, self.run)
+        finally:
+            self.bodies.release(len(resp.body))
+        if payload:
+            self.filter.inbox.put((ticket, payload))
+        else:
+            self._done_with(ticket)
+
+    def _filter(self, items) -> None:
+        """One relevance batch per query among the items that arrived together."""
+        by_query: Dict[int, list] = {}
+        for ticket, payload in items:
+            by_query.setdefault(ticket.index, []).append((ticket, payload))
+
+        for group in by_query.values():
+            ticket = group[0][0]
+            payloads = [payload for _, payload in group]
+            try:
+                verdicts = self.analyzer.judge_many(ticket.query, payloads, self.run)
+            except Exception as e:
+                print(f"Error analyzing batch of {len(payloads)} pages: {e}")
+                verdicts = [False] * len(payloads)
+            for payload, relevant in zip(payloads, verdicts):
+                if relevant:
+                    ticket.count("relevant")
+                    self.extract.inbox.put((ticket, payload))
+                else:
+                    self._done_with(ticket)
+
+    def _extract(self, item) -> None:
+        ticket, payload = item
+        try:
+            row = self.analyzer.extract(ticket.query, payload, self.run)
+            if row.get("verified_download_links"):
+                ticket.count("with_links")
+            if self.probes is not None and row.get("verified_download_links"):
+                self.probes.start(row)
+            # the row may wait behind earlier queries; only its archive hash waits with it
+            self.save.inbox.put((ticket, self.store.spill(row)))
+        except Exception as e:
+            print(f"Error analyzing {payload.get('url')}: {e}")
+        self._done_with(ticket)
+
+    def _save(self, item) -> None:
+        if isinstance(item, QueryTicket):
+            item.finished = True
+        else:
+            ticket, payload = item
+            ticket.kept += 1
+            ticket.held.append(payload)
+        self._commit_in_order()
+
+    def _commit_in_order(self) -> None:
+        """Write held rows for the oldest open query; later queries wait their turn."""
+        while self._next_commit < len(self._tickets):
+            ticket = self._tickets[self._next_commit]
+            for payload in ticket.held:
+                try:
+                    if self.probes is not None:
+                        self.probes.save(
+                            payload, lambda row: self.store.save_article(ticket.query, row)
+                        )
+                    else:
+                        self.store.save_article(ticket.query, payload)
+                except Exception as e:
+                    print(f"Error saving {payload.get('url')}: {e}")
+            ticket.held.clear()
+            if not ticket.finished:
+                return
+            try:
+                self._finish(ticket)
+            except Exception as e:
+                print(f"Error finishing query '{ticket.query}': {e}")
+            # always move on, or the writer and the query feed wait on this ticket forever
+            with self._progress:
+                self._next_commit += 1
+                self._progress.notify()
+
+    def _finish(self, ticket: QueryTicket) -> None:
+        """A query's rows are all written: journal it, tell the scheduler, report."""
+        if self.journal:
+            # only a query whose rows are flushed may be marked done for --resume
+            try:
+                self.store.flush()
+            except Exception as e:
+                print(f"Error flushing rows for '{ticket.query}': {e}")
+            else:
+                self._journaled(self.journal.finish_query, ticket.index, self.run.snapshot())
+        try:
+            self.scheduler.record(ticket.query, ticket.fetched, ticket.relevant, ticket.with_links)
+        except Exception as e:
+            # the scheduler just learns nothing from this query
+            print(f"Error recording query yield for '{ticket.query}': {e}")
+        print(
+            f"[{ticket.index + 1}/{self._total}] Done: {ticket.kept} useful "
+            f"articles from {ticket.links} links ({ticket.query})"
+        )
+        print(f"Stage queues: {self.depths()}")
+        print("-" * 50)
@@ -0,0 +1,192 @@
+"""Per-host pacing for the fetch engine: token buckets, robots.txt and AIMD backoff.
+
+Every host gets a token bucket refilled at its current rate (HOST_RATE requests
+per second to start, HOST_BURST deep). Each successful response nudges the rate
+up by HOST_RATE_STEP, up to HOST_MAX_RATE or the robots.txt Crawl-delay. A 429
+or 503 halves it and parks the host until Retry-After (or one refill period)
+has passed. That is additive increase / multiplicative decrease, per host.
+
+Everything runs as coroutines on the engine's event loop, so a host that is
+waiting costs nothing for the others. A request that would wait more than
+HOST_MAX_WAIT for its host is dropped with FetchError("host_backoff") rather
+than tying up a pipeline worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import config
+
+# FetchError reasons, as they show up in RunTotals.fetch_failure_reasons
+ROBOTS = "robots_disallowed"
+HOST_BACKOFF = "host_backoff"
+THROTTLED = "throttled"
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+REDIRECTS = "too_many_redirects"
+TOO_LARGE = "too_large"
+EMPTY = "empty_body"
+PARSE = "parse_error"
+OTHER = "other"
+
+# Status codes that mean "slow down" rather than "this page is broken"
+BACKOFF_STATUSES = frozenset({429, 503})
+
+
+class FetchError(Exception):
+    def __init__(self, reason: str, url: str, detail: str = ""):
+        super().__init__(f"{reason}: {url}" + (f" ({detail})" if detail else ""))
+        self.reason = reason
+        self.url = url
+
+
+def http_reason(status: int) -> str:
+    if status in BACKOFF_STATUSES:
+        return THROTTLED
+    return f"http_{status // 100}xx"
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class _Host:
+    rate: float
+    ceiling: float
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0
+    requests: int = 0
+    throttled: int = 0
+    dropped: int = 0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(config.HOST_BURST, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class HostScheduler:
+    """Lives on the fetch engine's loop; fetch_robots(origin) returns robots.txt text or None."""
+
+    def __init__(self, fetch_robots: Callable[[str], Awaitable[Optional[str]]]):
+        self._fetch_robots = fetch_robots
+        self._hosts: Dict[str, _Host] = {}
+        self._robots: Dict[str, Tuple[float, Optional[RobotFileParser]]] = {}
+        self._robots_pending: Dict[str, asyncio.Future] = {}
+        self.robots_blocked = 0
+
+    def _host(self, host: str, now: float) -> _Host:
+        state = self._hosts.get(host)
+        if state is None:
+            state = _Host(
+                rate=config.HOST_RATE,
+                ceiling=config.HOST_MAX_RATE,
+                tokens=float(config.HOST_BURST),
+                updated=now,
+            )
+            self._hosts[host] = state
+        return state
+
+    async def acquire(self, url: str) -> None:
+        """Wait for the host's next slot; raises FetchError for robots or an over-long wait."""
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if config.ROBOTS_ENABLED:
+            robots = await self._robots_for(f"{parts.scheme}://{parts.netloc}")
+            if robots is not None:
+                if not robots.can_fetch(config.ROBOTS_USER_AGENT, url):
+                    self.robots_blocked += 1
+                    raise FetchError(ROBOTS, url)
+                delay = robots.crawl_delay(config.ROBOTS_USER_AGENT)
+                if delay:
+                    state = self._host(host, time.monotonic())
+                    state.ceiling = min(state.ceiling, 1.0 / float(delay))
+                    state.rate = min(state.rate, state.ceiling)
+
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            state = self._host(host, now)
+            state.refill(now)
+            wait = state.blocked_until - now
+            if wait <= 0:
+                if state.tokens >= 1.0:
+                    state.tokens -= 1.0
+                    state.requests += 1
+                    return
+                wait = (1.0 - state.tokens) / state.rate
+            if now + wait - started > config.HOST_MAX_WAIT:
+                state.dropped += 1
+                raise FetchError(HOST_BACKOFF, url, f"host slot more than {wait:.0f}s away")
+            await asyncio.sleep(wait)
+
+    def feedback(self, url: str, status: int, retry_after: Optional[str] = None) -> None:
+        """AIMD step from a response status (0 for a timeout or connection error)."""
+        now = time.monotonic()
+        state = self._host((urlsplit(url).hostname or "").lower(), now)
+        if status in BACKOFF_STATUSES or status == 0:
+            state.rate = max(config.HOST_MIN_RATE, state.rate / 2.0)
+            pause = retry_after_seconds(retry_after)
+            if pause is None:
+                pause = 1.0 / state.rate
+            state.blocked_until = max(state.blocked_until, now + pause)
+            state.tokens = 0.0
+            state.throttled += status != 0
+        elif status < 500:
+            state.rate = min(state.ceiling, state.rate + config.HOST_RATE_STEP)
+
+    async def _robots_for(self, origin: str) -> Optional[RobotFileParser]:
+        cached = self._robots.get(origin)
+        if cached and time.monotonic() - cached[0] < config.ROBOTS_TTL:
+            return cached[1]
+        pending = self._robots_pending.get(origin)
+        if pending is not None:
+            return await pending
+
+        fut = asyncio.get_running_loop().create_future()
+        self._robots_pending[origin] = fut
+        parser = None
+        try:
+            text = await self._fetch_robots(origin)
+            if text is not None:
+                parser = RobotFileParser()
+                parser.parse(text.splitlines())
+        except Exception:
+            parser = None  # unreachable robots.txt: crawl as if there were none
+        finally:
+            self._robots[origin] = (time.monotonic(), parser)
+            del self._robots_pending[origin]
+            fut.set_result(parser)
+        return parser
+
+    def stats(self) -> Dict[str, object]:
+        hosts = list(self._hosts.items())
+        throttled = sorted(
+            ((h, s.throttled) for h, s in hosts if s.throttled), key=lambda x: -x[1]
+        )
+        return {
+            "hosts": len(hosts),
+            "requests": sum(s.requests for _, s in hosts),
+            "throttled_responses": sum(s.throttled for _, s in hosts),
+            "dropped_for_backoff": sum(s.dropped for _, s in hosts),
+            "robots_blocked": self.robots_blocked,
+            "robots_files": sum(1 for _, p in self._robots.values() if p is not None),
+            "most_throttled": ", ".join(f"{h} ({n})" for h, n in throttled[:5]) or "-",
+        }
@@ -0,0 +1,147 @@
+"""Cheap local scoring that settles obvious pages before the LLM relevance gate.
+
+score_page() adds up a few signals we already have for free once a page is
+parsed: data-file links among the harvested candidates, a prior for the host,
+how much of the query shows up in the text, data vocabulary density and
+whether trafilatura found tables. Pages at or below PREFILTER_REJECT_SCORE
+are dropped and the rest go to the model, unless they are clearly on topic:
+a page is kept without asking only when it mentions the query's terms and
+its topic score (coverage, data vocabulary, tables; no portal prior or link
+points) reaches PREFILTER_ACCEPT_SCORE. A portal page full of CSV links about
+something else can't get past the LLM on links alone.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import config
+from data_vocab import DATA_FILE_RE, DATA_HINT_RE, DATA_WORDS, STOPWORDS
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_OPERATOR_RE = re.compile(r"\b(?:site|filetype|inurl|intitle|ext):\S+", re.I)
+
+# Host suffix -> prior. Positive for data portals, negative for social/video sites.
+_DOMAIN_PRIORS = {
+    "kaggle.com": 2.0,
+    "huggingface.co": 2.0,
+    "data.gov": 2.0,
+    "data.gov.uk": 2.0,
+    "data.europa.eu": 2.0,
+    "datahub.io": 1.5,
+    "data.world": 1.5,
+    "zenodo.org": 1.5,
+    "figshare.com": 1.5,
+    "dataverse.harvard.edu": 1.5,
+    "archive.ics.uci.edu": 1.5,
+    "openml.org": 1.5,
+    "github.com": 1.0,
+    "githubusercontent.com": 1.0,
+    "paperswithcode.com": 1.0,
+    "ourworldindata.org": 1.0,
+    "worldbank.org": 1.0,
+    "medium.com": -1.5,
+    "reddit.com": -1.5,
+    "quora.com": -2.0,
+    "linkedin.com": -2.0,
+    "facebook.com": -2.5,
+    "instagram.com": -2.5,
+    "pinterest.com": -2.5,
+    "twitter.com": -2.0,
+    "x.com": -2.0,
+    "youtube.com": -2.5,
+    "tiktok.com": -2.5,
+}
+
+
+@dataclass
+class PageScore:
+    # every signal; decides rejections
+    score: float
+    # topic signals only (a bad host still counts against); decides acceptances
+    accept_score: float
+    domain_prior: float
+    file_links: int
+    hint_links: int
+    topic_coverage: float
+    data_word_density: float
+    table_rows: int
+
+    def verdict(self) -> Optional[bool]:
+        """True / False when the score is decisive, None when the LLM should decide."""
+        if self.topic_coverage > 0 and self.accept_score >= config.PREFILTER_ACCEPT_SCORE:
+            return True
+        if self.score <= config.PREFILTER_REJECT_SCORE:
+            return False
+        return None
+
+
+def domain_prior(url: str) -> float:
+    host = (urlparse(url).hostname or "").lower()
+    best = 0.0
+    for suffix, prior in _DOMAIN_PRIORS.items():
+        if host == suffix or host.endswith("." + suffix):
+            if abs(prior) > abs(best):
+                best = prior
+    return best
+
+
+def topic_terms(query: str) -> List[str]:
+    """Words of a search query minus operators and filler."""
+    plain = _OPERATOR_RE.sub(" ", query.lower())
+    terms = [w for w in _WORD_RE.findall(plain) if w not in STOPWORDS and len(w) > 1]
+    return list(dict.fromkeys(terms))
+
+
+def score_page(query: str, url: str, text: str, candidates: List[str]) -> PageScore:
+    words = _WORD_RE.findall((text or "").lower())
+    vocab = set(words)
+    terms = topic_terms(query)
+    coverage = sum(1 for t in terms if t in vocab) / len(terms) if terms else 0.0
+    density = (
+        1000.0 * sum(1 for w in words if w in DATA_WORDS) / len(words) if words else 0.0
+    )
+    file_links = sum(1 for u in candidates if DATA_FILE_RE.search(u))
+    hint_links = sum(1 for u in candidates if DATA_HINT_RE.search(u))
+    table_rows = sum(1 for line in (text or "").splitlines() if line.count("|") >= 2)
+    prior = domain_prior(url)
+
+    topic = coverage * 3.0 + min(density, 50.0) / 25.0 + (1.5 if table_rows >= 3 else 0.0)
+    if terms and coverage == 0.0:
+        topic -= 2.0
+    score = topic + prior + min(file_links, 5) * 1.0 + min(hint_links, 10) * 0.2
+    return PageScore(
+        score=round(score, 3),
+        accept_score=round(topic + min(prior, 0.0), 3),
+        domain_prior=prior,
+        file_links=file_links,
+        hint_links=hint_links,
+        topic_coverage=round(coverage, 3),
+        data_word_density=round(density, 2),
+        table_rows=table_rows,
+    )
+
+
+class CorpusRecorder:
+    """Appends LLM-judged pages (with their local score) to a JSONL file for benchmarking."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, query: str, payload: dict, page_score: PageScore, llm_relevant: bool) -> None:
+        row = {
+            "query": query,
+            "url": payload["url"],
+            "text": payload.get("text") or "",
+            "candidates": payload.get("candidates") or [],
+            "llm_relevant": llm_relevant,
+            "prefilter": asdict(page_score),
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
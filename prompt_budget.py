@@ -0,0 +1,298 @@
+"""Fit the extraction prompt to a token budget instead of sending text[:6000] and every URL.
+
+Prefill time on a small local model grows with prompt length, and the first
+6000 characters of a page are often menus and cookie banners while the data
+description sits further down. plan_extract() builds the two variable parts of
+the extract_info prompt:
+
+- Content: the page is split into passages (trafilatura's paragraphs) and
+  each is scored for what extraction needs. That means data and license
+  vocabulary, query terms, table-like rows, and mentions of the file names
+  among the candidate links. Boilerplate is penalized. The best passages that
+  fit EXTRACT_CONTENT_TOKENS are kept in page order, always with the opening
+  passage (usually the title).
+- Candidates: stylesheets, scripts, images, fonts and share buttons are
+  dropped. Long shared prefixes are written once as aliases ({A}, {B}, ...).
+  The list is cut to EXTRACT_CANDIDATE_TOKENS. The model still answers with
+  indices, and `index_map` turns them back into indices of the original
+  candidate list, so grounding works exactly as before.
+
+Both budgets shrink together when OLLAMA_NUM_CTX can't hold them next to the
+fixed prompt and the reply. Token counts are estimates at ~4 characters per
+token (~3 for URLs), the same rule FilterAgent uses.
+
+The before/after estimates add up in a BudgetTotals: the session's when one is
+bound to the current context (runner binds one per session, like metrics),
+else a process-wide one.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import config
+from data_vocab import DATA_FILE_RE, DATA_WORDS, STOPWORDS
+
+# Fixed part of the extract prompt (instructions, keys) in tokens
+PROMPT_OVERHEAD_TOKENS = 380
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_ASSET_RE = re.compile(
+    r"\.(?:css|js|mjs|png|jpe?g|gif|svg|ico|webp|avif|bmp|woff2?|ttf|otf|eot|mp4|webm|mp3)"
+    r"(?:\?|$)",
+    re.I,
+)
+_SHARE_RE = re.compile(
+    r"(?:facebook\.com/shar|twitter\.com/(?:intent|share)|x\.com/intent|linkedin\.com/share"
+    r"|pinterest\.com/pin|reddit\.com/submit|wa\.me/|t\.me/share|mailto:|javascript:)",
+    re.I,
+)
+_BOILERPLATE_WORDS = frozenset(
+    "cookie cookies privacy subscribe newsletter login log sign signup menu navigation "
+    "skip share follow copyright rights reserved advertisement consent terms".split()
+)
+_LICENSE_RE = re.compile(
+    r"\b(?:licen[cs]e|cc[- ]by|creative commons|mit|apache|odbl|gpl)\b", re.I
+)
+_TABLE_RE = re.compile(r"\||\t|(?:\d[\d.,]*\s+){3,}")
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    return math.ceil(len(text) / chars_per_token)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _file_stem(url: str) -> Optional[str]:
+    name = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+    stem = name.rsplit(".", 1)[0].lower()
+    return stem if len(stem) >= 4 else None
+
+
+def split_passages(text: str, max_chars: int = 1200) -> List[str]:
+    """Paragraphs, with over-long ones cut at sentence ends near max_chars."""
+    passages = []
+    for para in re.split(r"\n\s*\n|\n", text):
+        para = para.strip()
+        while len(para) > max_chars:
+            cut = para.rfind(". ", 0, max_chars)
+            cut = cut + 1 if cut > max_chars // 2 else max_chars
+            passages.append(para[:cut].strip())
+            para = para[cut:].strip()
+        if para:
+            passages.append(para)
+    return passages
+
+
+def score_passage(passage: str, query_terms: set, stems: set) -> float:
+    words = _words(passage)
+    if not words:
+        return -1.0
+    n = len(words)
+    score = 0.0
+    score += 3.0 * len({w for w in words if w in DATA_WORDS}) / math.sqrt(n)
+    score += 2.0 * len(query_terms.intersection(words)) / max(1, len(query_terms))
+    if _LICENSE_RE.search(passage):
+        score += 1.5
+    if DATA_FILE_RE.search(passage) or any(s in passage.lower() for s in stems):
+        score += 2.0
+    if _TABLE_RE.search(passage):
+        score += 1.0
+    score -= 10.0 * sum(1 for w in words if w in _BOILERPLATE_WORDS) / n
+    if n < 6:
+        score -= 1.0  # menu items, buttons, breadcrumbs
+    return score
+
+
+def select_content(text: str, query: str, candidates: List[str], budget_tokens: int) -> str:
+    """Best-scoring passages within budget_tokens, in page order; '[...]' marks gaps."""
+    text = text or ""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    passages = split_passages(text)
+    if not passages:
+        return ""
+    query_terms = {w for w in _words(query) if w not in STOPWORDS}
+    stems = {s for s in map(_file_stem, candidates) if s}
+    scored = sorted(
+        range(len(passages)),
+        key=lambda i: -score_passage(passages[i], query_terms, stems),
+    )
+
+    budget = budget_tokens
+    chosen = set()
+    # the opening passage is usually the title / dataset name
+    if estimate_tokens(passages[0]) <= budget // 4:
+        chosen.add(0)
+        budget -= estimate_tokens(passages[0]) + 1
+    for i in scored:
+        if i in chosen:
+            continue
+        cost = estimate_tokens(passages[i]) + 1
+        if cost <= budget:
+            chosen.add(i)
+            budget -= cost
+        if budget < 20:
+            break
+
+    parts = []
+    last = -1
+    for i in sorted(chosen):
+        if last >= 0 and i != last + 1:
+            parts.append("[...]")
+        parts.append(passages[i])
+        last = i
+    return "\n".join(parts)
+
+
+def is_asset(url: str) -> bool:
+    return bool(_ASSET_RE.search(urlsplit(url).path) or _SHARE_RE.search(url))
+
+
+def _shared_prefixes(urls: List[str], min_len: int = 24) -> List[str]:
+    """Directory prefixes shared by two or more URLs, longest first."""
+    by_dir: Dict[str, int] = {}
+    for url in urls:
+        head = url[: url.rfind("/") + 1]
+        if len(head) >= min_len:
+            by_dir[head] = by_dir.get(head, 0) + 1
+    return sorted((d for d, n in by_dir.items() if n >= 2), key=len, reverse=True)
+
+
+def compress_candidates(candidates: List[str], budget_tokens: int) -> Tuple[str, List[int]]:
+    """Candidate block for the prompt and, per shown line, the index into `candidates`."""
+    keep = [i for i, url in enumerate(candidates) if not is_asset(url)]
+    prefixes = _shared_prefixes([candidates[i] for i in keep])[:26]
+    aliases = {p: "{" + chr(ord("A") + n) + "}" for n, p in enumerate(prefixes)}
+
+    def shorten(url: str) -> str:
+        for prefix in prefixes:
+            if url.startswith(prefix):
+                return aliases[prefix] + url[len(prefix):]
+        return url
+
+    lines: List[str] = []
+    index_map: List[int] = []
+    used_aliases = set()
+    # the alias legend costs a line per alias used; budget for all of them up front
+    budget = budget_tokens - sum(estimate_tokens(p, 3.0) + 3 for p in prefixes)
+    for i in keep:
+        short = shorten(candidates[i])
+        line = f"{len(lines)}: {short}"
+        cost = estimate_tokens(line, 3.0) + 1
+        if cost > budget:
+            break
+        budget -= cost
+        lines.append(line)
+        index_map.append(i)
+        if short.startswith("{"):
+            used_aliases.add(short[: short.index("}") + 1])
+
+    legend = [f"{alias} = {prefix}" for prefix, alias in aliases.items() if alias in used_aliases]
+    if legend:
+        legend.insert(0, "Where a URL starts with {X}, replace it with:")
+        lines = legend + [""] + lines
+    return "\n".join(lines), index_map
+
+
+@dataclass
+class ExtractPlan:
+    content: str
+    candidate_block: str
+    # position in the shown candidate list -> index into the original candidates
+    index_map: List[int]
+    tokens_before: int
+    tokens_after: int
+
+
+def budgets(max_reply_tokens: int) -> Tuple[int, int]:
+    """(content, candidate) token budgets, scaled down to fit OLLAMA_NUM_CTX."""
+    content = config.EXTRACT_CONTENT_TOKENS
+    cands = config.EXTRACT_CANDIDATE_TOKENS
+    room = config.OLLAMA_NUM_CTX - PROMPT_OVERHEAD_TOKENS - max_reply_tokens
+    if content + cands > room:
+        scale = max(room, 200) / (content + cands)
+        content, cands = int(content * scale), int(cands * scale)
+    return content, cands
+
+
+def plan_extract(
+    text: str, query: str, candidates: List[str], max_reply_tokens: int
+) -> ExtractPlan:
+    text = text or ""
+    content_budget, cand_budget = budgets(max_reply_tokens)
+    content = select_content(text, query, candidates, content_budget)
+    block, index_map = compress_candidates(candidates, cand_budget)
+
+    before = estimate_tokens(text[:6000]) + sum(
+        estimate_tokens(f"{i}: {u}", 3.0) + 1 for i, u in enumerate(candidates)
+    )
+    after = estimate_tokens(content) + estimate_tokens(block, 3.0)
+    _session.get().add(before, after, len(candidates) - len(index_map))
+    return ExtractPlan(content, block, index_map, before, after)
+
+
+def remap_indices(picks, index_map: List[int]) -> List[int]:
+    """Indices the model chose in the shown list -> indices into the original candidates."""
+    out = []
+    if isinstance(picks, list):
+        for i in picks:
+            if isinstance(i, int) and 0 <= i < len(index_map):
+                out.append(index_map[i])
+    return out
+
+
+class BudgetTotals:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.candidates_dropped = 0
+
+    def add(self, before: int, after: int, dropped: int) -> None:
+        with self._lock:
+            self.prompts += 1
+            self.tokens_before += before + PROMPT_OVERHEAD_TOKENS
+            self.tokens_after += after + PROMPT_OVERHEAD_TOKENS
+            self.candidates_dropped += dropped
+
+    def stats(self) -> Dict[str, object]:
+        """Estimated extraction prompt sizes, with and without the budget."""
+        with self._lock:
+            n, before, after = self.prompts, self.tokens_before, self.tokens_after
+            return {
+                "prompts": n,
+                "avg_tokens_unbudgeted": round(before / n) if n else 0,
+                "avg_tokens_sent": round(after / n) if n else 0,
+                "tokens_saved_pct": round(100 * (1 - after / before), 1) if before else 0.0,
+                "candidates_dropped": self.candidates_dropped,
+            }
+
+
+_session: contextvars.ContextVar[BudgetTotals] = contextvars.ContextVar(
+    "prompt_budget_totals", default=BudgetTotals()
+)
+
+
+@contextlib.contextmanager
+def bind(totals: BudgetTotals) -> Iterator[BudgetTotals]:
+    token = _session.set(totals)
+    try:
+        yield totals
+    finally:
+        _session.reset(token)
+
+
+def stats() -> Dict[str, object]:
+    """Totals for the session bound to this context (process-wide when none is)."""
+    return _session.get().stats()
@@ -0,0 +1,128 @@
+"""Collapse near-duplicate search queries before they are searched.
+
+The query model likes to repeat itself: the same words in another order,
+`filetype:CSV` next to `filetype:csv`, a stray "the". Every variant costs a
+full search and up to MAX_RESULTS_PER_QUERY fetches, so collapse() keeps one
+representative per cluster of similar queries.
+
+Queries are normalized (case, quotes, whitespace, sorted terms, filler words
+dropped) and compared by Jaccard similarity of their term sets. MinHash
+signatures banded into an LSH table narrow each query down to a few candidate
+representatives, so batches of thousands of queries stay cheap; candidates are
+confirmed with the exact Jaccard score against QUERY_DEDUP_THRESHOLD.
+Clustering is greedy in generation order: a query joins the first earlier
+representative it is similar enough to, otherwise it becomes one itself.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import config
+
+_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_TOKEN_RE = re.compile(r'"[^"]*"|\S+')
+_STOPWORDS = frozenset(
+    "a an and the of for in on to with by from about or".split()
+)
+
+_NUM_PERM = 64
+_BANDS = 16  # 16 bands x 4 rows: pairs at Jaccard 0.5 collide with p ~ 0.64, at 0.8 ~ 1.0
+_PRIME = (1 << 61) - 1
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cased, quote-normalized terms in sorted order (phrases stay whole)."""
+    text = query.translate(_QUOTES).casefold()
+    tokens = (" ".join(t.split()) for t in _TOKEN_RE.findall(text))
+    return " ".join(sorted(t for t in tokens if t))
+
+
+def query_terms(query: str) -> FrozenSet[str]:
+    """Normalized terms minus filler words and surrounding punctuation."""
+    terms = set()
+    for tok in normalize_query(query).split(" "):
+        tok = tok.strip(",.;!?()[]")
+        if tok and tok not in _STOPWORDS:
+            terms.add(tok)
+    return frozenset(terms)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _term_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _permutations(n: int) -> List[Tuple[int, int]]:
+    # fixed seeds so signatures are stable between runs
+    out = []
+    for i in range(n):
+        digest = hashlib.blake2b(f"perm{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % _PRIME or 1
+        b = int.from_bytes(digest[8:], "big") % _PRIME
+        out.append((a, b))
+    return out
+
+
+_PERMS = _permutations(_NUM_PERM)
+
+
+def minhash(terms: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [_term_hash(t) for t in terms] or [0]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    rows = len(signature) // _BANDS
+    return [(i, signature[i * rows : (i + 1) * rows]) for i in range(_BANDS)]
+
+
+def collapse(
+    queries: Sequence[str], threshold: Optional[float] = None
+) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Keep one query per near-duplicate cluster.
+
+    Returns the kept queries in their original order and a map from each kept
+    query to the variants merged into it (only for clusters of two or more).
+    """
+    threshold = config.QUERY_DEDUP_THRESHOLD if threshold is None else threshold
+    kept: List[str] = []
+    kept_terms: List[FrozenSet[str]] = []
+    merged: Dict[str, List[str]] = {}
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    by_form: Dict[str, int] = {}
+
+    for query in queries:
+        query = query.strip()
+        if not query:
+            continue
+        form = normalize_query(query)
+        rep = by_form.get(form)
+        terms = query_terms(query)
+        bands = None
+        if rep is None and threshold < 1.0:
+            bands = _bands(minhash(terms))
+            candidates = sorted({i for band in bands for i in buckets.get(band, ())})
+            for i in candidates:
+                if jaccard(terms, kept_terms[i]) >= threshold:
+                    rep = i
+                    break
+        if rep is not None:
+            merged.setdefault(kept[rep], []).append(query)
+            continue
+
+        idx = len(kept)
+        kept.append(query)
+        kept_terms.append(terms)
+        by_form[form] = idx
+        for band in bands or _bands(minhash(terms)):
+            buckets.setdefault(band, []).append(idx)
+
+    return kept, merged
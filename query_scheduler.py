@@ -0,0 +1,180 @@
+"""Order the remaining queries by how well queries of the same shape have paid off.
+
+A query's shape is its set of search operators (`site:kaggle.com`,
+`filetype:csv`, `inurl:data`, ...), or "(plain)" when it has none. Each shape
+is a bandit arm. Every fetched page of a finished query pays its arms
+0.5 for passing the relevance gate plus 0.5 for ending with at least one
+verified download link, so an arm's mean is "useful pages per fetch" in [0, 1].
+
+next_query() picks the pending query with the best UCB1 score averaged over
+its arms. Arms nobody has tried yet score highest, so every shape gets one
+query before any shape gets a second. Once an arm has QUERY_ADAPT_MIN_QUERIES
+finished queries and its mean is below QUERY_LOW_YIELD, its queries ask the
+search providers for QUERY_LOW_YIELD_RESULTS results instead of
+MAX_RESULTS_PER_QUERY. When the last QUERY_STOP_WINDOW finished queries
+that fetched anything together yield less than QUERY_STOP_YIELD per fetch
+(and at least QUERY_STOP_MIN_QUERIES have run), scheduling stops. Queries
+with no pages (failed or empty searches) say nothing about yield, so a run
+of provider errors can't end the session. The skipped queries stay open in
+the journal, so --resume can still run them.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+import config
+
+_OPERATOR_RE = re.compile(r"\b(site|filetype|ext|inurl|intitle|intext):(\S+)", re.I)
+_QUOTE_CHARS = "\"'"
+PLAIN = "(plain)"
+
+
+def query_arms(query: str) -> Tuple[str, ...]:
+    """Operator patterns of a query, lower-cased ("filetype:csv", "site:kaggle.com")."""
+    arms = {
+        f"{op.lower()}:{value.lower().strip(_QUOTE_CHARS)}"
+        for op, value in _OPERATOR_RE.findall(query)
+    }
+    return tuple(sorted(arms)) or (PLAIN,)
+
+
+@dataclass
+class _Arm:
+    queries: int = 0
+    pages: int = 0
+    reward: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.reward / self.pages if self.pages else 0.0
+
+
+def _describe(arms) -> str:
+    return ", ".join(f"{name} ({arm.mean:.2f})" for name, arm in arms) or "-"
+
+
+class QueryScheduler:
+    """Thread-safe: the pipeline feeds results in from its save stage."""
+
+    def __init__(self, queries: Sequence[Tuple[int, str]]):
+        self._pending: Dict[int, str] = dict(queries)
+        self._order = [i for i, _ in queries]
+        self._arms: Dict[str, _Arm] = {}
+        # arms of dispatched queries that haven't reported back yet
+        self._in_flight: Dict[str, int] = {}
+        self._recent: Deque[Tuple[int, float]] = deque(
+            maxlen=max(1, config.QUERY_STOP_WINDOW)
+        )
+        self._finished = 0
+        self._lock = threading.Lock()
+        self.adaptive = config.QUERY_ADAPTIVE
+        self.stopped_early = False
+        self.reordered = 0
+        self.shrunk = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _score(self, arms: Sequence[str], total: int) -> float:
+        scores = []
+        for name in arms:
+            arm = self._arms.get(name)
+            if arm is None or arm.queries == 0:
+                if not self._in_flight.get(name):
+                    return math.inf
+                scores.append(0.5)  # first query still running: no evidence either way
+                continue
+            bonus = math.sqrt(2.0 * math.log(max(total, 1)) / arm.queries)
+            scores.append(arm.mean + config.QUERY_EXPLORATION * bonus)
+        return sum(scores) / len(scores)
+
+    def next_query(self) -> Optional[Tuple[int, str, int]]:
+        """(index, query, num_results) for the next query to search, or None when done."""
+        with self._lock:
+            if not self._pending:
+                return None
+            if self._should_stop():
+                self.stopped_early = True
+                self.skipped = len(self._pending)
+                self._pending.clear()
+                return None
+
+            first = next(i for i in self._order if i in self._pending)
+            pick = first
+            if self.adaptive:
+                total = sum(a.queries for a in self._arms.values())
+                best = -1.0
+                for i in self._order:
+                    if i not in self._pending:
+                        continue
+                    score = self._score(query_arms(self._pending[i]), total)
+                    if score > best:
+                        pick, best = i, score
+                    if score == math.inf:
+                        break
+            if pick != first:
+                self.reordered += 1
+            query = self._pending.pop(pick)
+            for name in query_arms(query):
+                self._in_flight[name] = self._in_flight.get(name, 0) + 1
+            return pick, query, self._results_for(query)
+
+    def _results_for(self, query: str) -> int:
+        want = config.MAX_RESULTS_PER_QUERY
+        if not self.adaptive:
+            return want
+        for name in query_arms(query):
+            arm = self._arms.get(name)
+            if arm is None or arm.queries < config.QUERY_ADAPT_MIN_QUERIES:
+                return want
+            if arm.mean >= config.QUERY_LOW_YIELD:
+                return want
+        self.shrunk += 1
+        return min(want, config.QUERY_LOW_YIELD_RESULTS)
+
+    def _should_stop(self) -> bool:
+        if not self.adaptive or config.QUERY_STOP_YIELD <= 0:
+            return False
+        if self._finished < config.QUERY_STOP_MIN_QUERIES:
+            return False
+        if len(self._recent) < self._recent.maxlen:
+            return False
+        pages = sum(p for p, _ in self._recent)
+        reward = sum(r for _, r in self._recent)
+        return reward / max(pages, 1) < config.QUERY_STOP_YIELD
+
+    def record(self, query: str, pages: int, relevant: int, with_links: int) -> None:
+        """Feed back a finished query: pages fetched, pages relevant, pages with verified links."""
+        reward = 0.5 * relevant + 0.5 * with_links
+        with self._lock:
+            self._finished += 1
+            if pages:
+                self._recent.append((pages, reward))
+            for name in query_arms(query):
+                self._in_flight[name] = max(0, self._in_flight.get(name, 0) - 1)
+                arm = self._arms.setdefault(name, _Arm())
+                arm.queries += 1
+                arm.pages += pages
+                arm.reward += reward
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            tried = [(n, a) for n, a in self._arms.items() if a.pages]
+            best = sorted(tried, key=lambda x: -x[1].mean)
+            return {
+                "adaptive": self.adaptive,
+                "reordered": self.reordered,
+                "shrunk_result_counts": self.shrunk,
+                "stopped_early": self.stopped_early,
+                "queries_skipped": self.skipped,
+                "patterns": len(self._arms),
+                "best_patterns": _describe(best[:5]),
+                "worst_patterns": _describe(best[::-1][:5]),
+            }
@@ -0,0 +1,220 @@
+"""Programmatic entry points: run_topic() for one research session, run_topics() for a batch.
+
+Sessions started in one process share the fetch engine, parse pool, HTTP and
+LLM caches and the LLM scheduler (one per Ollama server), so a nightly batch
+pays for model load and cold caches once. Keyword overrides apply any config
+setting to a single run only:
+
+    from runner import run_topic
+    result = run_topic("EU electricity prices", MAX_SEARCH_QUERIES=40)
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import config
+import journal
+import metrics
+import prompt_budget
+import query_dedup
+from crawler import LinkAnalyzer
+from data_manager import DataManager
+from llm_engine import LLMEngine
+from llm_scheduler import QUERY_GEN
+from pipeline import QueryPipeline
+from search_engine import SearchEngine
+from session_stats import RunTotals
+
+_session_ids_lock = threading.Lock()
+
+
+@dataclass
+class SessionResult:
+    topic: str
+    session_id: str = ""
+    session_dir: str = ""
+    queries: int = 0
+    search_hits: int = 0
+    records_saved: int = 0
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+    totals: Optional[RunTotals] = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _new_session_id(topic: str) -> str:
+    """Timestamp plus a topic slug; concurrent runs started in the same second stay apart."""
+    slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")[:40]
+    base = datetime.now().strftime("%Y%m%d_%H%M%S") + (f"_{slug}" if slug else "")
+    with _session_ids_lock:
+        session_id, n = base, 2
+        while os.path.exists(os.path.join(config.DATA_DIR, session_id)):
+            session_id, n = f"{base}-{n}", n + 1
+        os.makedirs(os.path.join(config.DATA_DIR, session_id))
+    return session_id
+
+
+def load_topics(path: str) -> List[str]:
+    """One topic per line; blank lines and lines starting with # are skipped."""
+    with open(path, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def generate_queries(llm, topic):
+    print("\nAnalyzing topic for potential dataset sources...")
+    analysis_prompt = (
+        f"Analyze the following topic to find DATASETS. Identify key file formats "
+        f"(CSV/JSON), repository names, and technical terms:\nTopic: {topic}\n"
+        f"Keep it concise."
+    )
+    analysis = llm.generate_text(analysis_prompt)
+    print(f"Analysis: {analysis}")
+
+    print(f"\nGenerating {config.MAX_SEARCH_QUERIES} dataset search queries...")
+    generated_queries = []
+    batches = max(1, config.QUERY_GEN_BATCHES)
+    queries_per_batch = max(1, config.MAX_SEARCH_QUERIES // batches)
+
+    for i in range(batches):
+        prompt = f"""
+You are an expert Data Engineer. Based on the topic "{topic}", generate a list of {queries_per_batch} Google search queries to find DOWNLOADABLE DATASETS.
+Use advanced operators like: filetype:csv, filetype:json, filetype:parquet, "dataset", "corpus", "dump", site:kaggle.com, site:huggingface.co
+This is batch {i + 1} of {batches}; vary the wording and operators from the other batches.
+Return ONLY valid JSON format:
+{{
+  "queries": [
+    "query 1",
+    ...
+    "query {queries_per_batch}"
+  ]
+}}
+"""
+        print(f"Generating batch {i + 1}/{batches}...")
+        result = llm.generate_json(
+            prompt, max_tokens=2048, priority=QUERY_GEN, until_fields=("queries",)
+        )
+        if result and "queries" in result:
+            generated_queries.extend(result["queries"])
+        else:
+            print("Failed to generate queries for this batch.")
+
+    return list(dict.fromkeys(generated_queries))
+
+
+def run_topic(topic: str = "", resume: Optional[str] = None, **overrides) -> SessionResult:
+    """Research one topic (or continue session `resume`) with per-run config overrides.
+
+    Failures inside the session end up in SessionResult.error rather than raising,
+    so one bad topic doesn't take a batch down; unknown override names do raise.
+    """
+    with config.overrides(**overrides), metrics.bind(metrics.Metrics()):
+        with prompt_budget.bind(prompt_budget.BudgetTotals()):
+            metrics.serve()
+            return _run_session(topic, resume)
+
+
+def run_topics(
+    topics: Iterable[str], concurrency: Optional[int] = None, **overrides
+) -> List[SessionResult]:
+    """Run several topics side by side (TOPIC_CONCURRENCY at a time); results in input order."""
+    topics = list(topics)
+    with config.overrides(**overrides):
+        workers = max(1, concurrency or config.TOPIC_CONCURRENCY)
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(workers, len(topics) or 1), thread_name_prefix="topic"
+    ) as pool:
+        futures = [pool.submit(run_topic, topic, **overrides) for topic in topics]
+        return [f.result() for f in futures]
+
+
+def _run_session(topic: str, resume: Optional[str]) -> SessionResult:
+    started = time.time()
+    result = SessionResult(topic=topic, session_id=resume or "")
+    if resume and not journal.exists(os.path.join(config.DATA_DIR, resume)):
+        result.error = f"No session journal found for '{resume}' in {config.DATA_DIR}."
+        print(result.error)
+        return result
+
+    run = RunTotals(topic=topic)
+    result.totals = run
+    try:
+        llm = LLMEngine()
+        searcher = SearchEngine(run=run)
+        store = DataManager(session_id=resume or _new_session_id(topic), run=run)
+        log = journal.SessionJournal(store.session_dir)
+        analyzer = LinkAnalyzer(llm, log)
+    except Exception as e:
+        result.error = f"Failed to initialize: {e}"
+        print(result.error)
+        return result
+
+    result.session_dir = store.session_dir
+    result.session_id = session_id = os.path.basename(store.session_dir)
+    if resume:
+        run.topic = result.topic = log.meta("topic", "")
+        run.restore(log.meta("totals", {}))
+        store.resume()
+        analyzer.resume(log.url_verdicts(), store.already_saved)
+        print(f"Resuming '{run.topic}' with {run.records_saved} rows already saved.")
+    else:
+        log.set_meta("topic", topic)
+        print(f"Session {session_id} (continue with: python main.py --resume {session_id})")
+
+    try:
+        generated_queries = log.queries()
+        if not generated_queries:
+            generated_queries = generate_queries(llm, run.topic)
+            if config.QUERY_DEDUP_ENABLED:
+                generated_queries, run.queries_merged = query_dedup.collapse(generated_queries)
+                if run.queries_merged:
+                    dropped = sum(len(v) for v in run.queries_merged.values())
+                    print(f"Collapsed {dropped} near-duplicate queries.")
+            log.record_queries(generated_queries)
+        done = log.done_queries()
+        result.queries = len(generated_queries)
+        print(
+            f"Total unique queries generated: {len(generated_queries)}"
+            + (f" ({len(done)} already done)" if done else "")
+        )
+
+        if not generated_queries:
+            result.error = "No queries generated."
+            print(result.error)
+            return result
+
+        pipeline = QueryPipeline(searcher, analyzer, store, run, log)
+        total_processed = pipeline.run_queries(generated_queries, done)
+
+        print(
+            f"\n=== Job complete. Processed {total_processed} search hits. "
+            f"Data and reports: {store.session_dir} ==="
+        )
+    except Exception as e:
+        result.error = f"Session failed: {e}"
+        print(result.error)
+    finally:
+        run.stats["llm_cache"] = llm.cache_stats()
+        run.stats["llm_scheduler"] = llm.scheduler.stats()
+        if config.EXTRACT_PROMPT_BUDGET:
+            run.stats["prompt_budget"] = prompt_budget.stats()
+        run.stats["host_pacing"] = analyzer.fetcher.engine.host_stats()
+        run.stats["search"] = searcher.stats()
+        searcher.close()
+        store.close()
+        log.close()
+        result.search_hits = run.search_hits_total
+        result.records_saved = run.records_saved
+        result.duration_seconds = round(time.time() - started, 2)
+    return result
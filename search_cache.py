@@ -0,0 +1,55 @@
+"""Persistent query -> result-links memo, shared by every session under config.DATA_DIR.
+
+Queries are normalized before keying (case, whitespace, quote style and word
+order), so "Weather CSV dataset" and "dataset  weather csv" share one entry.
+Entries older than SEARCH_CACHE_TTL are ignored and overwritten on the next
+search; past SEARCH_CACHE_MAX_ENTRIES the least recently read go first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import List, Optional, Sequence
+
+import config
+import sqlite_cache
+from query_dedup import normalize_query
+from sqlite_cache import SqliteCache
+
+
+def cache_key(query: str, providers: Sequence[str], num_results: int) -> str:
+    blob = json.dumps(
+        {"q": normalize_query(query), "providers": sorted(providers), "n": num_results},
+        sort_keys=True,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class SearchCache(SqliteCache):
+    table = "results"
+    columns = ("query", "links")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        super().__init__(
+            path or config.SEARCH_CACHE_PATH,
+            max_entries or config.SEARCH_CACHE_MAX_ENTRIES,
+            ttl=config.SEARCH_CACHE_TTL if ttl is None else ttl,
+        )
+
+    def get(self, key: str) -> Optional[List[str]]:
+        values = self.get_values(key)
+        return None if values is None else json.loads(values[1])
+
+    def put(self, key: str, query: str, links: List[str]) -> None:
+        self.put_values(key, (query, json.dumps(links)))
+
+
+def shared_cache() -> Optional[SearchCache]:
+    """Search results memo for every SearchEngine in the process (SEARCH_CACHE_ENABLED)."""
+    return sqlite_cache.shared(SearchCache, config.SEARCH_CACHE_ENABLED)
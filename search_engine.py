@@ -1,51 +1,216 @@
+"""Web search across several providers at once, with per-provider pacing and a result cache.
+
+Each provider (Google, DuckDuckGo, or anything registered in PROVIDERS) runs
+in its own thread for every query. A provider gets one call slot per interval
+(DELAY_BETWEEN_SEARCHES for Google, DDGS_SEARCH_INTERVAL for DuckDuckGo) no
+matter how many search workers or sessions share it, and an error pushes its
+next slot out by SEARCH_ERROR_COOLDOWN. The lists that come back are merged
+by reciprocal rank fusion: a link scores sum(1 / (SEARCH_RRF_K + rank)) over
+the providers that returned it, so agreement between engines floats to the top.
+Merged results go to the SQLite cache in search_cache.py.
+
+Pass `providers=[...]` to SearchEngine to run against fakes or extra backends.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import contextvars
+import threading
 import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 from googlesearch import search
 
+import config
+import metrics
+import search_cache
+
 try:
     from ddgs import DDGS
 except ImportError:
     DDGS = None
 
 
+class SearchProvider:
+    """One search backend. Subclasses set `name` and implement search()."""
+
+    name = "provider"
+
+    def __init__(self, interval: Optional[float] = None):
+        # None: read the provider's config knob at call time, so per-run overrides apply
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def search(self, query: str, num_results: int) -> List[str]:
+        raise NotImplementedError
+
+    def wait_turn(self) -> float:
+        """Block until this provider's next call slot; returns seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.pace()
+        if start > now:
+            time.sleep(start - now)
+        return start - now
+
+    def pace(self) -> float:
+        return provider_interval(self.name) if self.interval is None else self.interval
+
+    def cool_down(self, seconds: float) -> None:
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class GoogleProvider(SearchProvider):
+    name = "google"
+
+    def search(self, query: str, num_results: int) -> List[str]:
+        return list(search(query, num_results=num_results, sleep_interval=self.pace()))
+
+
+class DdgsProvider(SearchProvider):
+    name = "ddgs"
+
+    def search(self, query: str, num_results: int) -> List[str]:
+        links = []
+        for item in DDGS().text(query, max_results=num_results):
+            href = item.get("href")
+            if href:
+                links.append(href)
+        return links
+
+
+# name -> provider class; extra backends can be registered here
+PROVIDERS: Dict[str, Callable[[], SearchProvider]] = {
+    "google": GoogleProvider,
+    "ddgs": DdgsProvider,
+}
+
+
+def provider_interval(name: str) -> float:
+    return {
+        "google": config.DELAY_BETWEEN_SEARCHES,
+        "ddgs": config.DDGS_SEARCH_INTERVAL,
+    }.get(name, config.DELAY_BETWEEN_SEARCHES)
+
+
+_shared_providers: Dict[str, SearchProvider] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_provider(name: str) -> Optional[SearchProvider]:
+    """Process-wide provider instance, so concurrent sessions share its pacing."""
+    if name == "ddgs" and DDGS is None:
+        return None
+    with _shared_lock:
+        if name not in _shared_providers:
+            _shared_providers[name] = PROVIDERS[name]()
+        return _shared_providers[name]
+
+
+def fuse_rankings(rankings: Sequence[List[str]], limit: int, k: float = 60.0) -> List[str]:
+    """Reciprocal rank fusion of several ranked link lists, best first."""
+    scores: Dict[str, float] = {}
+    for links in rankings:
+        for rank, link in enumerate(dict.fromkeys(links)):
+            scores[link] = scores.get(link, 0.0) + 1.0 / (k + rank + 1)
+    # sorted() is stable, so ties keep first-seen order
+    return sorted(scores, key=lambda link: -scores[link])[:limit]
+
+
 class SearchEngine:
-    def __init__(self, pause=2.0, run=None):
-        self.pause = pause
+    def __init__(
+        self,
+        run=None,
+        providers: Optional[Sequence[SearchProvider]] = None,
+        cache=None,
+    ):
+        if providers is None:
+            names = [n.strip() for n in config.SEARCH_PROVIDERS.split(",") if n.strip()]
+            unknown = [n for n in names if n not in PROVIDERS]
+            if unknown:
+                raise ValueError(f"Unknown search providers: {', '.join(unknown)}")
+            providers = [p for p in map(shared_provider, names) if p is not None]
+        if not providers:
+            raise ValueError("No search providers available (check SEARCH_PROVIDERS).")
+        self.providers = list(providers)
         self.run = run
+        self.cache = search_cache.shared_cache() if cache is None else cache
 
-    def perform_search(self, query, num_results=100):
-        """Try Google first; if we get nothing (common when HTML changes / rate limits), use DDGS."""
-        print(f"Searching for: {query}")
-        links: list[str] = []
-        want = min(num_results, 100)
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(self.providers) * max(1, config.PIPELINE_SEARCH_WORKERS),
+            thread_name_prefix="search",
+        )
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, float]] = {
+            p.name: {"calls": 0, "links": 0, "errors": 0, "wait_s": 0.0, "time_s": 0.0}
+            for p in self.providers
+        }
+        self.cache_hits = 0
 
+    def _ask(self, provider: SearchProvider, query: str, want: int) -> Tuple[List[str], bool]:
+        """The provider's links, and whether it raised (an error counts as no links)."""
+        waited = provider.wait_turn()
+        metrics.observe("search.pacing_wait", waited)
+        started = time.monotonic()
         try:
-            for j in search(
-                query,
-                num_results=want,
-                sleep_interval=self.pause,
-            ):
-                if j not in links:
-                    links.append(j)
+            with metrics.timed(f"search.{provider.name}"):
+                links = provider.search(query, want)
         except Exception as e:
-            print(f"Google search error ('{query}'): {e}")
-            if self.run:
-                self.run.search_failures += 1
-            time.sleep(5)
-
-        if not links and DDGS is not None:
-            print("  -> trying DuckDuckGo instead")
-            try:
-                for item in DDGS().text(query, max_results=want):
-                    href = item.get("href")
-                    if href and href not in links:
-                        links.append(href)
-                    if len(links) >= want:
-                        break
-                time.sleep(min(self.pause, 3.0))
-            except Exception as e:
-                print(f"DuckDuckGo search error: {e}")
-                if self.run:
-                    self.run.search_failures += 1
+            print(f"{provider.name} search error ('{query}'): {e}")
+            provider.cool_down(config.SEARCH_ERROR_COOLDOWN)
+            links, failed = [], 1
+        else:
+            failed = 0
+        with self._lock:
+            c = self._counts[provider.name]
+            c["calls"] += 1
+            c["links"] += len(links)
+            c["errors"] += failed
+            c["wait_s"] += waited
+            c["time_s"] += time.monotonic() - started
+        return links, bool(failed)
 
+    def perform_search(self, query, num_results=100):
+        """Ask every provider at once and return the fused, de-duplicated links."""
+        print(f"Searching for: {query}")
+        want = min(num_results, 100)
+        names = [p.name for p in self.providers]
+        key = search_cache.cache_key(query, names, want)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                return cached
+
+        futures = [
+            self._pool.submit(contextvars.copy_context().run, self._ask, p, query, want)
+            for p in self.providers
+        ]
+        answers = [f.result() for f in futures]
+        # a provider's own errors are in stats(); the query only failed if nobody answered
+        if self.run and all(failed for _, failed in answers):
+            self.run.bump("search_failures")
+        rankings = [links for links, _ in answers]
+        links = fuse_rankings(rankings, want, config.SEARCH_RRF_K)
+        if links and self.cache is not None:
+            self.cache.put(key, query, links)
         return links
+
+    def stats(self) -> Dict[str, object]:
+        out: Dict[str, object] = {"cache_hits": self.cache_hits}
+        with self._lock:
+            for name, c in self._counts.items():
+                out[f"{name}_calls"] = int(c["calls"])
+                out[f"{name}_links"] = int(c["links"])
+                out[f"{name}_errors"] = int(c["errors"])
+                out[f"{name}_avg_wait_s"] = round(c["wait_s"] / c["calls"], 3) if c["calls"] else 0.0
+                out[f"{name}_avg_time_s"] = round(c["time_s"] / c["calls"], 3) if c["calls"] else 0.0
+        return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
+import threading
 import time
 from collections import Counter
-from dataclasses import dataclass, field
-from typing import List
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List
 from urllib.parse import urlparse
 
 
+# Per-process fields that a resumed run starts afresh
+_NOT_JOURNALED = frozenset({"topic", "started_at", "stats", "_seen_sources", "_lock"})
+
+
 @dataclass
 class RunTotals:
     topic: str
@@ -17,20 +22,76 @@ class RunTotals:
     search_hits_total: int = 0
     pages_fetched: int = 0
     pages_relevant: int = 0
+    prefilter_accepted: int = 0
+    prefilter_rejected: int = 0
     records_saved: int = 0
     duplicates_skipped: int = 0
+    frontier_skipped: int = 0
+    extractions_saved: int = 0  # near-duplicate pages that reused an extraction
     fetch_failures: int = 0
     search_failures: int = 0
+    http_cache_hits: int = 0
+    http_cache_revalidated: int = 0
+    http_cache_misses: int = 0
+    # fetch_failures broken down by FetchError reason (politeness.py)
+    fetch_failure_reasons: Dict[str, int] = field(default_factory=dict)
     queries_no_results: List[str] = field(default_factory=list)
+    # kept query -> near-duplicate variants collapsed into it (query_dedup.py)
+    queries_merged: Dict[str, List[str]] = field(default_factory=dict)
     saved_sources: List[str] = field(default_factory=list)
+    # Extra report sections handed over by shared services (e.g. "llm_cache").
+    stats: Dict[str, Dict[str, Any]] = field(default_factory=dict)
 
     _seen_sources: set = field(default_factory=set, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def bump(self, name: str, n: int = 1) -> None:
+        """Counter increment that is safe when pipeline stages share one RunTotals."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def fail(self, reason: str) -> None:
+        """Count a page we could not fetch or parse, under its reason."""
+        with self._lock:
+            self.fetch_failures += 1
+            self.fetch_failure_reasons[reason] = self.fetch_failure_reasons.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and lists as plain JSON-able values, for the session journal."""
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for f in fields(self):
+                if f.name in _NOT_JOURNALED:
+                    continue
+                value = getattr(self, f.name)
+                if isinstance(value, (list, dict)):
+                    value = type(value)(value)
+                out[f.name] = value
+        return out
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Pick up the totals of an earlier, interrupted run of the same session."""
+        with self._lock:
+            for f in fields(self):
+                if f.name in snapshot and f.name not in _NOT_JOURNALED:
+                    setattr(self, f.name, snapshot[f.name])
+            self._seen_sources = set(self.saved_sources)
 
     def track_source(self, url: str) -> None:
         if url not in self._seen_sources:
             self._seen_sources.add(url)
             self.saved_sources.append(url)
 
+    def http_cache_stats(self) -> dict:
+        lookups = self.http_cache_hits + self.http_cache_revalidated + self.http_cache_misses
+        served = self.http_cache_hits + self.http_cache_revalidated
+        return {
+            "hits": self.http_cache_hits,
+            "revalidated": self.http_cache_revalidated,
+            "misses": self.http_cache_misses,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+        }
+
     def by_hostname(self) -> Counter:
         tallies = Counter()
         for u in self.saved_sources:
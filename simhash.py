@@ -0,0 +1,82 @@
+"""64-bit SimHash fingerprints of page text and an index for near-duplicate lookups.
+
+Mirrors, paginated listings and syndicated dataset pages live at different
+URLs (so normalize_page_url keeps them apart) but carry almost the same text.
+Their fingerprints differ in only a few bits. NearDupIndex finds any earlier
+fingerprint within `max_distance` bits: it splits the 64 bits into
+max_distance + 1 blocks, and two fingerprints that close must agree exactly
+on at least one block, so a lookup only compares against entries sharing
+one of those blocks.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BITS = 64
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fingerprint(text: str, shingle: int = 3) -> Optional[int]:
+    """SimHash over word shingles; None when the text is too short to say anything."""
+    words = _WORD_RE.findall(text.casefold())
+    if len(words) < shingle:
+        return None
+    shingles = Counter(" ".join(words[i : i + shingle]) for i in range(len(words) - shingle + 1))
+    digests = b"".join(
+        hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest() for token in shingles
+    )
+    # one row of 64 bits per shingle, most significant bit first
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), BITS)
+    counts = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+    weights = counts @ (bits.astype(np.int64) * 2 - 1)
+    return int.from_bytes(np.packbits(weights > 0).tobytes(), "big")
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDupIndex:
+    """fingerprint -> value map answering "anything within max_distance bits?"."""
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max(0, min(max_distance, BITS - 1))
+        blocks = self.max_distance + 1
+        edges = [round(i * BITS / blocks) for i in range(blocks + 1)]
+        self._masks = [
+            (((1 << (hi - lo)) - 1) << lo, lo) for lo, hi in zip(edges, edges[1:])
+        ]
+        self._tables: List[Dict[int, List[Tuple[int, Any]]]] = [{} for _ in self._masks]
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def _keys(self, fp: int) -> List[int]:
+        return [(fp & mask) >> shift for mask, shift in self._masks]
+
+    def find(self, fp: int) -> Optional[Tuple[int, Any]]:
+        """(bits apart, value) of the closest stored fingerprint within range, or None."""
+        best = None
+        with self._lock:
+            for table, key in zip(self._tables, self._keys(fp)):
+                for other, value in table.get(key, ()):
+                    d = distance(fp, other)
+                    if d <= self.max_distance and (best is None or d < best[0]):
+                        best = (d, value)
+        return best
+
+    def add(self, fp: int, value: Any) -> None:
+        with self._lock:
+            for table, key in zip(self._tables, self._keys(fp)):
+                table.setdefault(key, []).append((fp, value))
+            self._size += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size
@@ -0,0 +1,139 @@
+"""SQLite key -> value memo behind the LLM, search and link-probe caches.
+
+One table per cache: a text key, the cache's own value columns, and when the
+entry was stored and last read. Entries older than `ttl` seconds (when there
+is one) read as misses and are overwritten by the next put. Past
+`max_entries`, expired entries go first, then the least recently read, down
+to 90% of the cap.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple, Type, TypeVar
+
+T = TypeVar("T", bound="SqliteCache")
+
+
+class SqliteCache:
+    """Subclasses name their `table` and value `columns`; get/put move tuples of those."""
+
+    table = ""
+    columns: Tuple[str, ...] = ()
+
+    def __init__(self, path: str, max_entries: int, ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        values = "".join(f"    {c} TEXT NOT NULL,\n" for c in self.columns)
+        self._db.executescript(
+            f"CREATE TABLE IF NOT EXISTS {self.table} (\n"
+            f"    key TEXT PRIMARY KEY,\n{values}"
+            f"    stored_at REAL NOT NULL,\n"
+            f"    accessed_at REAL NOT NULL DEFAULT 0\n);"
+        )
+        have = {r[1] for r in self._db.execute(f"PRAGMA table_info({self.table})")}
+        if "accessed_at" not in have:
+            # tables from before reads were tracked; their entries count as never read
+            with self._db:
+                self._db.execute(
+                    f"ALTER TABLE {self.table} ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0"
+                )
+        self._db.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)"
+        )
+        self._count = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl is None or time.time() - stored_at <= self.ttl
+
+    def get_values(self, key: str) -> Optional[Tuple[Any, ...]]:
+        """The entry's value columns, or None on a miss (absent or expired)."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(self.columns)}, stored_at FROM {self.table} WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or not self._fresh(row[-1]):
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._db:
+                self._db.execute(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+            return row[:-1]
+
+    def put_values(self, key: str, values: Sequence[Any], replace: bool = True) -> None:
+        """Store the value columns; with replace=False an existing fresh entry is kept."""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                f"SELECT stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not replace and self._fresh(row[0]):
+                return
+            names = ("key", *self.columns, "stored_at", "accessed_at")
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) "
+                f"VALUES ({', '.join('?' * len(names))})",
+                (key, *values, now, now),
+            )
+            if row is None:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def discard(self, key: str) -> None:
+        with self._lock, self._db:
+            cur = self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._count -= cur.rowcount
+
+    def _evict(self) -> None:
+        """Caller holds the lock and the transaction."""
+        if self.ttl is not None:
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE stored_at < ?", (time.time() - self.ttl,)
+            )
+        count = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries + max(1, self.max_entries // 10),),
+            )
+        self._count = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": self._count,
+            }
+
+
+_shared: Dict[type, Any] = {}
+_shared_lock = threading.Lock()
+
+
+def shared(cls: Type[T], enabled: bool) -> Optional[T]:
+    """One instance of `cls` per process, built on first use; None when `enabled` is off."""
+    if not enabled:
+        return None
+    with _shared_lock:
+        if cls not in _shared:
+            _shared[cls] = cls()
+        return _shared[cls]
@@ -0,0 +1,409 @@
+"""Append-only row stores for a session's dataset rows.
+
+DataManager hands every saved row to one of these instead of appending pandas
+chunks to dataset.csv. List fields (formats, download links and their probe
+answers) stay real lists: JSON arrays in SQLite, list columns in Parquet.
+Sessions written before a column existed read back with it empty (an empty
+list for list columns). Rows are buffered and written in one transaction /
+row group once STORE_FLUSH_ROWS have piled up or STORE_FLUSH_SECONDS have
+passed since the last write, and on close().
+
+load() reads a session back as a DataFrame, optionally filtered by url or
+query; the SQLite store has indexes on both, so lookups stay fast on sessions
+with hundreds of thousands of rows.
+"""
+
+from __future__ import annotations
+
+import csv
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+import config
+
+COLUMNS = [
+    "query",
+    "url",
+    "source_url",
+    "dataset_name",
+    "description",
+    "formats",
+    "verified_download_links",
+    "download_links",
+    "candidates_count",
+    "license",
+    "relevance",
+    "saved_at",
+    "content_hash",
+    "local_path",
+]
+# link_probe answers, one entry per verified_download_links entry
+PROBE_COLUMNS = ("link_status", "link_content_type", "link_content_length", "link_last_modified")
+COLUMNS += PROBE_COLUMNS
+LIST_COLUMNS = ("formats", "verified_download_links", "download_links", *PROBE_COLUMNS)
+# list columns of integers (None where a probe got no answer or no size)
+INT_LIST_COLUMNS = ("link_status", "link_content_length")
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    url TEXT NOT NULL,
+    source_url TEXT,
+    dataset_name TEXT,
+    description TEXT,
+    formats TEXT,
+    verified_download_links TEXT,
+    download_links TEXT,
+    candidates_count INTEGER,
+    license TEXT,
+    relevance,
+    saved_at TEXT,
+    content_hash TEXT,
+    local_path TEXT,
+    link_status TEXT,
+    link_content_type TEXT,
+    link_content_length TEXT,
+    link_last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS rows_url ON rows (url);
+CREATE INDEX IF NOT EXISTS rows_query ON rows (query);
+"""
+
+
+def _as_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def _as_int_list(value) -> List[Optional[int]]:
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [None if v is None or v == "" else int(v) for v in value]
+
+
+def _as_json_list(value) -> list:
+    return list(value) if isinstance(value, (list, tuple)) else []
+
+
+def _from_json(value) -> list:
+    """A JSON list cell; sessions written before a list column existed have it empty."""
+    return json.loads(value) if isinstance(value, str) and value else []
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _filter(df: pd.DataFrame, query: Optional[str], url: Optional[str]) -> pd.DataFrame:
+    if query is not None:
+        df = df[df["query"] == query]
+    if url is not None:
+        df = df[df["url"] == url]
+    return df.reset_index(drop=True)
+
+
+class RowStore:
+    """Buffering and flush policy; subclasses implement _write / _read."""
+
+    filename = ""
+
+    def __init__(
+        self,
+        session_dir: str,
+        flush_rows: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+    ):
+        self.path = os.path.join(session_dir, self.filename)
+        self.flush_rows = max(1, flush_rows or config.STORE_FLUSH_ROWS)
+        self.flush_seconds = (
+            config.STORE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        )
+        self._pending: List[Dict[str, Any]] = []
+        # updates to rows already in an append-only file, by url
+        self._late: Dict[str, Dict[str, Any]] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def append(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending.append(row)
+            due = len(self._pending) >= self.flush_rows or (
+                time.monotonic() - self._last_flush >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if rows:
+                self._write(rows)
+
+    def update(self, url: str, values: Dict[str, Any]) -> None:
+        """Change columns of the last row appended for `url`, whether flushed yet or not."""
+        with self._lock:
+            for row in reversed(self._pending):
+                if row.get("url") == url:
+                    row.update(values)
+                    return
+            self._update(url, values)
+
+    def load(self, query: Optional[str] = None, url: Optional[str] = None) -> pd.DataFrame:
+        """Rows saved so far (pending ones included), list columns as Python lists."""
+        self.flush()
+        with self._lock:
+            return self._overlay(self._read(query, url))
+
+    def export_csv(self, path: str) -> None:
+        df = self.load()
+        for col in LIST_COLUMNS:
+            df[col] = df[col].map(json.dumps)
+        df.to_csv(path, index=False)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._late:
+                self._rewrite(self._overlay(self._read(None, None)))
+                self._late.clear()
+            self._close()
+
+    def _update(self, url: str, values: Dict[str, Any]) -> None:
+        """Append-only files can't change a written row; keep the change for load() and close()."""
+        self._late.setdefault(url, {}).update(values)
+
+    def _overlay(self, df: pd.DataFrame) -> pd.DataFrame:
+        for url, values in self._late.items():
+            hits = df.index[df["url"] == url]
+            if len(hits):
+                for col, value in values.items():
+                    df.at[hits[-1], col] = value
+        return df
+
+    def _rewrite(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def _read(self, query: Optional[str], url: Optional[str]) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class CsvStore(RowStore):
+    """The old dataset.csv layout, with list cells written as JSON arrays."""
+
+    filename = "dataset.csv"
+    _layout_checked = False
+
+    def _write(self, rows):
+        chunk = pd.DataFrame(rows, columns=COLUMNS)
+        for col in LIST_COLUMNS:
+            chunk[col] = chunk[col].map(lambda v: json.dumps(_as_json_list(v)))
+        exists = os.path.exists(self.path)
+        if exists and not self._layout_checked and self._header() != COLUMNS:
+            self._upgrade()
+        self._layout_checked = True
+        chunk.to_csv(self.path, mode="a" if exists else "w", header=not exists, index=False)
+
+    def _header(self) -> List[str]:
+        with open(self.path, encoding="utf-8") as f:
+            return next(csv.reader(f), [])
+
+    def _rewrite(self, df):
+        for col in LIST_COLUMNS:
+            df[col] = df[col].map(lambda v: json.dumps(_as_json_list(v)))
+        df.to_csv(self.path, index=False)
+
+    def _upgrade(self) -> None:
+        """Rewrite a file from an older layout with the current columns, so appends line up."""
+        df = pd.read_csv(self.path, keep_default_na=False).reindex(columns=COLUMNS, fill_value="")
+        df.to_csv(self.path, index=False)
+
+    def _read(self, query, url):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=COLUMNS)
+        df = pd.read_csv(self.path, keep_default_na=False).reindex(columns=COLUMNS, fill_value="")
+        for col in LIST_COLUMNS:
+            df[col] = df[col].map(_from_json)
+        return _filter(df, query, url)
+
+    def export_csv(self, path):
+        if os.path.abspath(path) != os.path.abspath(self.path):
+            super().export_csv(path)
+
+
+class SqliteStore(RowStore):
+    filename = "dataset.sqlite"
+
+    def __init__(self, session_dir, flush_rows=None, flush_seconds=None):
+        super().__init__(session_dir, flush_rows, flush_seconds)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SQLITE_SCHEMA)
+        # sessions from before a column existed get it added, empty
+        have = {r[1] for r in self._db.execute("PRAGMA table_info(rows)")}
+        with self._db:
+            for col in COLUMNS:
+                if col not in have:
+                    self._db.execute(f"ALTER TABLE rows ADD COLUMN {col} TEXT")
+
+    def _write(self, rows):
+        values = [
+            tuple(
+                json.dumps(row.get(c) or []) if c in LIST_COLUMNS else row.get(c)
+                for c in COLUMNS
+            )
+            for row in rows
+        ]
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO rows ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                values,
+            )
+
+    def _update(self, url, values):
+        cols = list(values)
+        with self._db:
+            self._db.execute(
+                f"UPDATE rows SET {', '.join(f'{c} = ?' for c in cols)} "
+                "WHERE id = (SELECT MAX(id) FROM rows WHERE url = ?)",
+                [json.dumps(values[c]) if c in LIST_COLUMNS else values[c] for c in cols] + [url],
+            )
+
+    def _read(self, query, url):
+        where, args = [], []
+        if query is not None:
+            where.append("query = ?")
+            args.append(query)
+        if url is not None:
+            where.append("url = ?")
+            args.append(url)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM rows"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cur = self._db.execute(sql + " ORDER BY id", args)
+        df = pd.DataFrame.from_records(cur.fetchall(), columns=COLUMNS)
+        for col in LIST_COLUMNS:
+            df[col] = df[col].map(_from_json)
+        return df
+
+    def _close(self):
+        self._db.close()
+
+
+class ParquetStore(RowStore):
+    """One row group per flush, in part files under dataset.parquet/.
+
+    A part file only becomes readable once its footer is written, so load()
+    seals the current part and the next flush starts a new one.
+    """
+
+    filename = "dataset.parquet"
+
+    def __init__(self, session_dir, flush_rows=None, flush_seconds=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        super().__init__(session_dir, flush_rows, flush_seconds)
+        self._pa, self._pq = pa, pq
+        os.makedirs(self.path, exist_ok=True)
+        self._parts = len(glob.glob(os.path.join(self.path, "part-*.parquet")))
+        self._writer = None
+        types = {"candidates_count": pa.int64(), "relevance": pa.float64()}
+        types.update({c: pa.list_(pa.string()) for c in LIST_COLUMNS})
+        types.update({c: pa.list_(pa.int64()) for c in INT_LIST_COLUMNS})
+        self.schema = pa.schema([(c, types.get(c, pa.string())) for c in COLUMNS])
+
+    def _write(self, rows):
+        data = {c: [row.get(c) for row in rows] for c in COLUMNS}
+        for col in LIST_COLUMNS:
+            convert = _as_int_list if col in INT_LIST_COLUMNS else _as_list
+            data[col] = [convert(v) for v in data[col]]
+        data["candidates_count"] = [int(v or 0) for v in data["candidates_count"]]
+        data["relevance"] = [_as_float(v) for v in data["relevance"]]
+        for col in COLUMNS:
+            if self.schema.field(col).type == self._pa.string():
+                data[col] = [None if v is None else str(v) for v in data[col]]
+        if self._writer is None:
+            part = os.path.join(self.path, f"part-{self._parts:05d}.parquet")
+            self._writer = self._pq.ParquetWriter(part, self.schema)
+            self._parts += 1
+        self._writer.write_table(self._pa.Table.from_pydict(data, schema=self.schema))
+
+    def _read(self, query, url):
+        self._close()
+        if not self._parts:
+            return pd.DataFrame(columns=COLUMNS)
+        filters = [(c, "=", v) for c, v in (("query", query), ("url", url)) if v is not None]
+        table = self._pq.read_table(self.path, schema=self.schema, filters=filters or None)
+        df = table.drop_columns(list(LIST_COLUMNS)).to_pandas()
+        for col in LIST_COLUMNS:
+            # None for part files written before the column existed
+            df[col] = [v or [] for v in table.column(col).to_pylist()]
+        return df[COLUMNS]
+
+    def _rewrite(self, df):
+        """Replace the part files with one holding df."""
+        self._close()
+        old = glob.glob(os.path.join(self.path, "part-*.parquet"))
+        self._write(df.to_dict("records"))
+        self._close()
+        for path in old:
+            os.remove(path)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+BACKENDS = {"csv": CsvStore, "sqlite": SqliteStore, "parquet": ParquetStore}
+
+
+def open_store(session_dir: str, backend: Optional[str] = None) -> RowStore:
+    backend = (backend or config.STORE_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORE_BACKEND {backend!r}; expected one of {sorted(BACKENDS)}")
+    try:
+        return BACKENDS[backend](session_dir)
+    except ImportError:
+        print("pyarrow is not installed; storing rows in SQLite instead of Parquet.")
+        return SqliteStore(session_dir)
+
+
+def load_session(
+    session_dir: str, query: Optional[str] = None, url: Optional[str] = None
+) -> pd.DataFrame:
+    """Read a finished session's rows from whichever store it was written with."""
+    for backend in ("sqlite", "parquet", "csv"):
+        cls = BACKENDS[backend]
+        if os.path.exists(os.path.join(session_dir, cls.filename)):
+            store = cls(session_dir)
+            try:
+                return store.load(query=query, url=url)
+            finally:
+                store.close()
+    raise FileNotFoundError(f"No dataset store found in {session_dir}")
@@ -2,21 +2,25 @@
 
 from __future__ import annotations
 
+import heapq
 import re
+from functools import lru_cache
 from urllib.parse import urljoin, urlparse, urlunparse
 
-from bs4 import BeautifulSoup
+from lxml import etree
 
-_DATA_HINT_RE = re.compile(
-    r"\.(?:csv|json|jsonl|parquet|zip|gz|tgz|tar|tsv|sqlite|db)(?:\?|$)|"
-    r"(?:download|dataset|dump|api|blob|raw)",
-    re.I,
-)
+from data_vocab import DATA_HINT_RE
 
 
 def normalize_http_url(base_url: str, link: str | None) -> str | None:
     if not link or not isinstance(link, str):
         return None
+    return _normalize_http_url(base_url, link)
+
+
+# Listing pages repeat the same nav/asset links over and over, across pages too
+@lru_cache(maxsize=65536)
+def _normalize_http_url(base_url: str, link: str) -> str | None:
     link = link.strip()
     if link.startswith("#") or link.lower().startswith("javascript:"):
         return None
@@ -43,6 +47,43 @@ def normalize_page_url(url: str) -> str:
 
 _TEXT_URL_RE = re.compile(r"https?://[^\s\"'<>)\]}]+", re.I)
 
+_LINK_TAGS = frozenset(("a", "link", "script", "img", "source", "iframe"))
+
+
+class _LinkCollector:
+    """lxml parser target: sees start tags as they stream past, never builds a tree."""
+
+    def __init__(self) -> None:
+        self.links: list[str | None] = []
+
+    def start(self, tag, attrib) -> None:
+        if tag in _LINK_TAGS:
+            self.links.append(attrib.get("href") or attrib.get("src"))
+
+    def end(self, tag) -> None:
+        pass
+
+    def data(self, data) -> None:
+        pass
+
+    def comment(self, text) -> None:
+        pass
+
+    def close(self) -> list[str | None]:
+        return self.links
+
+
+def _html_links(raw_html: str) -> list[str | None]:
+    collector = _LinkCollector()
+    parser = etree.HTMLParser(target=collector, recover=True, strip_cdata=False)
+    parser.feed(raw_html)
+    return parser.close()
+
+
+def _rank(u: str) -> tuple[int, str]:
+    bump = 2 if DATA_HINT_RE.search(u.lower()) else 0
+    return (-bump, u)
+
 
 def harvest_urls(page_url: str, raw_html: str | None, text: str | None, max_urls: int) -> list[str]:
     """Dedupe, bump file-ish URLs toward the front of the list."""
@@ -57,9 +98,7 @@ def harvest_urls(page_url: str, raw_html: str | None, text: str | None, max_urls
 
     if raw_html:
         try:
-            soup = BeautifulSoup(raw_html, "lxml")
-            for tag in soup.find_all(["a", "link", "script", "img", "source", "iframe"]):
-                href = tag.get("href") or tag.get("src")
+            for href in _html_links(raw_html):
                 remember(normalize_http_url(page_url, href))
         except Exception:
             pass
@@ -68,11 +107,6 @@ def harvest_urls(page_url: str, raw_html: str | None, text: str | None, max_urls
     for m in _TEXT_URL_RE.finditer(plain):
         remember(normalize_http_url(page_url, m.group(0)))
 
-    def sort_key(u: str) -> tuple[int, str]:
-        low = u.lower()
-        bump = 2 if _DATA_HINT_RE.search(low) else 0
-        return (-bump, u)
-
-    out.sort(key=sort_key)
     cap = max_urls if max_urls > 0 else 120
-    return out[:cap]
+    # Same order as sorted(out, key=_rank)[:cap] without sorting the whole list
+    return heapq.nsmallest(cap, out, key=_rank)